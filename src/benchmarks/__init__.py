@@ -0,0 +1,6 @@
+"""
+Benchmarks for the crawler's indexing and querying stages.
+They run against synthetic corpora, so that no web pages have to be crawled. Run them from the src/ directory, e.g.:
+
+    python -m benchmarks.index_format
+"""
@@ -0,0 +1,99 @@
+from helpers import PAGES, URLS, COSINE_SIMILARITY
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import AndQuery, OrQuery
+from classes.postings import Postings
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def set_based_and(index, stats, terms):
+    """
+    Intersect sets of document IDs, in the order the terms were typed, then score the results by going through all of
+    the terms' postings, like AndQuery did before.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :return: cosine similarity of each result
+    """
+    lists_of_pages = [index[term][PAGES] if term in index else [] for term in dict.fromkeys(terms)]
+    query = OrQuery(index, stats)
+    query.terms = terms
+    query.results = set(lists_of_pages[0]).intersection(*[set(doc_ids) for doc_ids in lists_of_pages[1:]])
+    query.get_cosine_similarities()
+    return {doc_id: scores[COSINE_SIMILARITY] for doc_id, scores in query.results_with_cosine_similarity.items()}
+
+
+def galloping_and(index, stats, terms):
+    """
+    Intersect the sorted postings from the rarest term's, then score the results, like AndQuery does.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :return: cosine similarity of each result
+    """
+    query = AndQuery(index, stats)
+    query.terms = terms
+    query.results = Postings.intersect(query.get_pages())
+    query.get_cosine_similarities()
+    return {doc_id: scores[COSINE_SIMILARITY] for doc_id, scores in query.results_with_cosine_similarity.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare set-based and galloping AND queries mixing a rare term with common ones.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries of each shape", default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl")
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        os.chdir("/")
+
+    index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+    generator = random.Random(0)
+    rare_terms = [term for term in vocabulary[500:5000] if term in index]
+
+    rows = []
+    for common in (0, 1, 2, 4):
+        # the rare term comes last, like a user typing "the university of ... concordia"
+        queries = [generator.sample(vocabulary[:20], common) + [generator.choice(rare_terms)] for _ in range(args.queries)]
+
+        results = [[search(index, stats, terms) for terms in queries] for search in (set_based_and, galloping_and)]
+        assert results[0] == results[1], "the results differ"
+
+        row = [common + 1, round(sum(len(index[terms[-1]][PAGES]) for terms in queries) / len(queries))]
+        for search in (set_based_and, galloping_and):
+            start = time.perf_counter()
+            for terms in queries:
+                search(index, stats, terms)
+            row.append(round((time.perf_counter() - start) / len(queries) * 1000, 3))
+        row.append(round(sum(len(index[term][PAGES]) for terms in queries for term in terms) / len(queries)))
+        rows.append(row)
+
+    print("Both give the same results.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["query terms", "rare term's postings", "sets (ms/query)", "galloping (ms/query)", "postings of all terms"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} documents.".format(len(stats[URLS])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+from helpers import URLS
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import AndQuery, OrQuery
+from classes.matrix_engine import MatrixEngine
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def python_batch(query, batch, k):
+    """
+    Score the queries one at a time from the postings, like Query.search_batch does without an engine.
+    :param query: AndQuery or OrQuery
+    :param batch: list of queries, each a list of terms
+    :param k: number of pages to keep per query, 0 for all
+    :return: for each query, list of (page ID, cosine similarity)
+    """
+    return [query.rank(terms, k) for terms in batch]
+
+
+def same_rankings(expected, actual, tolerance=1e-9):
+    """
+    Check that two rankings have the same scores, and the same pages except where their scores are tied within the
+    tolerance, since sums done in another order can round differently.
+    :param expected: list of (page ID, cosine similarity)
+    :param actual: list of (page ID, cosine similarity)
+    :param tolerance: largest difference between two scores which are considered equal
+    :return: True if the rankings match
+    """
+    if len(expected) != len(actual):
+        return False
+    for position, ((doc_id, score), (other_id, other_score)) in enumerate(zip(expected, actual)):
+        if abs(score - other_score) > tolerance:
+            return False
+        if doc_id != other_id:
+            tied = [expected_id for expected_id, expected_score in expected if abs(expected_score - score) <= tolerance]
+            if other_id not in tied:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare scoring batches of queries from the postings and with the sparse matrix engine.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries in the batch", default=2000)
+    parser.add_argument("-k", "--top-k", type=int, help="number of pages kept per query, 0 for all", default=10)
+    args = parser.parse_args()
+
+    if not MatrixEngine.available():
+        print("NumPy and SciPy have to be installed to run this benchmark.")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl")
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        os.chdir("/")
+
+    index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+    start = time.perf_counter()
+    engine = MatrixEngine(index, stats)
+    compile_time = time.perf_counter() - start
+
+    # queries mixing common and rarer terms, of 1 to 4 terms
+    generator = random.Random(0)
+    terms = [term for term in vocabulary[:5000] if term in index]
+    batch = [generator.sample(terms[:generator.choice((50, 500, 5000))], generator.randint(1, 4)) for _ in range(args.queries)]
+
+    rows = []
+    for query_class in (OrQuery, AndQuery):
+        query = query_class(index, stats)
+
+        start = time.perf_counter()
+        expected = python_batch(query, batch, args.top_k)
+        python_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = engine.search(batch, query_class.conjunctive, args.top_k)
+        matrix_time = time.perf_counter() - start
+
+        assert all(same_rankings(*rankings) for rankings in zip(expected, actual)), "the rankings differ"
+
+        rows.append([query_class.__name__, round(python_time, 3), round(matrix_time, 3), round(python_time / matrix_time, 1)])
+
+    print("Both give the same rankings.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["query", "postings (s)", "matrix (s)", "speedup"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} queries, top {} pages each, on {:,} documents. Compiling the matrix took {}s.".format(
+        len(batch), args.top_k or "all", len(stats[URLS]), round(compile_time, 3)
+    ))
+
+
+if __name__ == '__main__':
+    main()
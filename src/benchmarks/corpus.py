@@ -0,0 +1,113 @@
+from helpers import URL, CONTENT, JSONLINES_EXTENSIONS
+
+from itertools import accumulate
+
+import argparse
+import json
+import random
+import string
+
+
+def generate_vocabulary(size, seed=0):
+    """
+    Generate made up words, so that corpora of any size can be created.
+    :param size: number of distinct words
+    :param seed: seed of the random generator
+    :return: list of words
+    """
+    generator = random.Random(seed)
+    vocabulary = set()
+    while len(vocabulary) < size:
+        length = generator.randint(2, 12)
+        vocabulary.add("".join(generator.choice(string.ascii_lowercase) for _ in range(length)))
+    return sorted(vocabulary)
+
+
+def generate_corpus(file_path, num_documents, terms_per_document=300, vocabulary_size=20000, seed=0, first_document=0):
+    """
+    Write a file shaped like the crawler's results.json, with a Zipfian distribution of terms, like natural text.
+    If the file has a JSON lines extension, it's shaped like results.jl instead.
+    :param file_path: path of the file to create
+    :param num_documents: number of web pages
+    :param terms_per_document: average number of terms in a page
+    :param vocabulary_size: number of distinct terms
+    :param seed: seed of the random generator, so that runs can be compared
+    :param first_document: number of the first page in the URLs, to generate new pages for an existing corpus
+    :return: the vocabulary, sorted from most to least frequent
+    """
+    generator = random.Random(seed)
+    vocabulary = generate_vocabulary(vocabulary_size, seed)
+    generator.shuffle(vocabulary)
+    # the cumulative weights are computed once, instead of for every page, which gives the same pages
+    cum_weights = list(accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+
+    jsonlines = file_path.endswith(JSONLINES_EXTENSIONS)
+
+    with open(file_path, "w", encoding="utf-8") as corpus_file:
+        if not jsonlines:
+            corpus_file.write("[")
+        for doc in range(num_documents):
+            length = generator.randint(terms_per_document // 2, terms_per_document * 3 // 2)
+            result = {
+                URL: "https://www.example.com/pages/{}.html".format(first_document + doc),
+                CONTENT: generator.choices(vocabulary, cum_weights=cum_weights, k=length)
+            }
+            if jsonlines:
+                corpus_file.write("{}\n".format(json.dumps(result)))
+            else:
+                corpus_file.write("{}\n{}".format("," if doc else "", json.dumps(result)))
+        if not jsonlines:
+            corpus_file.write("\n]")
+
+    return vocabulary
+
+
+def generate_query_log(file_path, vocabulary, num_queries, num_distinct=1000, seed=0):
+    """
+    Write a log of queries, one per line, like the files conducted with --queries.
+    Like in a real query log, a few queries are much more popular than the others: the distinct queries are picked with
+    a Zipfian distribution. Each one has 1 to 4 terms, mostly among the frequent terms of the corpus, typed in any case.
+    :param file_path: path of the file to create
+    :param vocabulary: vocabulary of the corpus, sorted from most to least frequent
+    :param num_queries: number of queries in the log
+    :param num_distinct: number of distinct queries
+    :param seed: seed of the random generator, so that runs can be compared
+    :return: list of the queries
+    """
+    generator = random.Random(seed)
+    distinct_queries = []
+    for _ in range(num_distinct):
+        terms = generator.sample(vocabulary[:generator.choice((50, 500, 5000))], generator.randint(1, 4))
+        distinct_queries.append(" ".join(term.upper() if generator.random() < 0.1 else term for term in terms))
+
+    cum_weights = list(accumulate(1 / rank for rank in range(1, num_distinct + 1)))
+    queries = generator.choices(distinct_queries, cum_weights=cum_weights, k=num_queries)
+
+    with open(file_path, "w", encoding="utf-8") as queries_file:
+        for query in queries:
+            queries_file.write("{}\n".format(query))
+
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic crawler output, and optionally a log of queries against it.")
+    parser.add_argument("-o", "--output", type=str, help="file to create, shaped like results.jl if it has a JSON lines extension", default="results.json")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents", default=1000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=20000)
+    parser.add_argument("-s", "--seed", type=int, help="seed of the random generator", default=0)
+    parser.add_argument("-q", "--queries", type=str, help="file to write a log of queries to, one per line")
+    parser.add_argument("-n", "--num-queries", type=int, help="number of queries in the log", default=10000)
+    args = parser.parse_args()
+
+    print("Generating {} with {:,} documents...".format(args.output, args.documents))
+    vocabulary = generate_corpus(args.output, args.documents, args.terms, args.vocabulary, args.seed)
+
+    if args.queries:
+        print("Generating {} with {:,} queries...".format(args.queries, args.num_queries))
+        generate_query_log(args.queries, vocabulary, args.num_queries, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
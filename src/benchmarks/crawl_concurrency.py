@@ -0,0 +1,85 @@
+from classes.spider import ConcordiaSpider
+from classes.crawl_report import CrawlReport
+from benchmarks.fixture_server import start_sites
+from benchmarks.measure import run_isolated
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import tempfile
+
+
+# name of each configuration, and the arguments of ConcordiaSpider.crawl it sets
+configurations = [
+    ("1 request at a time", {"concurrent_requests": 1, "concurrent_per_domain": 1}),
+    ("8 requests, 2 per domain", {"concurrent_requests": 8, "concurrent_per_domain": 2}),
+    ("16 requests, 8 per domain", {"concurrent_requests": 16, "concurrent_per_domain": 8}),
+    ("32 requests, 8 per domain", {"concurrent_requests": 32, "concurrent_per_domain": 8}),
+    ("16 requests, 8 per domain, no keep-alive", {"concurrent_requests": 16, "concurrent_per_domain": 8, "keep_alive": False}),
+    ("32 requests, 8 per domain, AutoThrottle", {"concurrent_requests": 32, "concurrent_per_domain": 8, "autothrottle": True, "autothrottle_target": 4.0}),
+]
+
+
+def crawl_sites(url, pages, settings):
+    """
+    Crawl the fixture sites like main.run_spider does, without printing anything.
+    The reactor can only be started once per process, so every crawl has to run in its own process.
+    :param url: URL of the first page
+    :param pages: number of pages to crawl
+    :param settings: arguments of ConcordiaSpider.crawl
+    :return: number of pages written to the feed, and the crawl report of all domains
+    """
+    ConcordiaSpider.custom_settings = {"LOG_LEVEL": "WARNING"}
+
+    with tempfile.TemporaryDirectory() as directory, redirect_stdout(io.StringIO()):
+        os.chdir(directory)
+        spider = ConcordiaSpider()
+        spider.crawl(url, obey_robots=False, max=pages, feed_format="jsonlines", **settings)
+        with open(ConcordiaSpider.feeds["jsonlines"], encoding="utf-8") as feed:
+            scraped = sum(1 for _ in feed)
+        os.chdir("/")
+
+    return scraped, CrawlReport.domains[None], len(CrawlReport.domains) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare crawl throughput with different concurrency settings, against local sites on several hosts.")
+    parser.add_argument("-p", "--pages", type=int, help="number of pages to crawl", default=400)
+    parser.add_argument("-s", "--sites", type=int, help="number of sites, each on its own host", default=4)
+    parser.add_argument("-l", "--latency", type=float, help="seconds each site waits before answering a request", default=0.05)
+    parser.add_argument("--port", type=int, help="port of the fixture sites", default=8933)
+    args = parser.parse_args()
+
+    processes, sites = start_sites(args.port, args.sites, num_pages=args.pages * 2, paragraphs=10, latency=args.latency)
+    url = "{}/page/0.html".format(sites[0])
+
+    rows = []
+    try:
+        for name, settings in configurations:
+            print("Crawling {:,} pages with {}...".format(args.pages, name))
+            measurements = run_isolated(crawl_sites, url, args.pages, settings)
+            scraped, report, domains = measurements["result"]
+            rows.append([
+                name, scraped, domains,
+                round(measurements["seconds"], 2),
+                round(scraped / measurements["seconds"], 1),
+                round(report["bytes_per_second"] / 1024, 1),
+                round(report["latency_ms"], 1)
+            ])
+    finally:
+        for process in processes:
+            process.terminate()
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["configuration", "pages scraped", "domains", "crawl (s)", "pages/s", "KiB/s", "avg latency (ms)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{} sites answering after {} ms.".format(args.sites, round(args.latency * 1000)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+from classes.spider import ConcordiaSpider
+from benchmarks.fixture_server import start_server
+from benchmarks.measure import run_isolated
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import tempfile
+
+
+def crawl_site(url, pages, workers, pool, concurrent_requests):
+    """
+    Crawl the fixture site like main.run_spider does, without printing anything.
+    The reactor can only be started once per process, so every crawl has to run in its own process.
+    :param url: URL of the first page
+    :param pages: number of pages to crawl
+    :param workers: number of tokenizer workers, 0 to tokenize in the reactor thread
+    :param pool: kind of pool the tokenizer workers are in
+    :param concurrent_requests: number of requests the crawler makes at once
+    :return: number of pages written to the feed
+    """
+    ConcordiaSpider.custom_settings = {"CONCURRENT_REQUESTS": concurrent_requests, "LOG_LEVEL": "WARNING"}
+
+    with tempfile.TemporaryDirectory() as directory, redirect_stdout(io.StringIO()):
+        os.chdir(directory)
+        spider = ConcordiaSpider()
+        spider.crawl(url, obey_robots=False, max=pages, feed_format="jsonlines", tokenizer_workers=workers, tokenizer_pool=pool)
+        with open(ConcordiaSpider.feeds["jsonlines"], encoding="utf-8") as feed:
+            scraped = sum(1 for _ in feed)
+        os.chdir("/")
+
+    return scraped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare crawl throughput with tokenization in the reactor thread and in a pool of workers.")
+    parser.add_argument("-p", "--pages", type=int, help="number of pages to crawl", default=300)
+    parser.add_argument("-w", "--workers", type=int, nargs="+", help="numbers of tokenizer workers to compare", default=[0, 1, 2, 4])
+    parser.add_argument("-pool", "--pool", choices=["process", "thread"], help="kind of pool the tokenizer workers are in", default="process")
+    parser.add_argument("-c", "--concurrent-requests", type=int, help="number of requests the crawler makes at once", default=8)
+    parser.add_argument("--port", type=int, help="port of the fixture server", default=8931)
+    args = parser.parse_args()
+
+    server = start_server(args.port, num_pages=args.pages * 2)
+    url = "http://127.0.0.1:{}/page/0.html".format(args.port)
+
+    rows = []
+    for workers in args.workers:
+        print("Crawling {:,} pages with {} tokenizer worker(s)...".format(args.pages, workers))
+        # pages already being tokenized when the item count is reached are still written, so rates are per page written
+        measurements = run_isolated(crawl_site, url, args.pages, workers, args.pool, args.concurrent_requests)
+        rows.append([
+            workers or "none (reactor thread)",
+            measurements["result"],
+            round(measurements["seconds"], 2),
+            round(measurements["result"] / measurements["seconds"], 1)
+        ])
+
+    server.terminate()
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["tokenizer workers", "pages scraped", "crawl (s)", "pages/s"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+from classes.corpus_indexer import CorpusIndexer
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import run_isolated
+
+from tabulate import tabulate
+
+import argparse
+import os
+import tempfile
+
+
+def build_stats_and_index(file_path):
+    """
+    Run the stats and index construction on a crawler output, like main.run_spider does.
+    :param file_path: path of the crawler's output
+    :return: number of distinct terms in the index
+    """
+    corpus_indexer = CorpusIndexer(file_path)
+    corpus_indexer.construct()
+    return len(corpus_indexer.get_index())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the peak memory of reading a JSON feed and a JSON lines feed.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", help="numbers of documents in the synthetic corpora", default=[1000, 4000, 16000])
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=5000)
+    args = parser.parse_args()
+
+    rows = []
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        os.chdir(directory)
+
+        for size in args.sizes:
+            row = ["{:,}".format(size)]
+            for feed in ["results.json", "results.jl"]:
+                print("Generating {} with {:,} documents...".format(feed, size))
+                generate_corpus(feed, size, args.terms, args.vocabulary)
+                measurements = run_isolated(build_stats_and_index, os.path.join(directory, feed))
+                row.extend([
+                    round(os.path.getsize(feed) / (1024 * 1024), 1),
+                    round(measurements["peak_rss_mb"] - measurements["baseline_rss_mb"], 1),
+                    round(measurements["seconds"], 2)
+                ])
+                os.remove(feed)
+            rows.append(row)
+
+        os.chdir("/")
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["documents", "json (MB)", "json peak RSS growth (MB)", "json (s)", "jsonlines (MB)", "jsonlines peak RSS growth (MB)", "jsonlines (s)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+from benchmarks.corpus import generate_vocabulary
+
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+import hashlib
+import multiprocessing
+import random
+import socket
+import time
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# time at which every page was first published, to which a day is added for each revision of a page
+first_published = 1500000000
+
+
+def get_page_version(number, revision, change_rate, delete_rate):
+    """
+    Find which version of a page a revision of the site has. At each revision after the first one, change_rate of the
+    pages are edited, and delete_rate of them are deleted. The first page is never deleted, so the site can be crawled.
+    :param number: number of the page
+    :param revision: revision of the site
+    :param change_rate: share of the pages edited at each revision
+    :param delete_rate: share of the pages deleted at each revision
+    :return: the last revision the page was edited in, 0 if it never was, or None if the page was deleted
+    """
+    version = 0
+    for past_revision in range(1, revision + 1):
+        if number and random.Random("delete {} {}".format(number, past_revision)).random() < delete_rate:
+            return None
+        if random.Random("change {} {}".format(number, past_revision)).random() < change_rate:
+            version = past_revision
+    return version
+
+
+def render_page(number, num_pages, paragraphs, vocabulary, sites=None, duplicates=False, print_view=False, version=0):
+    """
+    Render a deterministic HTML page, with paragraphs of text and links to a few other pages.
+    :param number: number of the page
+    :param num_pages: number of pages on the site
+    :param paragraphs: number of paragraphs on the page
+    :param vocabulary: words the text is made of
+    :param sites: base URLs of the sites the links are spread across, None for relative links to the same site
+    :param duplicates: whether or not the page also links to near-duplicates of pages: a print view, and the same URL
+    with a tracking parameter
+    :param print_view: whether or not the page is the print view of the page, with the same text and a short footer
+    :param version: version of the page, each of which has different text, and the same links
+    :return: the page, encoded in UTF-8
+    """
+    generator = random.Random("{} {}".format(number, version) if version else number)
+
+    body = ["<h1>{}Page {}</h1>".format("Print version: " if print_view else "", number)]
+    for _ in range(paragraphs):
+        words = generator.choices(vocabulary, k=80)
+        body.append("<p>{}. <span>{}!</span></p>".format(" ".join(words[:60]), ", ".join(words[60:])))
+    for link in range(1, 6):
+        site = sites[(number + link) % len(sites)] if sites else ""
+        body.append('<a href="{}/page/{}.html">next</a>'.format(site, (number * 5 + link) % num_pages))
+    if duplicates:
+        body.append('<a href="/print/{}.html">print</a>'.format(number))
+        body.append('<a href="/page/{}.html?utm_source=link">share</a>'.format((number * 5 + 1) % num_pages))
+    if print_view:
+        body.append("<footer>Printed from the fixture site, page {} of {}.</footer>".format(number, num_pages))
+
+    return "<html><head><title>Page {}</title></head><body>{}</body></html>".format(number, "".join(body)).encode("utf-8")
+
+
+def serve(port, num_pages, paragraphs, host="127.0.0.1", sites=None, latency=0.0, duplicates=False,
+          revision=0, change_rate=0.0, delete_rate=0.0, validators=True):
+    """
+    Serve a site of synthetic pages at /page/<number>.html on localhost, until the process is terminated, with their
+    print views at /print/<number>.html.
+    Connections are kept alive between requests, like most web servers do. Like a static file server, each page has an
+    ETag, a hash of its content, and a Last-Modified date, the day of its version, and conditional requests for a page
+    which didn't change are answered with 304 Not Modified.
+    :param port: port to listen on
+    :param num_pages: number of pages on the site
+    :param paragraphs: number of paragraphs per page
+    :param host: loopback address to listen on
+    :param sites: base URLs of the sites the links are spread across, None for relative links to the same site
+    :param latency: seconds to wait before answering each request, like a server further away
+    :param duplicates: whether or not pages link to near-duplicates of pages, see render_page
+    :param revision: revision of the site, after which some pages were edited or deleted, see get_page_version
+    :param change_rate: share of the pages edited at each revision
+    :param delete_rate: share of the pages deleted at each revision
+    :param validators: whether or not pages have an ETag and a Last-Modified date, and conditional requests are answered
+    :return: None
+    """
+    vocabulary = generate_vocabulary(5000) + ["good", "bad", "happy", "sad", "great", "terrible"]
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            try:
+                number = int(self.path.rsplit("/", 1)[-1].split(".")[0])
+            except ValueError:
+                number = -1
+
+            version = get_page_version(number, revision, change_rate, delete_rate) if 0 <= number < num_pages else None
+            if self.path == "/robots.txt" or version is None:
+                self.send_error(404)
+                return
+
+            page = render_page(number, num_pages, paragraphs, vocabulary, sites, duplicates, self.path.startswith("/print/"), version)
+            etag = '"{}"'.format(hashlib.blake2b(page, digest_size=8).hexdigest())
+            last_modified = formatdate(first_published + version * 86400, usegmt=True)
+
+            if validators and self.is_not_modified(etag, first_published + version * 86400):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            if validators:
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(page)
+
+        def is_not_modified(self, etag, modified):
+            """
+            :param etag: ETag of the page
+            :param modified: time the page was last modified
+            :return: True if the request is conditional, and the page didn't change since the client's copy. The
+            If-None-Match header takes precedence over If-Modified-Since
+            """
+            if self.headers.get("If-None-Match"):
+                return etag in [tag.strip() for tag in self.headers["If-None-Match"].split(",")]
+            if self.headers.get("If-Modified-Since"):
+                try:
+                    return modified <= parsedate_to_datetime(self.headers["If-Modified-Since"]).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def log_message(self, format, *args):
+            pass
+
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+def start_server(port, num_pages=1000, paragraphs=40, revision=0, change_rate=0.0, delete_rate=0.0, validators=True):
+    """
+    Start the fixture server in its own process, so that serving pages doesn't compete with the crawler for the GIL.
+    :param port: port to listen on
+    :param num_pages: number of pages on the site
+    :param paragraphs: number of paragraphs per page
+    :param revision: revision of the site, see get_page_version
+    :param change_rate: share of the pages edited at each revision
+    :param delete_rate: share of the pages deleted at each revision
+    :param validators: whether or not pages have an ETag and a Last-Modified date, and conditional requests are answered
+    :return: the server's process, to be terminated once done
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port, num_pages, paragraphs, "127.0.0.1", None, 0.0, False, revision, change_rate, delete_rate, validators), daemon=True
+    )
+    process.start()
+    wait_for_server("127.0.0.1", port)
+    return process
+
+
+def start_sites(port, num_sites=4, num_pages=1000, paragraphs=40, latency=0.0, duplicates=False):
+    """
+    Start several fixture sites, each on its own host, so that the crawler sees as many domains, with links across
+    them. The hosts are loopback addresses 127.0.0.1, 127.0.0.2, etc., which all reach this machine on Linux. Each site
+    is served by its own process.
+    :param port: port every site listens on
+    :param num_sites: number of sites
+    :param num_pages: number of pages on each site
+    :param paragraphs: number of paragraphs per page
+    :param latency: seconds each site waits before answering a request
+    :param duplicates: whether or not pages link to near-duplicates of pages, see render_page
+    :return: the sites' processes, to be terminated once done, and the sites' base URLs
+    """
+    hosts = ["127.0.0.{}".format(site + 1) for site in range(num_sites)]
+    sites = ["http://{}:{}".format(host, port) for host in hosts]
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(port, num_pages, paragraphs, host, sites, latency, duplicates), daemon=True)
+        for host in hosts
+    ]
+    for process in processes:
+        process.start()
+    for host in hosts:
+        wait_for_server(host, port)
+
+    return processes, sites
+
+
+def wait_for_server(host, port):
+    """
+    Wait until a server accepts connections.
+    :param host: address of the server
+    :param port: port of the server
+    :return: None
+    """
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
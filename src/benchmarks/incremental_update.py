@@ -0,0 +1,93 @@
+from helpers import PAGES, URLS
+from classes.corpus_indexer import CorpusIndexer
+from classes.segments import SegmentSet
+from benchmarks.corpus import generate_corpus
+
+from tabulate import tabulate
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+
+def index_into_segment(segment_set, file_path):
+    """
+    Index a crawler output into a new segment, like main.run_spider does.
+    :param segment_set: the set of segments
+    :param file_path: path of the crawler's output
+    :return: None
+    """
+    directory = segment_set.new_segment()
+    corpus_indexer = CorpusIndexer(file_path, directory)
+    with contextlib.redirect_stdout(io.StringIO()):
+        corpus_indexer.construct()
+    segment_set.add_segment(directory, len(corpus_indexer.get_stats()[URLS]))
+
+
+def timed(function, *args):
+    """
+    :param function: function to time
+    :param args: arguments of the function
+    :return: duration of the call, in seconds
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rebuilding the index with adding a segment for new pages.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the existing index", default=20000)
+    parser.add_argument("-n", "--new", type=float, help="percentage of new documents", default=1.0)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    args = parser.parse_args()
+
+    num_new = max(1, int(args.documents * args.new / 100))
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        os.chdir(directory)
+
+        print("Generating {:,} documents, and {:,} new ones...".format(args.documents, num_new))
+        generate_corpus("existing.jl", args.documents, args.terms)
+        generate_corpus("new.jl", num_new, args.terms, seed=1, first_document=args.documents)
+
+        with open("all.jl", "w", encoding="utf-8") as all_file:
+            for file_name in ["existing.jl", "new.jl"]:
+                with open(file_name, encoding="utf-8") as part_file:
+                    shutil.copyfileobj(part_file, all_file)
+
+        full_rebuild = timed(index_into_segment, SegmentSet("full"), "all.jl")
+
+        segment_set = SegmentSet("incremental")
+        index_into_segment(segment_set, "existing.jl")
+        incremental = timed(index_into_segment, segment_set, "new.jl")
+
+        load = timed(segment_set.load)
+        index, stats = segment_set.load()
+        num_live = len(stats[PAGES])
+        index.close()
+
+        merge = timed(segment_set.merge_all)
+
+        os.chdir("/")
+
+    print(tabulate(
+        tabular_data=[
+            ["full rebuild", "{:,}".format(args.documents + num_new), round(full_rebuild, 3)],
+            ["incremental (new segment)", "{:,}".format(num_new), round(incremental, 3)],
+            ["load both segments", "{:,}".format(num_live), round(load, 3)],
+            ["merge both segments", "{:,}".format(num_live), round(merge, 3)],
+        ],
+        headers=["operation", "documents processed", "time (s)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("Incremental update is {:.1f}x faster than a full rebuild.".format(full_rebuild / incremental))
+
+
+if __name__ == '__main__':
+    main()
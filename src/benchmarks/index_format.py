@@ -0,0 +1,126 @@
+from helpers import PAGES, URLS, TF, CFT, DFT, IDF, TF_IDF, SENTIMENT
+from classes.corpus_indexer import CorpusIndexer
+from classes.index_builder import IndexBuilder
+from classes.disk_index import DiskIndex
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import run_isolated
+
+from tabulate import tabulate
+
+import argparse
+import os
+import tempfile
+
+
+def write_text_index(index, urls, file_path):
+    """
+    Write the index in the text format used before the binary one, one line per term, with the URLs of the documents.
+    :param index: the inverted index
+    :param urls: URL of each document ID
+    :param file_path: path of the text file
+    :return: None
+    """
+    with open(file_path, "w", encoding="utf-8") as index_file:
+        for term in sorted(index):
+            index_file.write("{} {} {} {} {}".format(term, index[term][CFT], index[term][DFT], index[term][IDF], index[term][SENTIMENT]))
+            postings = index[term][PAGES]
+            for doc_id, tf, weight in zip(postings.doc_ids, postings.tfs, postings.weights):
+                index_file.write(" {} {} {}".format(urls[doc_id], tf, weight))
+            index_file.write("\n")
+
+
+def load_text_index(file_path, terms):
+    """
+    Load the whole text index, like the crawler did before, then look up the terms of a query.
+    :param file_path: path of the text file
+    :param terms: terms of the query
+    :return: total number of postings of the terms
+    """
+    index = {}
+
+    with open(file_path) as index_file:
+
+        for line in index_file.readlines():
+
+            elements = line.split()
+
+            index[elements[0]] = {}
+            index[elements[0]][CFT] = int(elements[1])
+            index[elements[0]][DFT] = int(elements[2])
+            index[elements[0]][IDF] = float(elements[3])
+            index[elements[0]][SENTIMENT] = float(elements[4])
+
+            index[elements[0]][PAGES] = {}
+
+            for i in range(5, len(elements), 3):
+                index[elements[0]][PAGES][elements[i]] = {}
+                index[elements[0]][PAGES][elements[i]][TF] = int(elements[i + 1])
+                index[elements[0]][PAGES][elements[i]][TF_IDF] = float(elements[i + 2])
+
+    return sum(len(index[term][PAGES]) for term in terms if term in index)
+
+
+def load_binary_index(prefix, terms):
+    """
+    Open the memory-mapped index, then look up the terms of a query.
+    :param prefix: path of the index files, without their extension
+    :param terms: terms of the query
+    :return: total number of postings of the terms
+    """
+    index = DiskIndex(prefix)
+    postings = sum(len(index[term][PAGES]) for term in terms if term in index)
+    index.close()
+    return postings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loading the text index with opening the binary index.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=5000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        os.chdir(directory)
+
+        print("Generating a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.json", args.documents, args.terms, args.vocabulary)
+        # a few frequent terms, and a few rare ones
+        query_terms = vocabulary[:3] + vocabulary[len(vocabulary) // 2:len(vocabulary) // 2 + 3]
+
+        corpus_indexer = CorpusIndexer("results.json")
+        corpus_indexer.construct()
+
+        text_file = os.path.join(directory, "index.txt")
+        write_text_index(corpus_indexer.get_index(), corpus_indexer.get_stats()[URLS], text_file)
+        binary_prefix = os.path.join(directory, IndexBuilder.index_file)
+
+        text = run_isolated(load_text_index, text_file, query_terms)
+        binary = run_isolated(load_binary_index, binary_prefix, query_terms)
+
+        text_size = os.path.getsize(text_file)
+        binary_size = sum(os.path.getsize(binary_prefix + extension) for extension in DiskIndex.extensions)
+
+        os.chdir("/")
+
+    rows = []
+    for name, size, measurements in [("text", text_size, text), ("binary (mmap)", binary_size, binary)]:
+        rows.append([
+            name,
+            round(size / (1024 * 1024), 2),
+            round(measurements["seconds"], 4),
+            round(measurements["peak_rss_mb"], 1),
+            round(measurements["peak_rss_mb"] - measurements["baseline_rss_mb"], 1),
+            measurements["result"]
+        ])
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["format", "size (MB)", "load + lookup (s)", "peak RSS (MB)", "RSS growth (MB)", "postings read"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from helpers import read_results, PAGES, URL, CONTENT, TF, CFT, DFT, IDF, TF_IDF, log10
+from classes.corpus_indexer import CorpusIndexer
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import run_isolated
+
+from tabulate import tabulate
+
+from collections import Counter
+from contextlib import redirect_stdout
+
+import argparse
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+
+
+def build_url_keyed_index(file_path):
+    """
+    Build the index the way it was before document IDs, with every posting keyed by its URL and holding a dictionary.
+    :param file_path: path of the corpus
+    :return: memory held by the index, in megabytes, and its number of postings
+    """
+    with open(file_path) as corpus_file:
+        results = json.load(corpus_file)
+
+    tracemalloc.start()
+
+    index = {}
+    for result in results:
+        url = result[URL]
+        for term, frequency in Counter(result[CONTENT]).items():
+            if term not in index:
+                index[term] = {CFT: 0, PAGES: {}}
+            index[term][CFT] += frequency
+            index[term][PAGES][url] = {TF: frequency}
+
+    for term in index:
+        index[term][DFT] = len(index[term][PAGES])
+        index[term][IDF] = log10(len(results) / index[term][DFT])
+        for url in index[term][PAGES]:
+            index[term][PAGES][url][TF_IDF] = index[term][PAGES][url][TF] * index[term][IDF]
+
+    # the URL strings are shared with the corpus, so they aren't counted, which is in favour of this index
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory / (1024 * 1024), sum(len(entry[PAGES]) for entry in index.values())
+
+
+def build_id_keyed_index(file_path):
+    """
+    Build the index with CorpusIndexer, with postings as arrays of document IDs, without writing it. The memory also
+    counts the stats of the pages, with their URLs, which is in favour of the other index.
+    :param file_path: path of the corpus
+    :return: memory held by the index, in megabytes, and its number of postings
+    """
+    tracemalloc.start()
+
+    corpus_indexer = CorpusIndexer(file_path)
+    for result in read_results(file_path):
+        corpus_indexer.add_result(result)
+    with redirect_stdout(io.StringIO()):
+        corpus_indexer.document_parser.compute_totals()
+        corpus_indexer.index_builder.compute_weights()
+
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    index = corpus_indexer.get_index()
+    return memory / (1024 * 1024), sum(len(entry[PAGES]) for entry in index.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory of URL-keyed postings with array-backed postings.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=50000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=200)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        os.chdir(directory)
+
+        print("Generating a corpus of {:,} documents...".format(args.documents))
+        generate_corpus("results.json", args.documents, args.terms, args.vocabulary)
+        corpus = os.path.join(directory, "results.json")
+
+        url_keyed = run_isolated(build_url_keyed_index, corpus)
+        id_keyed = run_isolated(build_id_keyed_index, corpus)
+
+        os.chdir("/")
+
+    rows = []
+    for name, measurements in [("URL keys + dict per posting", url_keyed), ("doc IDs + arrays", id_keyed)]:
+        memory, postings = measurements["result"]
+        rows.append([
+            name,
+            "{:,}".format(postings),
+            round(memory, 1),
+            round(memory * 1024 * 1024 / postings, 1),
+            round(measurements["seconds"], 2)
+        ])
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["postings", "count", "index memory (MB)", "bytes per posting", "build (s)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("Memory reduction: {:.1f}x".format(url_keyed["result"][0] / id_keyed["result"][0]))
+
+
+if __name__ == '__main__':
+    main()
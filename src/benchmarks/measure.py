@@ -0,0 +1,61 @@
+import multiprocessing
+import resource
+import sys
+import time
+
+
+def peak_rss():
+    """
+    Get the peak resident set size of the current process.
+    :return: peak RSS, in megabytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss():
+    """
+    Get the current resident set size of the process. Falls back to the peak RSS where /proc isn't available.
+    :return: current RSS, in megabytes
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return peak_rss()
+
+
+def run_target(target, args, queue):
+    """
+    Run the target in the child process, and send back its duration and memory usage.
+    :param target: function to run
+    :param args: arguments of the function
+    :param queue: queue the measurements are sent through
+    :return: None
+    """
+    rss_before = peak_rss()
+    start = time.perf_counter()
+    result = target(*args)
+    seconds = time.perf_counter() - start
+    queue.put({"seconds": seconds, "peak_rss_mb": peak_rss(), "baseline_rss_mb": rss_before, "result": result})
+
+
+def run_isolated(target, *args):
+    """
+    Run a function in a fresh process, so that its peak memory usage isn't hidden by whatever the benchmark itself
+    allocated beforehand.
+    :param target: module-level function to run
+    :param args: arguments of the function, which have to be picklable
+    :return: dictionary with the duration, the peak RSS, the RSS before the call, and the function's return value
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_target, args=(target, args, queue))
+    process.start()
+    measurements = queue.get()
+    process.join()
+    return measurements
@@ -0,0 +1,143 @@
+from helpers import tokenize_page
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.query import AndQuery, OrQuery
+from classes.query_cache import QueryCache
+from classes.batch_queries import BatchQueryRunner
+from classes.metrics import Metrics
+from benchmarks.corpus import generate_corpus, generate_query_log
+from benchmarks.tokenizer_throughput import generate_pages
+from benchmarks.measure import run_isolated
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import tempfile
+import time
+import timeit
+
+
+def run_stages(corpus, directory, queries_path, num_pages, enabled):
+    """
+    Tokenize pages, index the corpus, open the index, and conduct the queries of the log, with measuring enabled or not.
+    :param corpus: path of the corpus
+    :param directory: directory the stats and the index are written to
+    :param queries_path: path of the query log
+    :param num_pages: number of pages tokenized
+    :param enabled: whether measuring is enabled
+    :return: seconds of each part of the run, and the number of calls of the timed stages
+    """
+    if enabled:
+        Metrics.enable()
+
+    pages = generate_pages(num_pages)
+    queries = BatchQueryRunner.read_queries(queries_path)
+    seconds = {}
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for texts in pages:
+            tokenize_page(texts)
+        seconds["tokenize"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        CorpusIndexer(corpus, directory).construct()
+        seconds["index"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = IndexBuilder.build_index_from_file(directory)
+        stats = DocumentParser.build_stats_from_file(directory)
+        for query in (AndQuery(index, stats), OrQuery(index, stats)):
+            query.cache = QueryCache(max_entries=0)
+            for text in queries:
+                query.execute(text)
+        seconds["query"] = time.perf_counter() - start
+        index.close()
+
+    calls = sum(timer["calls"] for timer in Metrics.timers.values()) + sum(
+        histogram["count"] for modes in Metrics.histograms.values() for histogram in modes.values()
+    )
+    return seconds, calls
+
+
+def stage():
+    """
+    Stage doing nothing, to measure what timing a call costs.
+    """
+    return None
+
+
+def per_call():
+    """
+    Measure what a timed function costs on top of the function itself, with measuring disabled and enabled.
+    :return: nanoseconds per call of the function, of the disabled timed function, and of the enabled one
+    """
+    timed_stage = Metrics.timed("stage")(stage)
+    number = 1000000
+    plain = min(timeit.repeat(stage, number=number, repeat=5)) / number * 1e9
+    Metrics.disable()
+    disabled = min(timeit.repeat(timed_stage, number=number, repeat=5)) / number * 1e9
+    Metrics.enable()
+    enabled = min(timeit.repeat(timed_stage, number=number, repeat=5)) / number * 1e9
+    Metrics.disable()
+    return plain, disabled, enabled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure what the instrumentation of the stages costs, with measuring disabled and enabled.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=5000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries in the query log", default=500)
+    parser.add_argument("-p", "--pages", type=int, help="number of pages tokenized", default=200)
+    parser.add_argument("-r", "--repeats", type=int, help="number of runs with measuring disabled and enabled, of which the fastest is kept", default=3)
+    args = parser.parse_args()
+
+    runs = {False: [], True: []}
+    with tempfile.TemporaryDirectory() as directory:
+        print("Generating a corpus of {:,} documents, and a log of {:,} queries...".format(args.documents, args.queries))
+        corpus = os.path.join(directory, "results.json")
+        queries_path = os.path.join(directory, "queries.txt")
+        vocabulary = generate_corpus(corpus, args.documents)
+        generate_query_log(queries_path, vocabulary, args.queries)
+
+        print("Running the stages {} times with measuring disabled, and as many times enabled...".format(args.repeats))
+        for _ in range(args.repeats):
+            for enabled in (False, True):
+                runs[enabled].append(run_isolated(run_stages, corpus, directory, queries_path, args.pages, enabled)["result"])
+
+    plain, disabled, enabled = per_call()
+    calls = runs[True][0][1]
+
+    rows = []
+    for part in ("tokenize", "index", "query"):
+        fastest = {measuring: min(seconds[part] for seconds, _ in runs[measuring]) for measuring in runs}
+        rows.append([
+            part,
+            round(fastest[False], 3),
+            round(fastest[True], 3),
+            "{:+.1f}%".format((fastest[True] / fastest[False] - 1) * 100)
+        ])
+    total = min(sum(seconds.values()) for seconds, _ in runs[False])
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["stages", "measuring disabled (s)", "measuring enabled (s)", "enabled"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print(tabulate(
+        tabular_data=[["function", round(plain, 1)], ["timed, measuring disabled", round(disabled, 1)], ["timed, measuring enabled", round(enabled, 1)]],
+        headers=["call of a function doing nothing", "ns per call"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} timed calls and query latencies in a run of {}s. They cost about {} ms ({:.3f}%) with measuring disabled, and {} ms ({:.3f}%) enabled.".format(
+        calls, round(total, 2),
+        round(calls * (disabled - plain) / 1e6, 2), calls * (disabled - plain) / 1e9 / total * 100,
+        round(calls * (enabled - plain) / 1e6, 2), calls * (enabled - plain) / 1e9 / total * 100
+    ))
+
+
+if __name__ == '__main__':
+    main()
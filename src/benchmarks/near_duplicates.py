@@ -0,0 +1,123 @@
+from classes.near_duplicates import NearDuplicates
+from benchmarks.corpus import generate_vocabulary
+
+from tabulate import tabulate
+
+import argparse
+import json
+import random
+import time
+
+
+def generate_pages(num_pages, terms_per_page, vocabulary_size, duplicate_rate, change_rate, seed=0):
+    """
+    Generate pages with a Zipfian distribution of terms, and near-duplicates of some of them among them. Like a print
+    view or a templated listing, a near-duplicate has the terms of its page, with a run of them replaced, and a short
+    run of other terms added at its end.
+    :param num_pages: number of distinct pages
+    :param terms_per_page: average number of terms in a page
+    :param vocabulary_size: number of distinct terms
+    :param duplicate_rate: number of near-duplicates per distinct page
+    :param change_rate: share of the terms of a near-duplicate which are replaced or added
+    :param seed: seed of the random generator
+    :return: list of (URL, terms, URL of the page it's a near-duplicate of or None), shuffled
+    """
+    generator = random.Random(seed)
+    vocabulary = generate_vocabulary(vocabulary_size, seed)
+    weights = [1 / rank for rank in range(1, vocabulary_size + 1)]
+
+    pages = []
+    for number in range(num_pages):
+        length = generator.randint(terms_per_page // 2, terms_per_page * 3 // 2)
+        pages.append(("https://www.example.com/pages/{}.html".format(number), generator.choices(vocabulary, weights=weights, k=length), None))
+
+    for number in range(int(num_pages * duplicate_rate)):
+        url, terms, _ = pages[generator.randrange(num_pages)]
+        changed = max(2, int(len(terms) * change_rate))
+        start = generator.randrange(len(terms) - changed // 2)
+        terms = terms[:start] + generator.choices(vocabulary, k=changed // 2) + terms[start + changed // 2:]
+        terms += generator.choices(vocabulary, k=changed - changed // 2)
+        pages.append(("{}?print={}".format(url, number), terms, url))
+
+    # originals come before their near-duplicates, like pages linking to their print view
+    originals, duplicates = pages[:num_pages], pages[num_pages:]
+    generator.shuffle(originals)
+    generator.shuffle(duplicates)
+    return originals + duplicates
+
+
+def linear_scan(fingerprints, threshold):
+    """
+    Detect the near-duplicates by comparing each page to every page kept before it.
+    :param fingerprints: fingerprint of each page, in the order they're scraped
+    :param threshold: largest number of bits the fingerprints of two near-duplicates differ by
+    :return: set of the positions of the near-duplicates
+    """
+    kept = []
+    found = set()
+    for position, fingerprint in enumerate(fingerprints):
+        if any(bin(fingerprint ^ other).count("1") <= threshold for other in kept):
+            found.add(position)
+        else:
+            kept.append(fingerprint)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure near-duplicate detection with SimHash and LSH banding, compared to comparing every page.")
+    parser.add_argument("-d", "--documents", type=int, help="number of distinct pages", default=3000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per page", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=20000)
+    parser.add_argument("-r", "--duplicate-rate", type=float, help="number of near-duplicates per distinct page", default=0.2)
+    parser.add_argument("-c", "--change-rate", type=float, help="share of the terms of a near-duplicate which are replaced or added", default=0.02)
+    parser.add_argument("-th", "--thresholds", type=int, nargs="+", help="thresholds to compare", default=[3, 4, 5, 6])
+    args = parser.parse_args()
+
+    pages = generate_pages(args.documents, args.terms, args.vocabulary, args.duplicate_rate, args.change_rate)
+    planted = {position for position, (_, _, original) in enumerate(pages) if original is not None}
+
+    start = time.perf_counter()
+    fingerprints = [NearDuplicates.fingerprint(terms) for _, terms, _ in pages]
+    fingerprint_time = time.perf_counter() - start
+
+    rows = []
+    for threshold in args.thresholds:
+        near_duplicates = NearDuplicates(threshold)
+        found = set()
+        start = time.perf_counter()
+        for position, ((url, _, _), fingerprint) in enumerate(zip(pages, fingerprints)):
+            if near_duplicates.find(fingerprint) is None:
+                near_duplicates.add(url, fingerprint)
+            else:
+                found.add(position)
+        lsh_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert linear_scan(fingerprints, threshold) == found, "LSH banding missed near-duplicates"
+        scan_time = time.perf_counter() - start
+
+        tokens = sum(len(pages[position][1]) for position in found)
+        feed_bytes = sum(len(json.dumps({"url": pages[position][0], "content": pages[position][1]})) for position in found)
+        rows.append([
+            threshold,
+            "{}%".format(round(len(found & planted) / len(planted) * 100, 1)) if planted else "-",
+            len(found - planted),
+            round(lsh_time * 1e6 / len(pages), 1),
+            round(scan_time * 1e6 / len(pages), 1),
+            "{:,}".format(tokens),
+            "{:,}".format(feed_bytes)
+        ])
+
+    print("LSH banding finds the same near-duplicates as comparing every page.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["threshold (bits)", "recall", "false positives", "LSH (µs/page)", "linear scan (µs/page)", "tokens saved", "feed bytes saved"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} pages, {:,} of them near-duplicates with {}% of their terms replaced or added. Fingerprinting took {} ms per page.".format(
+        len(pages), len(planted), round(args.change_rate * 100, 1), round(fingerprint_time * 1000 / len(pages), 3)
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+from helpers import read_results, PAGES, CONTENT
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.disk_index import DiskIndex
+from classes.query import AndQuery, PhraseQuery
+from benchmarks.corpus import generate_corpus
+from benchmarks.measure import run_isolated
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+
+def build_index(file_path, directory, positional):
+    """
+    Build the stats and the index, with or without the positions of the terms, and write them to a directory.
+    :param file_path: path of the corpus
+    :param directory: directory the stats and the index are written to
+    :param positional: whether or not the positions of the terms are kept
+    :return: memory held by the stats and the index, in megabytes, and the number of postings and of positions in it
+    """
+    with redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        corpus_indexer = CorpusIndexer(file_path, directory, positional)
+        corpus_indexer.construct()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+    index = corpus_indexer.get_index()
+    num_postings = sum(len(entry[PAGES]) for entry in index.values())
+    num_positions = sum(sum(entry[PAGES].tfs) for entry in index.values())
+    return memory / (1024 * 1024), num_postings, num_positions
+
+
+def sample_phrases(documents, length, count, generator):
+    """
+    Pick phrases out of the pages, so that every phrase is in at least one page.
+    :param documents: terms of each page
+    :param length: number of terms of each phrase
+    :param count: number of phrases
+    :param generator: random generator
+    :return: list of phrases, as lists of terms
+    """
+    phrases = []
+    while len(phrases) < count:
+        terms = generator.choice(documents)
+        if len(terms) >= length:
+            start = generator.randrange(len(terms) - length + 1)
+            phrases.append(terms[start:start + length])
+    return phrases
+
+
+def scan_phrase(documents, phrase):
+    """
+    Find the pages containing a phrase by going through the terms of every page.
+    :param documents: terms of each page, by ID
+    :param phrase: terms of the phrase
+    :return: sorted list of the IDs of the pages containing the phrase
+    """
+    length = len(phrase)
+    return [
+        doc_id for doc_id, terms in enumerate(documents)
+        if any(terms[start:start + length] == phrase for start in range(len(terms) - length + 1))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare phrase queries on a positional index with AND queries on an index without positions.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=10000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of phrases of each length", default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating a corpus of {:,} documents, and indexing it with and without positions...".format(args.documents))
+        generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus = os.path.join(directory, "results.jl")
+        documents = [result[CONTENT] for result in read_results(corpus)]
+
+        builds = {}
+        indexes = {}
+        for positional in (False, True):
+            index_directory = os.path.join(directory, "positional" if positional else "plain")
+            os.makedirs(index_directory)
+            builds[positional] = run_isolated(build_index, corpus, index_directory, positional)
+            prefix = os.path.join(index_directory, IndexBuilder.index_file)
+            indexes[positional] = (
+                IndexBuilder.build_index_from_file(index_directory),
+                DocumentParser.build_stats_from_file(index_directory),
+                sum(os.path.getsize(prefix + extension) for extension in DiskIndex.extensions)
+            )
+
+        rows = []
+        for positional in (False, True):
+            memory, postings, positions = builds[positional]["result"]
+            rows.append([
+                "with positions" if positional else "without positions",
+                round(memory, 1),
+                round(indexes[positional][2] / (1024 * 1024), 2),
+                round(indexes[positional][2] / postings, 2),
+                round(builds[positional]["seconds"], 2)
+            ])
+
+        index, stats, _ = indexes[False]
+        and_query = AndQuery(index, stats)
+        positional_index, positional_stats, _ = indexes[True]
+        phrase_query = PhraseQuery(positional_index, positional_stats)
+
+        generator = random.Random(0)
+        latency_rows = []
+        for length in (2, 3, 4):
+            phrases = sample_phrases(documents, length, args.queries, generator)
+
+            # a phrase is found in the same pages as by going through the terms of every page
+            for phrase in phrases:
+                assert sorted(doc_id for doc_id, _ in phrase_query.rank(phrase)) == scan_phrase(documents, phrase), "the pages of {} differ".format(phrase)
+
+            row = [length]
+            for query in (and_query, phrase_query):
+                start = time.perf_counter()
+                results = sum(len(query.rank(phrase)) for phrase in phrases)
+                row.append(round((time.perf_counter() - start) / len(phrases) * 1000, 3))
+                row.append(round(results / len(phrases), 1))
+            latency_rows.append(row)
+
+        for index, _, _ in indexes.values():
+            index.close()
+        os.chdir("/")
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["index", "memory while building (MB)", "files (MB)", "bytes per posting on disk", "build (s)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("Phrase queries find the same pages as going through the terms of every page.")
+    print(tabulate(
+        tabular_data=latency_rows,
+        headers=["phrase terms", "AND without positions (ms/query)", "AND results", "phrase (ms/query)", "phrase results"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} documents, {:,} postings, {:,} positions.".format(args.documents, builds[True]["result"][1], builds[True]["result"][2]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+from helpers import PAGES, URLS, MAX_IMPACT
+from classes.corpus_indexer import CorpusIndexer
+from classes.disk_index import DiskIndex
+from classes.postings import Postings
+from classes.compressed_postings import CompressedPostings
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def raw_columns(index, terms):
+    """
+    Lay the postings out like the files written before the postings were compressed: the document IDs, term frequencies
+    and tf-idf values of each term, as three raw columns.
+    :param index: the inverted index
+    :param terms: terms to lay out, in order
+    :return: the columns as bytes, and the offset of each term's columns
+    """
+    buffer = bytearray()
+    offsets = []
+    for term in terms:
+        offsets.append(len(buffer))
+        postings = index[term][PAGES]
+        for column in (postings.doc_ids, postings.tfs, postings.weights):
+            buffer.extend(column.tobytes())
+    return bytes(buffer), offsets
+
+
+def decode_raw(buffer, offsets, lengths):
+    """
+    Decode every term's postings from raw columns, like DiskIndex did before.
+    :param buffer: the raw columns
+    :param offsets: offset of each term's columns
+    :param lengths: number of postings of each term
+    :return: number of postings decoded
+    """
+    for offset, length in zip(offsets, lengths):
+        doc_ids = Postings.read_array("I", buffer, offset, length)
+        tfs = Postings.read_array("I", buffer, offset + 4 * length, length)
+        Postings(doc_ids, tfs, Postings.read_array("f", buffer, offset + 8 * length, length))
+    return sum(lengths)
+
+
+def decode_compressed(disk_index, records):
+    """
+    Decode every term's postings from the compressed postings, with their tf-idf values, like a scan of all of the
+    postings does.
+    :param disk_index: the index, opened from its files
+    :param records: record of each term
+    :return: number of postings decoded
+    """
+    for _, _, _, dft, idf, _, offset, max_impact in records:
+        postings = CompressedPostings(disk_index.postings, offset, dft, idf, max_impact)
+        postings.doc_ids, postings.weights
+    return sum(record[3] for record in records)
+
+
+def intersect_queries(disk_index, queries, lazy):
+    """
+    Intersect the postings of each query's terms, read from the index files.
+    :param disk_index: the index, opened from its files
+    :param queries: terms of each query
+    :param lazy: whether the compressed postings are searched with their skip data, or decoded first
+    :return: results of each query, and the share of the blocks of the postings which were decoded
+    """
+    results = []
+    decoded, blocks = 0, 0
+    for terms in queries:
+        lists_of_postings = [disk_index.decode(disk_index.find(term))[PAGES] for term in terms]
+        if not lazy:
+            for postings in lists_of_postings:
+                postings.doc_ids
+        results.append(Postings.intersect(lists_of_postings))
+        for postings in lists_of_postings:
+            decoded += postings.num_blocks if "doc_ids" in postings.__dict__ else len(postings.blocks)
+            blocks += postings.num_blocks
+    return results, decoded / blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the size of the compressed postings, and how fast they're decoded, compared to raw columns.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of AND queries mixing a rare term with common ones", default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl", directory)
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+        disk_index = DiskIndex(corpus_indexer.index_builder.index_file)
+        terms = list(disk_index)
+        records = [record for _, record in disk_index.scan()]
+
+        # the decoded postings are exactly the ones which were written
+        for term, record in zip(terms, records):
+            entry = disk_index.decode(record)
+            postings = entry[PAGES]
+            assert entry[MAX_IMPACT] == index[term][MAX_IMPACT], "the max impact of {} changed".format(term)
+            for column in ("doc_ids", "tfs", "weights"):
+                assert getattr(postings, column) == getattr(index[term][PAGES], column), "the {} of {} changed".format(column, term)
+
+        num_postings = sum(record[3] for record in records)
+        compressed_size = os.path.getsize(disk_index.prefix + ".post")
+        buffer, offsets = raw_columns(index, terms)
+
+        rows = []
+        for name, size, decode, decode_args in [
+            ("raw columns", len(buffer), decode_raw, (buffer, offsets, [record[3] for record in records])),
+            ("compressed", compressed_size, decode_compressed, (disk_index, records))
+        ]:
+            start = time.perf_counter()
+            decode(*decode_args)
+            seconds = time.perf_counter() - start
+            rows.append([
+                name,
+                round(size / (1024 * 1024), 2),
+                round(size / num_postings, 2),
+                round(num_postings / seconds / 1e6, 1)
+            ])
+
+        generator = random.Random(0)
+        rare_terms = [term for term in vocabulary[500:5000] if term in index]
+        queries = [generator.sample(vocabulary[:20], 2) + [generator.choice(rare_terms)] for _ in range(args.queries)]
+        expected = [Postings.intersect([index[term][PAGES] for term in terms]) for terms in queries]
+
+        and_rows = []
+        for name, lazy in [("decode whole postings", False), ("seek with skip data", True)]:
+            start = time.perf_counter()
+            results, decoded = intersect_queries(disk_index, queries, lazy)
+            seconds = time.perf_counter() - start
+            assert results == expected, "the intersections differ"
+            and_rows.append([name, round(seconds / len(queries) * 1000, 3), "{}%".format(round(decoded * 100, 1))])
+
+        disk_index.close()
+        os.chdir("/")
+
+    print("The compressed postings decode to exactly the postings which were written.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["postings", "size (MB)", "bytes per posting", "full decode (M postings/s)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("AND queries of 2 common terms and a rare one, read from the index files, give the same results either way.")
+    print(tabulate(
+        tabular_data=and_rows,
+        headers=["compressed postings", "intersection (ms/query)", "blocks decoded"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} documents, {:,} postings, blocks of {} postings.".format(len(stats[URLS]), num_postings, CompressedPostings.block_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+from helpers import URLS
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import AndQuery, OrQuery
+from classes.query_cache import QueryCache
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare repeated queries with and without the query result cache.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries conducted", default=2000)
+    parser.add_argument("-dq", "--distinct-queries", type=int, help="number of distinct queries users pick from", default=200)
+    parser.add_argument("-k", "--top-k", type=int, help="number of pages kept per query, 0 for all", default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl")
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        os.chdir("/")
+
+    index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+    # a few queries are much more popular than the others, and users type their terms in any order and case
+    generator = random.Random(0)
+    distinct_queries = [generator.sample(vocabulary[:2000], generator.randint(1, 4)) for _ in range(args.distinct_queries)]
+    popularity = [1 / rank for rank in range(1, args.distinct_queries + 1)]
+    queries = []
+    for terms in generator.choices(distinct_queries, weights=popularity, k=args.queries):
+        terms = generator.sample(terms, len(terms))
+        queries.append(" ".join(term.upper() if generator.random() < 0.2 else term for term in terms))
+
+    rows = []
+    for query_class in (OrQuery, AndQuery):
+        rankings = []
+        row = [query_class.__name__]
+        for cache in (QueryCache(max_entries=0), QueryCache()):
+            query = query_class(index, stats)
+            query.cache = cache
+
+            start = time.perf_counter()
+            rankings.append([query.search_batch([text], args.top_k)[0] for text in queries])
+            row.append(round((time.perf_counter() - start) / len(queries) * 1000, 3))
+
+        assert rankings[0] == rankings[1], "the rankings differ"
+
+        row.append(round(row[1] / row[2], 1))
+        row.append("{:.1%}".format(cache.hits / (cache.hits + cache.misses)))
+        row.append(len(cache))
+        rows.append(row)
+
+    print("Both give the same rankings.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["query", "no cache (ms/query)", "cache (ms/query)", "speedup", "hit rate", "cached queries"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} queries picked from {:,} distinct ones, top {} pages each, on {:,} documents.".format(
+        len(queries), args.distinct_queries, args.top_k or "all", len(stats[URLS])
+    ))
+
+
+if __name__ == '__main__':
+    main()
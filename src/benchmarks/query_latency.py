@@ -0,0 +1,99 @@
+from helpers import sqrt, PAGES, URLS, COSINE_SIMILARITY
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import OrQuery
+from classes.tf_idf import TFIDF
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def score_per_result(index, stats, terms, results):
+    """
+    Score the results like Query did before the document norms were stored: for each result, the tf and the idf of
+    every query term are looked up again, and the document's norm is only computed over the query terms.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :param results: IDs of the documents matching the query
+    :return: cosine similarity of each result
+    """
+    tf_idf = TFIDF(index, stats)
+    query_vector = [terms.count(term) * tf_idf.idf(term) for term in terms]
+
+    scores = {}
+    for doc_id in results:
+        document_vector = [tf_idf.tf(term, doc_id) * tf_idf.idf(term) for term in terms]
+        dot_product = sum(i * j for i, j in zip(query_vector, document_vector))
+        try:
+            scores[doc_id] = dot_product / (sqrt(sum(i ** 2 for i in query_vector)) * sqrt(sum(i ** 2 for i in document_vector)))
+        except ZeroDivisionError:
+            scores[doc_id] = 0.0
+    return scores
+
+
+def score_with_accumulators(index, stats, terms, results):
+    """
+    Score the results like Query does: term-at-a-time, with the norms of the documents from the stats.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :param results: IDs of the documents matching the query
+    :return: cosine similarity of each result
+    """
+    query = OrQuery(index, stats)
+    query.terms = terms
+    query.results = results
+    query.get_cosine_similarities()
+    return {doc_id: scores[COSINE_SIMILARITY] for doc_id, scores in query.results_with_cosine_similarity.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cost of scoring OR queries per result and term-at-a-time.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries", default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl")
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        os.chdir("/")
+
+    index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+    # queries of 2 to 4 terms, drawn from the most frequent terms down to rare ones
+    generator = random.Random(0)
+    queries = [generator.sample(vocabulary[:generator.choice([50, 500, 5000])], generator.randint(2, 4)) for _ in range(args.queries)]
+    matches = [set().union(*[index[term][PAGES] for term in terms if term in index]) for terms in queries]
+
+    rows = []
+    for name, score in [("per result and term", score_per_result), ("term-at-a-time", score_with_accumulators)]:
+        start = time.perf_counter()
+        for terms, results in zip(queries, matches):
+            score(index, stats, terms, results)
+        seconds = time.perf_counter() - start
+        rows.append([name, round(seconds / len(queries) * 1000, 2)])
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["scoring", "ms/query"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("Average number of results: {:,}, out of {:,} documents.".format(round(sum(map(len, matches)) / len(matches)), len(stats[URLS])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+from helpers import PAGES, URLS
+from classes.spider import ConcordiaSpider
+from classes.corpus_indexer import CorpusIndexer
+from classes.crawl_report import CrawlReport
+from classes.page_validators import PageValidators
+from classes.segments import SegmentSet
+from benchmarks.fixture_server import start_server
+from benchmarks.measure import run_isolated
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+
+def crawl_site(url, pages, directory, conditional):
+    """
+    Crawl the fixture site, and index the pages into the segments of the directory, like main.run_spider does, without
+    printing anything.
+    The reactor can only be started once per process, so every crawl has to run in its own process.
+    :param url: URL of the first page
+    :param pages: number of pages to crawl
+    :param directory: directory of the segments, and of the store of validators
+    :param conditional: whether or not the pages crawled before are requested with conditional requests
+    :return: number of pages scraped, bytes downloaded, CPU time of the crawl and of the indexing, the re-crawl report,
+    and the URLs of the pages crawled, changed or not
+    """
+    ConcordiaSpider.custom_settings = {"LOG_LEVEL": "WARNING"}
+    os.makedirs(directory, exist_ok=True)
+    segment_set = SegmentSet(directory)
+    validators = PageValidators(os.path.join(directory, PageValidators.validators_file)) if conditional else None
+    feed = os.path.join(directory, ConcordiaSpider.feeds["jsonlines"])
+
+    os.chdir(directory)
+    if os.path.exists(feed):
+        os.remove(feed)
+
+    with redirect_stdout(io.StringIO()):
+        start = time.process_time()
+
+        spider = ConcordiaSpider()
+        spider.crawl(url, obey_robots=False, max=pages, feed_format="jsonlines", validators=validators)
+
+        segment_directory = segment_set.new_segment()
+        corpus_indexer = CorpusIndexer(feed, segment_directory)
+        corpus_indexer.construct()
+        num_documents = len(corpus_indexer.get_stats()[URLS]) if corpus_indexer.get_stats()[PAGES] else 0
+        if num_documents or ConcordiaSpider.deleted_links:
+            segment_set.add_segment(segment_directory, num_documents, ConcordiaSpider.deleted_links)
+        else:
+            segment_set.discard_segment(segment_directory)
+
+        cpu = time.process_time() - start
+
+    if validators is not None:
+        validators.close()
+    os.chdir("/")
+
+    crawled = ConcordiaSpider.scraped_links + ConcordiaSpider.unchanged_links
+    return len(ConcordiaSpider.scraped_links), CrawlReport.domains[None]["bytes"], cpu, CrawlReport.recrawl, crawled
+
+
+def read_pages(directory):
+    """
+    Read the live pages of an index back from its segments.
+    :param directory: directory of the segments
+    :return: dictionary of the term frequencies of each live page, by URL
+    """
+    index, stats = SegmentSet(directory).load()
+    pages = {stats[URLS][doc_id]: {} for doc_id in stats[PAGES]}
+    for term in index:
+        postings = index[term][PAGES]
+        for doc_id, tf in zip(postings.doc_ids, postings.tfs):
+            pages[stats[URLS][doc_id]][term] = tf
+    index.close()
+    return pages
+
+
+def check_index(conditional_pages, full_pages, full_crawled):
+    """
+    Check that the index updated with the changed and deleted pages has the same pages as the index of a full re-crawl.
+    :param conditional_pages: live pages of the index updated by the conditional re-crawl
+    :param full_pages: live pages of the index of the full re-crawl
+    :param full_crawled: URLs of the pages the full re-crawl reached
+    :return: number of pages only in the updated index, which the full re-crawl couldn't reach anymore
+    """
+    assert set(full_pages) <= set(conditional_pages), "the conditional re-crawl lost pages"
+    assert all(conditional_pages[url] == terms for url, terms in full_pages.items()), "the conditional re-crawl kept stale pages"
+    stale = set(conditional_pages) - set(full_pages)
+    assert not stale & set(full_crawled), "the conditional re-crawl kept deleted pages"
+    return len(stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare crawling a site again from scratch, with crawling it again with conditional requests and indexing only its changes.")
+    parser.add_argument("-p", "--pages", type=int, help="number of pages on the site, which are all crawled", default=300)
+    parser.add_argument("-pa", "--paragraphs", type=int, help="number of paragraphs per page", default=40)
+    parser.add_argument("-c", "--change-rate", type=float, help="share of the pages edited between the two crawls", default=0.1)
+    parser.add_argument("-d", "--delete-rate", type=float, help="share of the pages deleted between the two crawls", default=0.02)
+    parser.add_argument("--port", type=int, help="port of the fixture site", default=8934)
+    args = parser.parse_args()
+
+    url = "http://127.0.0.1:{}/page/0.html".format(args.port)
+    rows = []
+
+    for name, validators in [("ETag and Last-Modified", True), ("content hash only", False)]:
+        with tempfile.TemporaryDirectory() as directory:
+            conditional_directory = os.path.join(directory, "conditional")
+            full_directory = os.path.join(directory, "full")
+
+            print("Crawling {:,} pages, then crawling them again, with {}...".format(args.pages, name))
+            server = start_server(args.port, args.pages, args.paragraphs, validators=validators)
+            try:
+                run_isolated(crawl_site, url, args.pages * 2, conditional_directory, True)
+            finally:
+                server.terminate()
+                server.join()
+
+            server = start_server(args.port, args.pages, args.paragraphs, 1, args.change_rate, args.delete_rate, validators)
+            try:
+                full = run_isolated(crawl_site, url, args.pages * 2, full_directory, False)["result"]
+                conditional = run_isolated(crawl_site, url, args.pages * 2, conditional_directory, True)["result"]
+            finally:
+                server.terminate()
+                server.join()
+
+            full_pages = read_pages(full_directory)
+            stale = check_index(read_pages(conditional_directory), full_pages, full[4])
+
+            # merging drops the copies the tombstones and the changed pages hid, and keeps the same pages
+            SegmentSet(conditional_directory).merge_all()
+            assert check_index(read_pages(conditional_directory), full_pages, full[4]) == stale, "merging changed the live pages"
+
+        _, full_bytes, full_cpu, _, _ = full
+        scraped, conditional_bytes, conditional_cpu, recrawl, _ = conditional
+        rows.append([
+            name,
+            "{} / {} / {} / {}".format(recrawl["not_modified"] + recrawl["same_content"], recrawl["changed"], recrawl["new"], recrawl["deleted"]),
+            scraped,
+            "{:,}".format(full_bytes),
+            "{:,}".format(conditional_bytes),
+            round(full_cpu, 2),
+            round(conditional_cpu, 2),
+            "{:,} bytes, {}s".format(recrawl["bytes_saved"], round(recrawl["cpu_saved"], 2)),
+            stale
+        ])
+
+    print("The index updated with the changed and deleted pages has the same pages as the index of a full re-crawl.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["validators", "unchanged / changed / new / deleted", "pages indexed", "full re-crawl (bytes)", "conditional (bytes)",
+                 "full re-crawl CPU (s)", "conditional CPU (s)", "saved, as reported", "unreachable pages kept"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{}% of the pages edited and {}% deleted between the two crawls. CPU is the crawler's and indexer's process time.".format(
+        round(args.change_rate * 100, 1), round(args.delete_rate * 100, 1)
+    ))
+
+
+if __name__ == '__main__':
+    main()
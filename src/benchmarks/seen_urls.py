@@ -0,0 +1,142 @@
+from classes.seen_urls import SeenUrls
+
+from tabulate import tabulate
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def generate_urls(num_urls, seed=0):
+    """
+    Generate the URLs a crawler would extract from pages: mostly links to pages already seen, some written another way,
+    e.g. with an uppercase host, the default port, a fragment, or their query arguments in another order.
+    :param num_urls: number of URLs
+    :param seed: seed of the random generator
+    :return: list of URLs
+    """
+    generator = random.Random(seed)
+    urls = []
+    for _ in range(num_urls):
+        page = generator.randrange(max(num_urls // 3, 1))
+        host = "site{}.example".format(page % 50)
+        variant = generator.random()
+        if variant < 0.1:
+            url = "http://{}:80/page/{}.html?b=2&a=1".format(host.upper(), page)
+        elif variant < 0.2:
+            url = "http://{}/page/{}.html?a=1&b=2#top".format(host, page)
+        else:
+            url = "http://{}/page/{}.html?a=1&b=2".format(host, page)
+        urls.append(url)
+    return urls
+
+
+def check_list(urls):
+    """
+    :param urls: URLs to check and add
+    :return: number of URLs which weren't seen before, the way ConcordiaSpider.scraped_links was checked
+    """
+    seen = []
+    new = 0
+    for url in urls:
+        if url not in seen:
+            seen.append(url)
+            new += 1
+    return new
+
+
+def check_set(urls):
+    """
+    :param urls: URLs to check and add
+    :return: number of URLs which weren't seen before, in a set of the URLs as they're written, and the memory of the
+    set and of its URLs, in megabytes
+    """
+    seen = set()
+    new = 0
+    for url in urls:
+        if url not in seen:
+            seen.add(url)
+            new += 1
+    return new, (sys.getsizeof(seen) + sum(sys.getsizeof(url) for url in seen)) / (1024 * 1024)
+
+
+def check_seen_urls(urls, path=None):
+    """
+    :param urls: URLs to check and add
+    :param path: file the set is persisted to, None to hold it in memory
+    :return: number of URLs which weren't seen before, in canonical form, the share of lookups which read the store,
+    and the memory of the Bloom filter, in megabytes
+    """
+    # each run starts without the canonical forms cached by the previous one
+    SeenUrls.canonicalize.cache_clear()
+    seen = SeenUrls(path)
+    new = sum(1 for url in urls if seen.add(url))
+    store_share = seen.store_lookups / len(urls)
+    filter_size = len(seen.bloom_filter.bits) / (1024 * 1024)
+    seen.close()
+    return new, store_share, filter_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare checking URLs against a list, a set, and the persistent seen-set with its Bloom filter.")
+    parser.add_argument("-u", "--urls", type=int, nargs="+", help="numbers of URLs to check", default=[1000, 10000, 100000])
+    parser.add_argument("-l", "--list-limit", type=int, help="largest number of URLs checked against a list, which takes quadratic time", default=20000)
+    args = parser.parse_args()
+
+    rows = []
+    for num_urls in args.urls:
+        urls = generate_urls(num_urls)
+
+        start = time.perf_counter()
+        list_new = check_list(urls) if num_urls <= args.list_limit else None
+        list_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        set_new, set_size = check_set(urls)
+        set_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        memory_new, _, _ = check_seen_urls(urls)
+        memory_time = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, SeenUrls.pages_file)
+            start = time.perf_counter()
+            disk_new, store_share, filter_size = check_seen_urls(urls, path)
+            disk_time = time.perf_counter() - start
+
+            # opening the set again, like a resumed crawl does, finds every URL already seen
+            start = time.perf_counter()
+            reopened = SeenUrls(path)
+            reopen_time = time.perf_counter() - start
+            assert len(reopened) == disk_new and all(url in reopened for url in urls[:1000]), "the persisted set lost URLs"
+            reopened.close()
+
+        assert memory_new == disk_new, "the sets in memory and on disk differ"
+        assert list_new is None or list_new == set_new, "the list and the set differ"
+
+        rows.append([
+            num_urls,
+            "{} ({} new)".format(round(list_time, 3), list_new) if list_new is not None else "skipped",
+            "{} ({} new)".format(round(set_time, 3), set_new),
+            "{} ({} new)".format(round(memory_time, 3), memory_new),
+            round(disk_time, 3),
+            round(reopen_time, 3),
+            "{}%".format(round(store_share * 100, 1)),
+            round(set_size, 2),
+            round(filter_size, 2)
+        ])
+
+    print("The seen-set in memory and on disk find the same new URLs. Fewer URLs are new in canonical form.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["URLs", "list (s)", "set (s)", "seen-set in memory (s)", "seen-set on disk (s)", "reopen (s)", "store lookups", "set memory (MB)", "Bloom filter (MB)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
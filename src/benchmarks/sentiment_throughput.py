@@ -0,0 +1,90 @@
+from classes.sentiment_table import SentimentTable
+from benchmarks.corpus import generate_vocabulary
+
+from afinn import Afinn
+from collections import Counter
+from tabulate import tabulate
+
+import argparse
+import random
+import tempfile
+import time
+
+
+def generate_documents(num_documents, terms_per_document, lexicon, seed=0):
+    """
+    Generate documents as lists of terms, mixing made up words with the words of Afinn's word list, including the
+    words of its phrases (e.g. "not", "good"), so that phrases come up across terms.
+    :param num_documents: number of documents
+    :param terms_per_document: average number of terms in a document
+    :param lexicon: Afinn's word list
+    :param seed: seed of the random generator, so that runs can be compared
+    :return: list of documents, each a list of terms
+    """
+    generator = random.Random(seed)
+    phrase_words = sorted({word for entry in lexicon if " " in entry for word in entry.split(" ")})
+    vocabulary = generate_vocabulary(20000, seed) + sorted(lexicon) + phrase_words * 20 + ["well-good", "n't", "ca"]
+    generator.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+    return [
+        generator.choices(vocabulary, weights=weights, k=generator.randint(terms_per_document // 2, terms_per_document * 3 // 2))
+        for _ in range(num_documents)
+    ]
+
+
+def timed(function, inputs):
+    """
+    :param function: function to call on each input
+    :param inputs: list of inputs
+    :return: the results, and the duration in seconds
+    """
+    start = time.perf_counter()
+    results = [function(value) for value in inputs]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the sentiment table against Afinn, and compare their throughput.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents", default=2000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    afinn = Afinn()
+    afinn_setup = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        SentimentTable.open(directory)
+        start = time.perf_counter()
+        table = SentimentTable.open(directory)
+        table_setup = time.perf_counter() - start
+
+    documents = generate_documents(args.documents, args.terms, table.lexicon)
+    queries = [" ".join(document[:random.Random(i).randint(1, 6)]).upper() + "!" for i, document in enumerate(documents)]
+
+    print("Scoring {:,} documents and {:,} queries...".format(len(documents), len(queries)))
+    expected, afinn_documents = timed(lambda terms: afinn.score(" ".join(terms)), documents)
+    actual, table_documents = timed(lambda terms: table.score_terms(terms, Counter(terms)), documents)
+    assert actual == expected, "document scores differ"
+
+    expected, afinn_queries = timed(afinn.score, queries)
+    actual, table_queries = timed(table.score, queries)
+    assert actual == expected, "query scores differ"
+    print("Scores are the same as Afinn's.\n")
+
+    rows = [
+        ["setup (s)", round(afinn_setup, 4), round(table_setup, 4)],
+        ["documents/s", "{:,}".format(round(len(documents) / afinn_documents)), "{:,}".format(round(len(documents) / table_documents))],
+        ["queries/s", "{:,}".format(round(len(queries) / afinn_queries)), "{:,}".format(round(len(queries) / table_queries))],
+    ]
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["", "Afinn", "sentiment table"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
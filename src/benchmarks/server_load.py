@@ -0,0 +1,183 @@
+from helpers import URLS
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import AndQuery, OrQuery
+from classes.query_server import QueryServer
+from classes.batch_queries import BatchQueryRunner
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from urllib.parse import quote
+from tabulate import tabulate
+
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import tempfile
+import time
+
+
+def serve(index, stats, port, workers, top_k):
+    """
+    Serve queries on an index, until the process is terminated.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param port: port to listen on
+    :param workers: number of worker processes of the server
+    :param top_k: number of pages returned per query
+    :return: None
+    """
+    and_query, or_query = AndQuery(index, stats), OrQuery(index, stats, top_k=top_k)
+    with redirect_stdout(io.StringIO()):
+        QueryServer(and_query, or_query, "127.0.0.1", port, workers, top_k).serve_forever()
+
+
+def start_server(index, stats, port, workers, top_k):
+    """
+    Start the query server in its own process, forked so that it doesn't load the index again, and so that it doesn't
+    compete with the clients for the GIL. The process isn't a daemon, since it forks its own worker processes.
+    :return: the server's process, to be terminated once done
+    """
+    process = multiprocessing.get_context("fork").Process(target=serve, args=(index, stats, port, workers, top_k))
+    process.start()
+
+    # wait until the server accepts connections
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+
+
+async def client(host, port, paths, latencies):
+    """
+    Send requests one after the other on a kept-alive connection, like a tool querying the server.
+    :param host: address of the server
+    :param port: port of the server
+    :param paths: paths of the requests to send
+    :param latencies: list the latency of each request is added to, in seconds
+    :return: number of responses which weren't successful
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    errors = 0
+
+    for path in paths:
+        start = time.perf_counter()
+        writer.write("GET {} HTTP/1.1\r\nHost: {}\r\n\r\n".format(path, host).encode("latin-1"))
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        body = await reader.readexactly(length)
+
+        latencies.append(time.perf_counter() - start)
+        if status != 200 or "results" not in json.loads(body):
+            errors += 1
+
+    writer.close()
+    return errors
+
+
+async def load(host, port, paths, concurrency):
+    """
+    Send all requests through concurrent clients.
+    :param host: address of the server
+    :param port: port of the server
+    :param paths: paths of the requests to send
+    :param concurrency: number of clients
+    :return: latency of each request, number of failed requests, and total time, in seconds
+    """
+    latencies = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*[client(host, port, paths[number::concurrency], latencies) for number in range(concurrency)])
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the queries per second the query server answers, with growing numbers of concurrent clients.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-r", "--requests", type=int, help="number of requests per run", default=2000)
+    parser.add_argument("-w", "--workers", type=int, help="number of worker processes of the server", default=0)
+    parser.add_argument("-k", "--top-k", type=int, help="number of pages returned per query", default=10)
+    parser.add_argument("-p", "--port", type=int, help="port of the server", default=8932)
+    parser.add_argument("-url", "--server-url", type=str, help="measure an already running server, e.g. http://127.0.0.1:8080, instead of starting one")
+    parser.add_argument("-queries", "--queries", type=str, help="file of queries, one per line, to send to an already running server")
+    args = parser.parse_args()
+
+    generator = random.Random(0)
+
+    if args.server_url:
+        if not args.queries:
+            print("A file of queries matching the server's index has to be given with --queries.")
+            return
+        host, port = args.server_url.split("//")[-1].rstrip("/").split(":")
+        port = int(port)
+        process = None
+        terms = " ".join(BatchQueryRunner.read_queries(args.queries)).split()
+    else:
+        if "fork" not in multiprocessing.get_all_start_methods():
+            print("The server is started by forking this process, which isn't possible on this platform. Use --server-url.")
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+            vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+            corpus_indexer = CorpusIndexer("results.jl")
+            with redirect_stdout(io.StringIO()):
+                corpus_indexer.construct()
+            os.chdir("/")
+
+        index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+        host, port = "127.0.0.1", args.port
+        process = start_server(index, stats, port, args.workers, args.top_k)
+        terms = vocabulary[:2000]
+        print("{:,} documents, served with {}.".format(len(stats[URLS]), "{} worker process(es)".format(args.workers) if args.workers else "a single scoring thread"))
+
+    rows = []
+    try:
+        for concurrency in (1, 8, 32, 128):
+            # mostly OR queries of 1 to 4 terms, new ones for every run, so that the server's cache rarely answers them
+            paths = []
+            for _ in range(args.requests):
+                mode = "and" if generator.random() < 0.25 else "or"
+                text = " ".join(generator.sample(terms, min(generator.randint(1, 4), len(terms))))
+                paths.append("/{}?q={}&k={}".format(mode, quote(text), args.top_k))
+
+            latencies, errors, elapsed = asyncio.run(load(host, port, paths, concurrency))
+            latencies.sort()
+            row = [concurrency, round(len(latencies) / elapsed, 1)]
+            row.extend(round(BatchQueryRunner.percentile(latencies, percent) * 1000, 2) for percent in BatchQueryRunner.percentiles)
+            row.append(errors)
+            rows.append(row)
+    finally:
+        # interrupted like with Ctrl+C, the server shuts its worker processes down before exiting
+        if process is not None:
+            os.kill(process.pid, signal.SIGINT)
+            process.join()
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["clients", "queries per second", "p50 (ms)", "p95 (ms)", "p99 (ms)", "errors"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} requests per run.".format(args.requests))
+
+
+if __name__ == '__main__':
+    main()
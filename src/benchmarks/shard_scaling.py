@@ -0,0 +1,83 @@
+from helpers import URLS
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import AndQuery, OrQuery
+from classes.shards import ShardSet
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the build time and query throughput of the index partitioned into 1, 2 and 4 shards.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries in the batch", default=2000)
+    parser.add_argument("-k", "--top-k", type=int, help="number of pages kept per query, 0 for all", default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        corpus_indexer = CorpusIndexer("results.jl")
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        os.chdir("/")
+
+        index, stats = corpus_indexer.get_index(), corpus_indexer.get_stats()
+
+        # queries mixing common and rarer terms, of 1 to 4 terms
+        generator = random.Random(0)
+        terms = [term for term in vocabulary[:5000] if term in index]
+        batch = [generator.sample(terms[:generator.choice((50, 500, 5000))], generator.randint(1, 4)) for _ in range(args.queries)]
+
+        expected = {}
+        rows = []
+        for query_class in (OrQuery, AndQuery):
+            query = query_class(index, stats)
+            start = time.perf_counter()
+            expected[query_class] = [query.rank(terms, args.top_k) for terms in batch]
+            rows.append(["unsharded", query_class.__name__, "", round(len(batch) / (time.perf_counter() - start), 1)])
+
+        for num_shards in (1, 2, 4):
+            shard_set = ShardSet(os.path.join(directory, "shards_{}".format(num_shards)))
+
+            start = time.perf_counter()
+            shard_set.write(index, stats, num_shards)
+            build_time = time.perf_counter() - start
+
+            shard_pool = shard_set.start(stats)
+            try:
+                for query_class in (OrQuery, AndQuery):
+                    start = time.perf_counter()
+                    actual = shard_pool.search(batch, query_class.conjunctive, args.top_k)
+                    elapsed = time.perf_counter() - start
+
+                    assert actual == expected[query_class], "the rankings of {} shard(s) differ".format(num_shards)
+
+                    rows.append([num_shards, query_class.__name__, round(build_time, 3), round(len(batch) / elapsed, 1)])
+            finally:
+                shard_pool.close()
+
+    print("The shards give the same rankings as the whole index.")
+    print(tabulate(
+        tabular_data=rows,
+        headers=["shards", "query", "build (s)", "queries per second"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} queries, top {} pages each, on {:,} documents, on {} core(s).".format(
+        len(batch), args.top_k or "all", len(stats[URLS]), os.cpu_count()
+    ))
+
+
+if __name__ == '__main__':
+    main()
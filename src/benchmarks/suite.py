@@ -0,0 +1,274 @@
+from helpers import clean_terms, fast_clean_terms
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.query import AndQuery, OrQuery
+from classes.query_cache import QueryCache
+from classes.batch_queries import BatchQueryRunner
+from benchmarks.corpus import generate_corpus, generate_query_log
+from benchmarks.tokenizer_throughput import generate_pages
+from benchmarks.measure import run_isolated, current_rss, peak_rss
+
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from tabulate import tabulate
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+
+def measure(function, *args):
+    """
+    Time a stage, and measure how much the resident set size grew while it ran.
+    The peak RSS is the highest it's been since the process started, so the growth is only that of the stage if the
+    setup before it, e.g. reading the stats, took less memory than the stage itself.
+    :param function: stage to run
+    :param args: arguments of the stage
+    :return: return value of the stage, and a dictionary of its duration and memory
+    """
+    rss_before = current_rss()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    return result, {"seconds": seconds, "peak_rss_mb": peak_rss(), "rss_growth_mb": max(peak_rss() - rss_before, 0.0)}
+
+
+def stage_construct(corpus, directory):
+    """
+    Parse the corpus into the stats of its pages and the index of its terms, in one pass, with CorpusIndexer.construct,
+    and write both with the norms of the pages, which the queries need.
+    :param corpus: path of the corpus
+    :param directory: directory the stats and the index are written to
+    :return: measurements of the stage
+    """
+    corpus_indexer = CorpusIndexer(corpus, directory)
+    with redirect_stdout(io.StringIO()):
+        _, measurements = measure(corpus_indexer.construct)
+    return measurements
+
+
+def stage_build_index_from_file(directory):
+    """
+    Load the stats and open the index from their files, like skipping the crawl does, with
+    IndexBuilder.build_index_from_file.
+    :param directory: directory of the stats and the index
+    :return: measurements of the stage
+    """
+    def load():
+        index = IndexBuilder.build_index_from_file(directory)
+        DocumentParser.build_stats_from_file(directory)
+        return index
+
+    index, measurements = measure(load)
+    index.close()
+    return measurements
+
+
+def stage_clean_terms(num_pages, fast):
+    """
+    Tokenize pages shaped like the ones the crawler scrapes, one text node at a time, with clean_terms or
+    fast_clean_terms.
+    :param num_pages: number of pages
+    :param fast: whether fast_clean_terms is used, with an empty cache, instead of clean_terms
+    :return: measurements of the stage, with the number of terms
+    """
+    pages = generate_pages(num_pages)
+    tokenize = fast_clean_terms if fast else clean_terms
+    fast_clean_terms.cache_clear()
+
+    def run():
+        return sum(len(tokenize(text)) for texts in pages for text in texts)
+
+    num_terms, measurements = measure(run)
+    measurements["terms"] = num_terms
+    return measurements
+
+
+def stage_queries(directory, queries_path, mode):
+    """
+    Conduct every query of the log with AndQuery.execute or OrQuery.execute, without the query cache, so that every
+    query is scored, and with the results printed to nowhere.
+    :param directory: directory of the stats and the index
+    :param queries_path: path of the query log
+    :param mode: and or or
+    :return: measurements of the stage, with the latency percentiles of the queries
+    """
+    queries = BatchQueryRunner.read_queries(queries_path)
+    index = IndexBuilder.build_index_from_file(directory)
+    stats = DocumentParser.build_stats_from_file(directory)
+    query = (AndQuery if mode == "and" else OrQuery)(index, stats)
+    query.cache = QueryCache(max_entries=0)
+
+    def run():
+        latencies = []
+        for text in queries:
+            start = time.perf_counter()
+            query.execute(text)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    with redirect_stdout(io.StringIO()):
+        latencies, measurements = measure(run)
+    index.close()
+
+    latencies.sort()
+    for percent in BatchQueryRunner.percentiles:
+        measurements["p{}_ms".format(percent)] = BatchQueryRunner.percentile(latencies, percent) * 1000
+    return measurements
+
+
+def get_commit():
+    """
+    :return: hash of the commit the benchmarks were run on, with a + if the tree has changes, None outside of git
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+" if changes.strip() else "")
+
+
+def fastest(repeats, target, *args):
+    """
+    Run a stage several times, each in a fresh process, and keep its fastest run, which is the least disturbed by
+    whatever else the machine was doing.
+    :param repeats: number of runs
+    :param target: module-level function of the stage
+    :param args: arguments of the stage
+    :return: measurements of the fastest run
+    """
+    return min((run_isolated(target, *args)["result"] for _ in range(repeats)), key=lambda measurements: measurements["seconds"])
+
+
+def run_suite(args):
+    """
+    Run every stage, each in a fresh process, on a corpus of each size. The tokenizers run on the same pages whatever
+    the size of the corpora.
+    :param args: the parsed arguments
+    :return: list of the results of the stages
+    """
+    results = []
+
+    def add(stage, documents, measurements, work, unit):
+        measurements.update({"stage": stage, "documents": documents, "throughput": work / measurements["seconds"], "unit": unit})
+        results.append(measurements)
+
+    print("Tokenizing {:,} pages...".format(args.pages))
+    for stage, fast in (("clean_terms", False), ("fast_clean_terms", True)):
+        measurements = fastest(args.repeats, stage_clean_terms, args.pages, fast)
+        add(stage, None, measurements, measurements["terms"], "terms/s")
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            print("Generating a corpus of {:,} documents, and a log of {:,} queries...".format(size, args.queries))
+            corpus = os.path.join(directory, "results.json")
+            queries_path = os.path.join(directory, "queries.txt")
+            vocabulary = generate_corpus(corpus, size, args.terms, args.vocabulary, args.seed)
+            generate_query_log(queries_path, vocabulary, args.queries, seed=args.seed)
+
+            print("Indexing it, and conducting the queries...")
+            add("construct", size, fastest(args.repeats, stage_construct, corpus, directory), size, "documents/s")
+            add("build_index_from_file", size, fastest(args.repeats, stage_build_index_from_file, directory), 1, "loads/s")
+            for mode in ("and", "or"):
+                measurements = fastest(args.repeats, stage_queries, directory, queries_path, mode)
+                add("{}_query".format(mode), size, measurements, args.queries, "queries/s")
+
+    return results
+
+
+def compare(baseline, report, threshold):
+    """
+    Print how much each stage changed compared to a previous run.
+    :param baseline: report of the previous run
+    :param report: report of this run
+    :param threshold: change in time, in percent, from which a stage is flagged
+    :return: None
+    """
+    previous = {(result["stage"], result["documents"]): result for result in baseline["results"]}
+    rows = []
+    for result in report["results"]:
+        before = previous.get((result["stage"], result["documents"]))
+        if before is None:
+            continue
+        change = (result["seconds"] / before["seconds"] - 1) * 100
+        rows.append([
+            result["stage"],
+            "{:,}".format(result["documents"]) if result["documents"] else "",
+            round(before["seconds"], 3),
+            round(result["seconds"], 3),
+            "{:+.1f}%".format(change),
+            round(before["rss_growth_mb"], 1),
+            round(result["rss_growth_mb"], 1),
+            "slower" if change > threshold else "faster" if change < -threshold else ""
+        ])
+
+    print("Compared to {} ({}):".format(baseline["commit"], baseline["date"]))
+    print(tabulate(
+        tabular_data=rows,
+        headers=["stage", "documents", "before (s)", "after (s)", "time", "before RSS growth (MB)", "after RSS growth (MB)", ""],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the indexing and querying stages, and measure their memory, on seeded synthetic corpora, and save the results as JSON.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", help="numbers of documents in the synthetic corpora, from 1,000 to 1,000,000", default=[1000, 10000])
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=20000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries in the query log", default=1000)
+    parser.add_argument("-p", "--pages", type=int, help="number of pages tokenized", default=200)
+    parser.add_argument("-r", "--repeats", type=int, help="number of runs of each stage, of which the fastest is kept", default=1)
+    parser.add_argument("--seed", type=int, help="seed of the corpora and of the query log", default=0)
+    parser.add_argument("-o", "--output", type=str, help="file the results are saved to", default="benchmark_results.json")
+    parser.add_argument("-c", "--compare", type=str, help="results of a previous run, e.g. on another commit, to compare with")
+    parser.add_argument("--threshold", type=float, help="change in time, in percent, from which a stage is flagged when comparing", default=10.0)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    report = {
+        "commit": get_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "sizes": args.sizes, "terms": args.terms, "vocabulary": args.vocabulary, "queries": args.queries,
+            "pages": args.pages, "repeats": args.repeats, "seed": args.seed
+        },
+        "results": run_suite(args)
+    }
+
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+    print(tabulate(
+        tabular_data=[[
+            result["stage"],
+            "{:,}".format(result["documents"]) if result["documents"] else "",
+            round(result["seconds"], 3),
+            "{:,.1f} {}".format(result["throughput"], result["unit"]),
+            round(result["rss_growth_mb"], 1),
+            " / ".join(str(round(result["p{}_ms".format(percent)], 3)) for percent in BatchQueryRunner.percentiles) if "p50_ms" in result else ""
+        ] for result in report["results"]],
+        headers=["stage", "documents", "time (s)", "throughput", "RSS growth (MB)", "p50 / p95 / p99 (ms)"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("Results saved to {}.".format(args.output))
+
+    if baseline is not None:
+        compare(baseline, report, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
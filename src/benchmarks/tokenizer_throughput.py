@@ -0,0 +1,125 @@
+from helpers import clean_terms, fast_clean_terms, tokenize_page
+from benchmarks.corpus import generate_vocabulary
+
+from tabulate import tabulate
+
+import argparse
+import random
+import time
+
+
+""" pieces of text that trip tokenizers: contractions, quotes, dashes, abbreviations, numbers, URLs, etc. """
+tricky = [
+    "don't", "it's", "students'", "\"quoted\"", "'single'", "“curly”", "‘curly’", "—", "–", "...", "…", "•", "«", "»",
+    "(parens)", "[brackets]", "e.g.", "U.S.", "Dr.", "3.14", "$1,000", "50%", "A&B", "C++", "#hashtag", "@user",
+    "https://www.concordia.ca/about.html", "e-mail", "\\", "--", "?!", "can't", "won't", "café", "naïve", "ＦＵＬＬ"
+]
+
+
+def generate_pages(num_pages, seed=0):
+    """
+    Generate pages shaped like the text nodes ConcordiaSpider extracts: a title, a menu and a footer repeated on every
+    page, whitespace between tags, headings, and paragraphs of several sentences.
+    :param num_pages: number of pages
+    :param seed: seed of the random generator, so that runs can be compared
+    :return: list of pages, each a list of strings of text
+    """
+    generator = random.Random(seed)
+    vocabulary = generate_vocabulary(5000, seed) + ["good", "bad", "happy", "not", "the", "and", "is", "of"]
+
+    def sentence(length):
+        words = generator.choices(vocabulary, k=length)
+        for _ in range(generator.randint(0, 3)):
+            words.insert(generator.randrange(len(words) + 1), generator.choice(tricky))
+        words[0] = words[0].capitalize()
+        return " ".join(words) + generator.choice([".", ".", ".", "!", "?", "", ":"])
+
+    menu = [sentence(generator.randint(1, 3)).rstrip(".!?:") for _ in range(30)]
+    footer = [sentence(generator.randint(3, 10)) for _ in range(10)]
+
+    pages = []
+    for _ in range(num_pages):
+        texts = [sentence(generator.randint(3, 8))]
+        for text in menu:
+            texts.extend([text, "\n    "])
+        for _ in range(generator.randint(5, 15)):
+            texts.append(sentence(generator.randint(2, 8)))
+            texts.append(" ".join(sentence(generator.randint(5, 30)) for _ in range(generator.randint(1, 6))))
+            texts.append("\n")
+        texts.extend(footer)
+        pages.append(texts)
+    return pages
+
+
+def reference_tokenize_page(texts, remove_stopwords=False):
+    """
+    Tokenize a page with clean_terms, one text node at a time, like the crawler did before the fast tokenizer.
+    :param texts: list of strings of text from the page
+    :param remove_stopwords: whether or not stopwords will be removed
+    :return: list of terms of the page
+    """
+    terms = []
+    for text in texts:
+        if text:
+            terms.extend(clean_terms(text, remove_stopwords))
+    return terms
+
+
+def check_parity(pages):
+    """
+    Check that the fast tokenizer produces the same terms as clean_terms, on every page and on every tricky piece of
+    text alone, with and without stopwords.
+    :param pages: list of pages, each a list of strings of text
+    :return: number of texts checked
+    """
+    checked = 0
+    for remove_stopwords in (False, True):
+        for texts in pages:
+            expected = reference_tokenize_page(texts, remove_stopwords)
+            actual = tokenize_page(texts, remove_stopwords)
+            assert actual == expected, "terms differ on page {!r}: {} != {}".format(texts[0], actual, expected)
+            checked += len(texts)
+        for text in tricky + [" ".join(tricky), "", " ", "\n\t", "Hello.", "Hi there! How are you? Fine."]:
+            assert list(fast_clean_terms(text, remove_stopwords)) == clean_terms(text, remove_stopwords), text
+            checked += 1
+    return checked
+
+
+def throughput(tokenize, pages):
+    """
+    Tokenize every page, and time it.
+    :param tokenize: function tokenizing a page's list of texts
+    :param pages: list of pages, each a list of strings of text
+    :return: number of terms, and the duration in seconds
+    """
+    start = time.perf_counter()
+    terms = sum(len(tokenize(texts)) for texts in pages)
+    return terms, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the fast tokenizer against clean_terms, and compare their throughput.")
+    parser.add_argument("-p", "--pages", type=int, help="number of pages in the fixed corpus", default=300)
+    args = parser.parse_args()
+
+    pages = generate_pages(args.pages)
+
+    print("Checking that both tokenizers produce the same terms...")
+    print("{:,} texts checked.\n".format(check_parity(pages[:args.pages // 3])))
+
+    fast_clean_terms.cache_clear()
+
+    rows = []
+    for name, tokenize in [("clean_terms (NLTK, per text node)", reference_tokenize_page), ("tokenize_page (fast)", tokenize_page)]:
+        terms, seconds = throughput(tokenize, pages)
+        rows.append([name, "{:,}".format(terms), round(seconds, 2), "{:,}".format(round(terms / seconds))])
+
+    print(tabulate(
+        tabular_data=rows,
+        headers=["tokenizer", "terms", "seconds", "terms/s"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+
+
+if __name__ == '__main__':
+    main()
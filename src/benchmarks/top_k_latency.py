@@ -0,0 +1,102 @@
+from helpers import PAGES, URLS, COSINE_SIMILARITY
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.query import OrQuery
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+from tabulate import tabulate
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+
+def exhaustive_top_k(index, stats, terms, k):
+    """
+    Score every page matching the query, like OrQuery does without top_k, then keep the k best.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :param k: number of pages to keep
+    :return: list of the k best (page ID, cosine similarity), ties broken by lowest ID
+    """
+    query = OrQuery(index, stats)
+    query.terms = terms
+    query.results = set().union(*[set(index[term][PAGES]) for term in terms if term in index])
+    query.get_cosine_similarities()
+    ranking = sorted(query.results_with_cosine_similarity.items(), key=lambda result: (-result[1][COSINE_SIMILARITY], result[0]))
+    return [(doc_id, scores[COSINE_SIMILARITY]) for doc_id, scores in ranking[:k]]
+
+
+def max_score_top_k(index, stats, terms, k):
+    """
+    Find the k best pages with MaxScore, like OrQuery does with top_k.
+    :param index: the inverted index
+    :param stats: stats of the pages
+    :param terms: terms of the query
+    :param k: number of pages to find
+    :return: list of the k best (page ID, cosine similarity), ties broken by lowest ID
+    """
+    query = OrQuery(index, stats, top_k=k)
+    query.terms = terms
+    query.get_top_k_cosine_similarities(k)
+    return [(doc_id, query.results_with_cosine_similarity[doc_id][COSINE_SIMILARITY]) for doc_id in query.results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exhaustive OR queries with top-k OR queries using MaxScore.")
+    parser.add_argument("-d", "--documents", type=int, help="number of documents in the synthetic corpus", default=20000)
+    parser.add_argument("-t", "--terms", type=int, help="average number of terms per document", default=300)
+    parser.add_argument("-v", "--vocabulary", type=int, help="number of distinct terms", default=50000)
+    parser.add_argument("-q", "--queries", type=int, help="number of queries of each length", default=20)
+    parser.add_argument("-k", "--top-k", type=int, help="number of pages to find", default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        print("Generating and indexing a corpus of {:,} documents...".format(args.documents))
+        vocabulary = generate_corpus("results.jl", args.documents, args.terms, args.vocabulary)
+        with redirect_stdout(io.StringIO()):
+            CorpusIndexer("results.jl", directory).construct()
+
+        index = IndexBuilder.build_index_from_file(directory)
+        stats = DocumentParser.build_stats_from_file(directory)
+
+        # queries mixing frequent terms, which appear in most pages, with rarer ones
+        generator = random.Random(0)
+        rows = []
+        for length in (1, 3, 8):
+            queries = [generator.sample(vocabulary[:generator.choice([20, 200, 2000])], length) for _ in range(args.queries)]
+
+            # the first run also reads the postings of the terms into the index's cache, so both timed runs use it
+            results = [[search(index, stats, terms, args.top_k) for terms in queries] for search in (exhaustive_top_k, max_score_top_k)]
+            assert results[0] == results[1], "the top {} pages differ".format(args.top_k)
+
+            row = [length]
+            for search in (exhaustive_top_k, max_score_top_k):
+                start = time.perf_counter()
+                for terms in queries:
+                    search(index, stats, terms, args.top_k)
+                row.append(round((time.perf_counter() - start) / len(queries) * 1000, 2))
+            row.append(round(row[1] / row[2], 1))
+            rows.append(row)
+
+        index.close()
+        os.chdir("/")
+
+    print("The top {} pages are the same with both.".format(args.top_k))
+    print(tabulate(
+        tabular_data=rows,
+        headers=["query terms", "exhaustive (ms/query)", "MaxScore (ms/query)", "speedup"],
+        tablefmt="fancy_grid", numalign="left", stralign="left"
+    ))
+    print("{:,} documents.".format(len(stats[URLS])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+from classes.metrics import Metrics
+
+from contextlib import redirect_stdout
+from math import ceil
+
+import json
+import multiprocessing
+import time
+
+
+# query conducting the queries, which the workers of the pool inherit from the process which loaded the index
+worker_query = None
+
+
+def run_query(text):
+    """
+    Score a query with the query object set up by BatchQueryRunner.
+    This is a module-level function so that it can be sent to a pool of worker processes.
+    :param text: the query, as typed by a user
+    :return: the query, its ranking, and the time it took to score, in seconds
+    """
+    start = time.perf_counter()
+    ranking = worker_query.search(text)
+    return text, ranking, time.perf_counter() - start
+
+
+class BatchQueryRunner:
+    """
+    Conduct every query of a file, one per line, without prompting the user, and report the throughput and latency.
+
+    The index is loaded once, and the results of each query are written as soon as it's scored, either as a line of
+    JSON or as the same table as interactive queries. The queries can be split across a pool of worker processes. The
+    workers are forked from the process which loaded the index, so they share its memory-mapped segments instead of
+    loading them again. Forking isn't available on every platform, nor with an engine which can't be shared by forked
+    processes, like the pipes of a ShardPool, in which case the queries are conducted in this process.
+    """
+
+    # static variables
+    formats = ("jsonl", "table")
+    percentiles = (50, 95, 99)
+
+    def __init__(self, query, workers=0, output_format="jsonl"):
+        """
+        :param query: AndQuery, OrQuery or PhraseQuery conducting the queries
+        :param workers: number of worker processes, 0 to conduct the queries in this process
+        :param output_format: "jsonl" for a line of JSON per query, or "table" for the same tables as interactive queries
+        """
+        self.query = query
+        self.workers = workers
+        self.output_format = output_format
+        self.latencies = []
+
+    @staticmethod
+    def read_queries(file_path):
+        """
+        :param file_path: file with one query per line
+        :return: list of the queries, without empty lines
+        """
+        with open(file_path, encoding="utf-8") as query_file:
+            return [line.strip() for line in query_file if line.strip()]
+
+    @staticmethod
+    def percentile(values, percent):
+        """
+        Nearest-rank percentile.
+        :param values: sorted list of values
+        :param percent: percentile to compute, from 0 to 100
+        :return: the value, or 0 if there are no values
+        """
+        if not values:
+            return 0.0
+        return values[max(ceil(percent / 100 * len(values)) - 1, 0)]
+
+    @Metrics.timed("BatchQueryRunner.run")
+    def run(self, file_path, output):
+        """
+        Conduct the queries of a file, writing their results as they come, then print the report.
+        :param file_path: file with one query per line
+        :param output: stream the results are written to
+        :return: None
+        """
+        queries = BatchQueryRunner.read_queries(file_path)
+        self.latencies = []
+
+        global worker_query
+        worker_query = self.query
+
+        start = time.perf_counter()
+
+        if self.workers and not getattr(self.query.engine, "forkable", True):
+            print("The shard processes can't be shared by worker processes, queries will be conducted in this process, with the shards scoring them in parallel.")
+            self.workers = 0
+
+        if self.workers and "fork" in multiprocessing.get_all_start_methods():
+            chunk_size = max(1, len(queries) // (self.workers * 4))
+            with multiprocessing.get_context("fork").Pool(self.workers) as pool:
+                for result in pool.imap(run_query, queries, chunk_size):
+                    self.write_result(output, *result)
+        else:
+            if self.workers:
+                print("Worker processes can't share the index on this platform, queries will be conducted in this process.")
+                self.workers = 0
+            for text in queries:
+                self.write_result(output, *run_query(text))
+
+        output.flush()
+        self.report(time.perf_counter() - start)
+
+    def write_result(self, output, text, ranking, latency):
+        """
+        Write the results of a query.
+        :param output: stream the results are written to
+        :param text: the query
+        :param ranking: list of (page ID, cosine similarity)
+        :param latency: time it took to score the query, in seconds
+        :return: None
+        """
+        self.latencies.append(latency)
+
+        if self.output_format == "jsonl":
+            output.write(json.dumps({
+                "query": text,
+                "mode": self.query.mode,
+                "pages": len(ranking),
+                "latency_ms": round(latency * 1000, 3),
+                "results": self.query.get_results(ranking)
+            }) + "\n")
+        else:
+            self.query.original_terms = text
+            self.query.set_ranking(ranking)
+            with redirect_stdout(output):
+                self.query.print_results()
+
+    def report(self, elapsed):
+        """
+        Print the number of queries per second, and the percentiles of their latencies.
+        :param elapsed: time it took to conduct all queries, in seconds
+        :return: None
+        """
+        latencies = sorted(self.latencies)
+        print("{:,} queries in {}s: {} queries per second{}.".format(
+            len(latencies), round(elapsed, 3), round(len(latencies) / elapsed, 1) if elapsed else 0,
+            " with {} worker process(es)".format(self.workers) if self.workers else ""
+        ))
+        print("Latency: {}.".format(", ".join(
+            "p{} {} ms".format(percent, round(BatchQueryRunner.percentile(latencies, percent) * 1000, 3))
+            for percent in self.percentiles
+        )))
+
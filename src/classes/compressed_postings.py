@@ -0,0 +1,341 @@
+from classes.postings import Postings
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain
+from math import ceil
+
+import sys
+
+
+class CompressedPostings(Postings):
+    """
+    Postings list of a term, read from the compressed postings of a DiskIndex, and only decoded as it's used.
+
+    The postings are split into blocks of block_size documents. The postings of a term start with their skip data,
+    three columns with an entry per block: the highest document ID of the block, the offset of the end of the block,
+    and the block's max impact, quantized to a byte. Then come the blocks, each with:
+     - a header byte, with the width in bytes of the block's gaps (low 4 bits) and of its term frequencies (high 4 bits)
+     - the gaps between the document IDs, the first one from the highest document ID of the previous block. Most gaps
+       are small, so they take 1 or 2 bytes instead of 4.
+     - the term frequencies.
+    Widths are rounded up to whole bytes, instead of bit-packing the values, so that a block is decoded with
+    array.frombytes and itertools.accumulate, without going through its values one by one in Python.
+
+    The tf-idf values aren't stored, since they're the term frequencies times the idf of the term, which is in the term
+    dictionary: they're computed again, exactly, when they're used.
+
+    In a positional index, the blocks are followed by the positions of the term: the end of the positions of each block,
+    then, for each block, a byte with the width of its gaps, and the gaps between the positions of each document.
+
+    The skip data lets a document be searched without decoding the blocks before it, so intersecting a rare term with a
+    common one only decodes the blocks of the common term where the rare term's documents are. Scanning the postings,
+    e.g. for an OR query, decodes all of its blocks at once. The quantized max impact of a block bounds what the term
+    adds to the cosine similarity of the block's documents, more tightly than the max impact of the term.
+    """
+
+    # static variables
+    block_size = 128
+
+    # array typecode of each width, in bytes
+    typecodes = {1: "B", 2: "H", 4: "I"}
+
+    def __init__(self, data, offset, length, idf, max_impact=None, positional=False):
+        """
+        Read the skip data of the postings. Nothing else is decoded until it's used.
+        :param data: buffer the postings are in, e.g. a memory-mapped file
+        :param offset: position of the postings in the buffer
+        :param length: number of documents in the postings, i.e. the document frequency of the term
+        :param idf: idf of the term, which the tf-idf values are computed from
+        :param max_impact: max impact of the term, which the quantized max impacts of the blocks are fractions of, None
+        if it's unknown
+        :param positional: whether the positions of the term follow its blocks
+        """
+        self.data = data
+        self.length = length
+        self.idf = idf
+        self.max_impact = max_impact
+
+        self.num_blocks = (length + CompressedPostings.block_size - 1) // CompressedPostings.block_size
+        self.last_doc_ids = Postings.read_array("I", data, offset, self.num_blocks)
+        self.block_ends = Postings.read_array("I", data, offset + 4 * self.num_blocks, self.num_blocks)
+        self.impacts = data[offset + 8 * self.num_blocks:offset + 9 * self.num_blocks]
+        self.blocks_start = offset + 9 * self.num_blocks
+
+        # decoded document IDs, term frequencies and tf-idf values of each block, until the whole columns are decoded
+        self.blocks = {}
+
+        self.positional = positional
+        self.position_starts = None
+        if positional:
+            positions_start = self.blocks_start + (self.block_ends[-1] if self.num_blocks else 0)
+            self.position_ends = Postings.read_array("I", data, positions_start, self.num_blocks)
+            self.position_blocks_start = positions_start + 4 * self.num_blocks
+            # gaps between the positions of each block, and where the positions of each of its documents start
+            self.position_blocks = {}
+        else:
+            self.positions = None
+
+    @staticmethod
+    def get_width(values):
+        """
+        :param values: non-negative integers
+        :return: smallest number of bytes, 1, 2 or 4, every value fits in
+        """
+        highest = max(values, default=0)
+        return 1 if highest < 1 << 8 else 2 if highest < 1 << 16 else 4
+
+    @staticmethod
+    def quantize(block_max_impact, max_impact):
+        """
+        Quantize the max impact of a block to a byte, as a fraction of the max impact of the term, rounded up so that it
+        still bounds the impacts of the block.
+        :param block_max_impact: max impact of the block
+        :param max_impact: max impact of the term
+        :return: integer from 0 to 255
+        """
+        if not max_impact:
+            return 0
+        return min(255, ceil(block_max_impact / max_impact * 255))
+
+    @staticmethod
+    def encode(postings, max_impact=None, norms=None):
+        """
+        Encode postings, with their skip data.
+        Without the norms of the documents, the max impact of every block is the term's, which bounds them all.
+        :param postings: postings of a term, with their tf-idf values, and their positions in a positional index
+        :param max_impact: max impact of the term
+        :param norms: norm of each document, by ID, None if they aren't known yet
+        :return: the encoded postings, as bytes
+        """
+        size = CompressedPostings.block_size
+        last_doc_ids = array("I")
+        block_ends = array("I")
+        impacts = bytearray()
+        blocks = bytearray()
+        position_ends = array("I")
+        positions = bytearray()
+
+        previous = 0
+        for start in range(0, len(postings), size):
+            doc_ids = postings.doc_ids[start:start + size]
+            tfs = postings.tfs[start:start + size]
+            gaps = [doc_id - last for doc_id, last in zip(doc_ids, [previous] + list(doc_ids[:-1]))]
+            previous = doc_ids[-1]
+
+            gap_width, tf_width = CompressedPostings.get_width(gaps), CompressedPostings.get_width(tfs)
+            blocks.append(gap_width | tf_width << 4)
+            for values, width in ((gaps, gap_width), (tfs, tf_width)):
+                blocks.extend(CompressedPostings.to_bytes(array(CompressedPostings.typecodes[width], values)))
+
+            if norms is not None and max_impact:
+                block = Postings(doc_ids, tfs, postings.weights[start:start + size])
+                impacts.append(CompressedPostings.quantize(Postings.max_impact(block, norms), max_impact))
+            else:
+                impacts.append(255)
+
+            last_doc_ids.append(previous)
+            block_ends.append(len(blocks))
+
+            if postings.has_positions():
+                starts = postings.get_position_starts()
+                position_gaps = postings.positions[starts[start]:starts[start + len(doc_ids)]]
+                width = CompressedPostings.get_width(position_gaps)
+                positions.append(width)
+                positions.extend(CompressedPostings.to_bytes(array(CompressedPostings.typecodes[width], position_gaps)))
+                position_ends.append(len(positions))
+
+        if postings.has_positions():
+            blocks.extend(CompressedPostings.to_bytes(position_ends))
+            blocks.extend(positions)
+        return CompressedPostings.to_bytes(last_doc_ids) + CompressedPostings.to_bytes(block_ends) + bytes(impacts) + bytes(blocks)
+
+    @staticmethod
+    def to_bytes(values):
+        """
+        :param values: array of numbers
+        :return: the numbers in little-endian order, as bytes
+        """
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+        return values.tobytes()
+
+    @staticmethod
+    def get_impacts_offset(num_documents):
+        """
+        :param num_documents: number of documents in the postings of a term
+        :return: position of the quantized max impacts of the blocks, from the start of the postings
+        """
+        return 8 * ((num_documents + CompressedPostings.block_size - 1) // CompressedPostings.block_size)
+
+    def get_block(self, block):
+        """
+        Decode a block, unless it already was.
+        :param block: number of the block
+        :return: list of the document IDs and the term frequencies of the block, as arrays, and their tf-idf values,
+        which are only computed once they're needed
+        """
+        if block in self.blocks:
+            return self.blocks[block]
+
+        start = self.blocks_start + (self.block_ends[block - 1] if block else 0)
+        count = min(CompressedPostings.block_size, self.length - block * CompressedPostings.block_size)
+        gap_width, tf_width = self.data[start] & 0xF, self.data[start] >> 4
+
+        gaps = Postings.read_array(CompressedPostings.typecodes[gap_width], self.data, start + 1, count)
+        tfs = Postings.read_array(CompressedPostings.typecodes[tf_width], self.data, start + 1 + count * gap_width, count)
+
+        doc_ids = array("I", accumulate(gaps, initial=self.last_doc_ids[block - 1] if block else 0))
+        del doc_ids[0]
+
+        self.blocks[block] = [doc_ids, tfs if tf_width == 4 else array("I", tfs), None]
+        return self.blocks[block]
+
+    def __getattr__(self, name):
+        """
+        Decode a whole column the first time it's used, e.g. to go through all of the postings, and keep it as an
+        attribute, so that it's then used like the arrays of a Postings object.
+        The document IDs and the term frequencies are decoded together, block after block, and the tf-idf values are only
+        computed if they're used.
+        :param name: name of the column, doc_ids, tfs, weights or positions
+        :return: array of the column
+        """
+        if name in ("doc_ids", "tfs"):
+            # the first gap of each block is from the last document of the previous one, so the gaps of all of the
+            # blocks add up to the document IDs in one go
+            gaps, tfs = [], []
+            start = self.blocks_start
+            for block in range(self.num_blocks):
+                count = min(CompressedPostings.block_size, self.length - block * CompressedPostings.block_size)
+                gap_width, tf_width = self.data[start] & 0xF, self.data[start] >> 4
+                gaps.append(Postings.read_array(CompressedPostings.typecodes[gap_width], self.data, start + 1, count))
+                tfs.append(Postings.read_array(CompressedPostings.typecodes[tf_width], self.data, start + 1 + count * gap_width, count))
+                start = self.blocks_start + self.block_ends[block]
+            self.doc_ids, self.tfs = array("I", accumulate(chain.from_iterable(gaps))), array("I", chain.from_iterable(tfs))
+            self.blocks.clear()
+        elif name == "weights":
+            self.weights = array("f", [tf * self.idf for tf in self.tfs])
+        elif name == "positions" and self.positional:
+            gaps = []
+            for block in range(self.num_blocks):
+                start = self.position_blocks_start + (self.position_ends[block - 1] if block else 0)
+                count = sum(self.tfs[block * CompressedPostings.block_size:(block + 1) * CompressedPostings.block_size])
+                gaps.append(Postings.read_array(CompressedPostings.typecodes[self.data[start]], self.data, start + 1, count))
+            self.positions = array("I", chain.from_iterable(gaps))
+            self.position_blocks.clear()
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    def seek(self, doc_id, start=0):
+        """
+        Find the first position, from start, of a document ID at least as high as doc_id. The skip data is searched for
+        the block the document would be in, and only that block is decoded.
+        :param doc_id: ID of the document to find
+        :param start: position to start from, e.g. where the previous search stopped
+        :return: position of the first ID not lower than doc_id, or the length of the postings if there is none
+        """
+        if "doc_ids" in self.__dict__:
+            return Postings.gallop(self.doc_ids, doc_id, start)
+        if start >= self.length:
+            return self.length
+
+        block = start // CompressedPostings.block_size
+        if self.last_doc_ids[block] < doc_id:
+            block = bisect_left(self.last_doc_ids, doc_id, block + 1)
+            if block == self.num_blocks:
+                return self.length
+            start = block * CompressedPostings.block_size
+
+        first = block * CompressedPostings.block_size
+        return first + bisect_left(self.get_block(block)[0], doc_id, start - first)
+
+    def doc_id_at(self, position):
+        if "doc_ids" in self.__dict__:
+            return self.doc_ids[position]
+        return self.get_block(position // CompressedPostings.block_size)[0][position % CompressedPostings.block_size]
+
+    def weight_at(self, position):
+        if "doc_ids" in self.__dict__:
+            return self.weights[position]
+        entry = self.get_block(position // CompressedPostings.block_size)
+        if entry[2] is None:
+            entry[2] = array("f", [tf * self.idf for tf in entry[1]])
+        return entry[2][position % CompressedPostings.block_size]
+
+    def has_positions(self):
+        """
+        :return: True if the positions of the term follow its blocks
+        """
+        return self.positional
+
+    def get_position_block(self, block):
+        """
+        Decode the positions of a block, unless they already were.
+        :param block: number of the block
+        :return: gaps between the positions of the block's documents, and where the positions of each document start
+        """
+        if block in self.position_blocks:
+            return self.position_blocks[block]
+
+        if "doc_ids" in self.__dict__:
+            tfs = self.tfs[block * CompressedPostings.block_size:(block + 1) * CompressedPostings.block_size]
+        else:
+            tfs = self.get_block(block)[1]
+        starts = array("I", accumulate(tfs, initial=0))
+
+        start = self.position_blocks_start + (self.position_ends[block - 1] if block else 0)
+        gaps = Postings.read_array(CompressedPostings.typecodes[self.data[start]], self.data, start + 1, starts[-1])
+
+        self.position_blocks[block] = (gaps, starts)
+        return self.position_blocks[block]
+
+    def get_positions(self, position):
+        """
+        Decode the positions of the term in a document, only decoding the positions of the block the document is in.
+        :param position: position of the document in the postings
+        :return: list of the positions of the term in the document, in increasing order
+        """
+        if "positions" in self.__dict__:
+            return Postings.get_positions(self, position)
+        gaps, starts = self.get_position_block(position // CompressedPostings.block_size)
+        position %= CompressedPostings.block_size
+        return list(accumulate(gaps[starts[position]:starts[position + 1]]))
+
+    def block_max_impact(self, doc_id):
+        """
+        :param doc_id: ID of a document
+        :return: bound of the term's max impact in the block the document would be in, 0 if it's after the last block,
+        None if the term's max impact is unknown
+        """
+        if not self.max_impact:
+            return None
+        block = bisect_left(self.last_doc_ids, doc_id)
+        if block == self.num_blocks:
+            return 0.0
+        return self.impacts[block] / 255 * self.max_impact
+
+    def find(self, doc_id):
+        position = self.seek(doc_id)
+        if position < self.length and self.doc_id_at(position) == doc_id:
+            return position
+        return -1
+
+    def tf(self, doc_id):
+        position = self.find(doc_id)
+        if position < 0:
+            return 0
+        if "doc_ids" in self.__dict__:
+            return self.tfs[position]
+        return self.get_block(position // CompressedPostings.block_size)[1][position % CompressedPostings.block_size]
+
+    def weight(self, doc_id):
+        position = self.find(doc_id)
+        return self.weight_at(position) if position >= 0 else 0.0
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
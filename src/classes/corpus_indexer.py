@@ -0,0 +1,84 @@
+from helpers import read_results, PAGES, URL, CONTENT
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.metrics import Metrics
+
+from collections import Counter
+
+
+class CorpusIndexer:
+    """
+    Build the document stats and the inverted index together, in a single pass over the crawler's output.
+    Each page is read once, and its terms are counted once. The counts are used both for the page's stats (number of
+    terms, Afinn score) and for the postings of its terms. The stats and the index are only written once every page
+    has been added.
+    """
+
+    def __init__(self, file_to_parse=None, directory="", positional=False):
+        """
+        Initialize the document parser and the index builder, which share the same stats.
+        :param file_to_parse: file with the crawler's output, if the pages are read from a file
+        :param directory: directory in which the stats and index files are written, e.g. a new index segment
+        :param positional: whether or not the index keeps the positions of the terms, for phrase queries
+        """
+        self.file_to_parse = file_to_parse
+        self.document_parser = DocumentParser(file_to_parse, directory)
+        self.index_builder = IndexBuilder(file_to_parse, self.document_parser.get_stats(), directory, positional)
+
+    @Metrics.timed("CorpusIndexer.construct")
+    def construct(self):
+        """
+        Parse the JSON or JSON lines file created by the crawler, one page at a time, and add each page to the stats
+        and to the index. Then write both to their files.
+        :return: None
+        """
+        with Metrics.timer("CorpusIndexer.add_results"):
+            for result in read_results(self.file_to_parse):
+                self.add_result(result)
+
+        self.finish()
+
+    def add_result(self, result):
+        """
+        Add a page to the stats and to the index.
+        :param result: page with a URL and a list of terms as content
+        :return: ID of the page, or None if it was already added
+        """
+        term_counts = Counter(result[CONTENT])
+
+        doc_id = self.document_parser.add_document(result[URL], term_counts, result[CONTENT])
+        if doc_id is not None:
+            self.index_builder.add_document(doc_id, term_counts, result[CONTENT])
+
+        return doc_id
+
+    @Metrics.timed("CorpusIndexer.finish")
+    def finish(self):
+        """
+        Once all pages are added, compute the totals of the stats, and the tf-idf of the terms in the index, then write
+        the url_stats.txt file and the index files.
+        Nothing is written if no pages were added.
+        :return: None
+        """
+        if not self.get_stats()[PAGES]:
+            print("No pages were scraped, there is nothing to index.")
+            return
+
+        # the weights are computed first, since they give the norm of each page, which is written with its stats
+        self.document_parser.compute_totals()
+        self.index_builder.compute_weights()
+
+        self.document_parser.write_to_file(self.document_parser.get_stats())
+        self.index_builder.write_to_file(self.index_builder.get_index())
+
+    def get_stats(self):
+        """
+        :return: the stats of the pages
+        """
+        return self.document_parser.get_stats()
+
+    def get_index(self):
+        """
+        :return: the inverted index
+        """
+        return self.index_builder.get_index()
@@ -0,0 +1,169 @@
+from scrapy import signals
+from tabulate import tabulate
+from urllib.parse import urlsplit
+
+import time
+
+
+class CrawlReport:
+    """
+    Scrapy extension which measures the crawl per domain, and prints a report once the spider closes: the pages and
+    bytes downloaded per second, and the average download latency, i.e. the time from sending a request to receiving
+    its whole response, which is what the concurrency and AutoThrottle settings are tuned against.
+    More info: https://doc.scrapy.org/en/latest/topics/extensions.html
+
+    When the NearDuplicatesPipeline is used, the report also shows the near-duplicate pages it dropped, and the tokens
+    and bytes of the feed they would have taken. When pages are crawled again with conditional requests, it shows how
+    many were unchanged, changed, new, and deleted, and the bytes and CPU time the unchanged pages saved compared to
+    crawling every page again: the length of the pages which weren't downloaded, and the time it took to parse and
+    tokenize the pages which weren't parsed, the last time they were.
+
+    The report of the last crawl is kept in the class, so that it can be read once the crawl is over, like in
+    benchmarks.
+    """
+
+    # report of the last crawl, by domain, and for all domains under None
+    domains = {}
+
+    # near-duplicate pages dropped in the last crawl, their tokens and bytes, and the URL of the page each one is a
+    # near-duplicate of
+    near_duplicates = {}
+    # near-duplicates printed with the URL of their page, the others are only counted
+    printed_duplicates = 5
+
+    # pages crawled again in the last crawl, by how they changed, and what the unchanged ones saved
+    recrawl = {}
+    recrawl_stats = ["not_modified", "same_content", "changed", "new", "deleted", "bytes_saved", "cpu_saved"]
+
+    def __init__(self, stats=None):
+        """
+        :param stats: stats collector of the crawl
+        """
+        self.stats = stats
+        self.start = None
+        self.elapsed = 0.0
+        self.measures = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Create the extension, and connect it to the signals it measures.
+        :param crawler: the crawler using the extension
+        :return: the extension
+        """
+        extension = cls(crawler.stats)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        :param spider: the spider which was opened
+        :return: None
+        """
+        self.start = time.perf_counter()
+        self.measures = {}
+
+    def response_received(self, response, request, spider):
+        """
+        Add a downloaded response to the measures of its domain.
+        :param response: the response
+        :param request: the request of the response, with its download latency in its meta
+        :param spider: the spider which made the request
+        :return: None
+        """
+        domain = urlsplit(response.url).netloc
+        measure = self.measures.setdefault(domain, {"responses": 0, "bytes": 0, "latency": 0.0})
+        measure["responses"] += 1
+        measure["bytes"] += len(response.body)
+        measure["latency"] += request.meta.get("download_latency", 0.0)
+
+    def spider_closed(self, spider):
+        """
+        Compute and print the report.
+        :param spider: the spider which was closed
+        :return: None
+        """
+        self.elapsed = time.perf_counter() - self.start if self.start is not None else 0.0
+
+        total = {"responses": 0, "bytes": 0, "latency": 0.0}
+        for measure in self.measures.values():
+            for name in total:
+                total[name] += measure[name]
+
+        CrawlReport.domains = {domain: self.summarize(measure) for domain, measure in self.measures.items()}
+        CrawlReport.domains[None] = self.summarize(total)
+
+        CrawlReport.near_duplicates = {
+            name: self.stats.get_value("near_duplicates/{}".format(name), 0) if self.stats else 0
+            for name in ("pages", "tokens", "bytes")
+        }
+        CrawlReport.near_duplicates["canonical_urls"] = dict(getattr(spider, "canonical_urls", {}))
+
+        CrawlReport.recrawl = {
+            name: self.stats.get_value("recrawl/{}".format(name), 0) if self.stats else 0
+            for name in CrawlReport.recrawl_stats
+        }
+
+        self.print_report()
+
+    def summarize(self, measure):
+        """
+        :param measure: number of responses, their bytes, and their summed latency
+        :return: the responses and bytes, the pages and bytes per second over the whole crawl, and the average latency,
+        in milliseconds
+        """
+        return {
+            "responses": measure["responses"],
+            "bytes": measure["bytes"],
+            "pages_per_second": measure["responses"] / self.elapsed if self.elapsed else 0.0,
+            "bytes_per_second": measure["bytes"] / self.elapsed if self.elapsed else 0.0,
+            "latency_ms": measure["latency"] * 1000 / measure["responses"] if measure["responses"] else 0.0
+        }
+
+    def print_report(self):
+        """
+        Print the report of every domain, busiest first, followed by the whole crawl, the near-duplicates skipped, and
+        the pages which didn't change since the last crawl.
+        :return: None
+        """
+        if not self.measures:
+            return
+
+        domains = sorted(self.measures, key=lambda domain: (-self.measures[domain]["responses"], domain))
+        rows = [
+            [domain or "all domains"] + [
+                CrawlReport.domains[domain][column] if column == "responses" else round(CrawlReport.domains[domain][column], 1)
+                for column in ("responses", "pages_per_second", "bytes_per_second", "latency_ms")
+            ]
+            for domain in domains + [None]
+        ]
+
+        print("\nCrawled for {}s:".format(round(self.elapsed, 2)))
+        print(tabulate(
+            tabular_data=rows,
+            headers=["domain", "responses", "pages/s", "bytes/s", "avg latency (ms)"],
+            tablefmt="fancy_grid", numalign="left", stralign="left"
+        ))
+
+        if CrawlReport.near_duplicates["pages"]:
+            print("{} near-duplicate page(s) skipped, saving {:,} tokens and {:,} bytes.".format(
+                CrawlReport.near_duplicates["pages"], CrawlReport.near_duplicates["tokens"], CrawlReport.near_duplicates["bytes"]
+            ))
+            canonical_urls = sorted(CrawlReport.near_duplicates["canonical_urls"].items())
+            for url, canonical_url in canonical_urls[:CrawlReport.printed_duplicates]:
+                print("  {} is a near-duplicate of {}".format(url, canonical_url))
+            if len(canonical_urls) > CrawlReport.printed_duplicates:
+                print("  and {} more.".format(len(canonical_urls) - CrawlReport.printed_duplicates))
+
+        recrawl = CrawlReport.recrawl
+        if recrawl["not_modified"] or recrawl["same_content"] or recrawl["changed"] or recrawl["deleted"]:
+            print(
+                "{} page(s) unchanged since the last crawl ({} not modified, {} with the same content), {} changed, {} new, "
+                "and {} deleted. Compared to a full re-crawl, {:,} bytes weren't downloaded, and {}s of CPU weren't spent "
+                "parsing pages.".format(
+                    recrawl["not_modified"] + recrawl["same_content"], recrawl["not_modified"], recrawl["same_content"],
+                    recrawl["changed"], recrawl["new"], recrawl["deleted"], recrawl["bytes_saved"], round(recrawl["cpu_saved"], 3)
+                )
+            )
@@ -0,0 +1,300 @@
+from helpers import PAGES, CFT, DFT, IDF, SENTIMENT, MAX_IMPACT
+from classes.postings import Postings
+from classes.compressed_postings import CompressedPostings
+
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import mmap
+import os
+import struct
+
+
+class DiskIndex(Mapping):
+    """
+    Read-only view of an inverted index stored in a binary, memory-mapped format.
+
+    The index is spread across two files sharing a common prefix:
+     - <prefix>.dict: the term dictionary. A header, then one fixed-size record per term, sorted by the term's UTF-8
+       bytes, then a blob with the terms themselves. Each record holds the term's statistics and the offset of its
+       postings, so a term is found with a binary search over the records without reading the whole file. The last
+       statistic is the term's max impact, the highest tf-idf of the term in a document divided by the document's norm,
+       which bounds what the term can add to a document's cosine similarity.
+     - <prefix>.post: the postings. For each term, its document IDs as gaps and its term frequencies, in blocks packed
+       to the fewest bytes their values fit in, after skip data with the highest document ID, the end and the quantized
+       max impact of each block. See CompressedPostings. The tf-idf values aren't stored, they're computed from the
+       idf in the term's record. In a positional index, the positions of the term in each document follow its blocks.
+
+    The URLs of the document IDs aren't stored in the index, they come from the stats written by DocumentParser.
+
+    Both files are opened with mmap, and only the postings of the terms that are looked up get decoded, and only as
+    they're used. The decoded entries have the exact same shape as the ones in the dictionary built by IndexBuilder, so
+    Query and TFIDF can use either one.
+
+    Files written in an older format aren't readable: rebuild the index from the crawl's feed, e.g. with --fresh-index.
+    """
+
+    # static variables
+    extensions = (".dict", ".post")
+
+    dict_magic = b"SWCDICT4"
+    # a positional index has its own magic, since its postings are followed by positions
+    positional_magic = b"SWCDPOS4"
+
+    header = struct.Struct("<8sQ")
+    # term offset, term length, cft, dft, idf, sentiment, postings offset, max impact
+    record = struct.Struct("<QIQIddQd")
+    max_impact = struct.Struct("<d")
+
+    def __init__(self, prefix, cache_size=256):
+        """
+        Open the index files and memory-map them. Nothing is decoded until a term is looked up.
+        :param prefix: path of the index files, without their extension
+        :param cache_size: number of decoded terms kept around, since queries look up the same terms repeatedly
+        """
+        self.prefix = prefix
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+        self.files = [open(prefix + extension, "rb") for extension in self.extensions]
+        self.dictionary, self.postings = [DiskIndex.map_file(file) for file in self.files]
+
+        magic, self.num_terms = self.header.unpack_from(self.dictionary, 0)
+        if magic not in (self.dict_magic, self.positional_magic):
+            raise ValueError("{} is not a term dictionary in the current format.".format(prefix + self.extensions[0]))
+        self.positional = magic == self.positional_magic
+        self.terms_start = self.header.size + self.num_terms * self.record.size
+
+    @staticmethod
+    def map_file(file):
+        """
+        Memory-map a file for reading. Empty files can't be mapped, so they're replaced by an empty byte string.
+        :param file: file object opened in binary mode
+        :return: the mapped file
+        """
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def exists(prefix):
+        """
+        Check whether all files of an index exist.
+        :param prefix: path of the index files, without their extension
+        :return: True if the index can be opened
+        """
+        return all(os.path.exists(prefix + extension) for extension in DiskIndex.extensions)
+
+    def get_term(self, position):
+        """
+        Get the term stored at a position of the sorted term dictionary.
+        :param position: position of the term's record
+        :return: the term's record, and the term as bytes
+        """
+        record = self.record.unpack_from(self.dictionary, self.header.size + position * self.record.size)
+        start = self.terms_start + record[0]
+        return record, self.dictionary[start:start + record[1]]
+
+    def find(self, term):
+        """
+        Binary search the term dictionary for a term.
+        :param term: a word
+        :return: the term's record, or None if the term isn't in the index
+        """
+        try:
+            key = term.encode("utf-8")
+        except (UnicodeEncodeError, AttributeError):
+            return None
+
+        low, high = 0, self.num_terms
+        while low < high:
+            middle = (low + high) // 2
+            record, middle_key = self.get_term(middle)
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return record
+        return None
+
+    def scan(self):
+        """
+        Go through the whole term dictionary, in order, e.g. to merge it with another index.
+        :return: generator of (term as bytes, record) pairs
+        """
+        for position in range(self.num_terms):
+            record, key = self.get_term(position)
+            yield key, record
+
+    def decode(self, record):
+        """
+        Decode the postings of a term into the same structure IndexBuilder uses. The postings are only decoded as they're
+        used.
+        :param record: the term's record from the term dictionary
+        :return: dictionary with the term's statistics and postings
+        """
+        _, _, cft, dft, idf, sentiment, offset, max_impact = record
+        postings = CompressedPostings(self.postings, offset, dft, idf, max_impact, self.positional)
+        return {CFT: cft, DFT: dft, IDF: idf, SENTIMENT: sentiment, MAX_IMPACT: max_impact, PAGES: postings}
+
+    def __getitem__(self, term):
+        if term in self.cache:
+            self.cache.move_to_end(term)
+            return self.cache[term]
+
+        record = self.find(term)
+        if record is None:
+            raise KeyError(term)
+
+        entry = self.decode(record)
+        self.cache[term] = entry
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return entry
+
+    def __contains__(self, term):
+        return term in self.cache or self.find(term) is not None
+
+    def __len__(self):
+        return self.num_terms
+
+    def __iter__(self):
+        for position in range(self.num_terms):
+            yield self.get_term(position)[1].decode("utf-8")
+
+    def close(self):
+        """
+        Unmap and close the index files.
+        :return: None
+        """
+        self.cache.clear()
+        for mapped in (self.dictionary, self.postings):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for file in self.files:
+            file.close()
+
+    @staticmethod
+    def write(index, prefix, norms=None):
+        """
+        Write an inverted index built by IndexBuilder to the binary format, with the positions of the terms if the index
+        keeps them.
+        Terms that can't be encoded in UTF-8 are skipped, like they were with the text format.
+        :param index: the inverted index
+        :param prefix: path of the index files, without their extension
+        :param norms: norm of each document, by ID, which the max impacts of the blocks of postings are computed with,
+        None if they aren't known yet
+        :return: None
+        """
+        terms = []
+        for term in index:
+            try:
+                terms.append((term.encode("utf-8"), term))
+            except UnicodeEncodeError:
+                pass
+        terms.sort()
+
+        positional = bool(terms) and index[terms[0][1]][PAGES].has_positions()
+        writer = DiskIndexWriter(prefix, norms, positional)
+        for key, term in terms:
+            writer.add(key, index[term])
+        writer.close()
+
+    @staticmethod
+    def write_max_impacts(prefix, norms):
+        """
+        Compute the max impact of every term of written index files, and store it in the term's record, along with the
+        quantized max impacts of the blocks of its postings.
+        This is for indexes written before the norms of their documents were known, like merged segments.
+        :param prefix: path of the index files, without their extension
+        :param norms: norm of each document, by ID
+        :return: None
+        """
+        index = DiskIndex(prefix)
+        max_impacts = []
+        block_impacts = []
+        for _, record in index.scan():
+            postings = index.decode(record)[PAGES]
+            max_impact = Postings.max_impact(postings, norms)
+            max_impacts.append(max_impact)
+
+            impacts = bytearray()
+            for start in range(0, len(postings), CompressedPostings.block_size):
+                block = Postings(*(column[start:start + CompressedPostings.block_size] for column in (postings.doc_ids, postings.tfs, postings.weights)))
+                impacts.append(CompressedPostings.quantize(Postings.max_impact(block, norms), max_impact))
+            block_impacts.append((record[6] + CompressedPostings.get_impacts_offset(len(postings)), impacts))
+        index.close()
+
+        with open(prefix + ".dict", "r+b") as dict_file:
+            for position, max_impact in enumerate(max_impacts):
+                dict_file.seek(DiskIndex.header.size + (position + 1) * DiskIndex.record.size - DiskIndex.max_impact.size)
+                dict_file.write(DiskIndex.max_impact.pack(max_impact))
+
+        with open(prefix + ".post", "r+b") as post_file:
+            for offset, impacts in block_impacts:
+                post_file.seek(offset)
+                post_file.write(impacts)
+
+
+class DiskIndexWriter:
+    """
+    Write the files of a DiskIndex one term at a time, so that an index can be written without holding all of its
+    postings in memory, e.g. when merging segments. Terms have to be added in increasing order of their UTF-8 bytes.
+    """
+
+    def __init__(self, prefix, norms=None, positional=False):
+        """
+        Create the index files. The number of terms in the header is filled in when the writer is closed.
+        :param prefix: path of the index files, without their extension
+        :param norms: norm of each document, by ID, which the max impacts of the blocks of postings are computed with.
+        Without them, every block is bounded by the max impact of its term, until DiskIndex.write_max_impacts is run.
+        :param positional: whether the postings of every term have positions, which are written along with them
+        """
+        self.norms = norms
+        self.magic = DiskIndex.positional_magic if positional else DiskIndex.dict_magic
+        self.dict_file = open(prefix + ".dict", "wb")
+        self.post_file = open(prefix + ".post", "wb")
+        self.dict_file.write(DiskIndex.header.pack(self.magic, 0))
+
+        self.keys = []
+        self.term_offset = 0
+        self.postings_offset = 0
+
+    def add(self, key, entry):
+        """
+        Write a term's record and its postings.
+        :param key: the term, encoded in UTF-8
+        :param entry: the term's statistics and postings, like in the index built by IndexBuilder
+        :return: None
+        """
+        if entry[PAGES].has_positions() != (self.magic == DiskIndex.positional_magic):
+            raise ValueError("The postings of {} have to have positions if, and only if, the index does.".format(key.decode("utf-8")))
+
+        max_impact = entry.get(MAX_IMPACT) or 0.0
+
+        self.dict_file.write(DiskIndex.record.pack(
+            self.term_offset, len(key), entry[CFT], entry[DFT], entry[IDF], entry[SENTIMENT], self.postings_offset,
+            max_impact
+        ))
+
+        postings = CompressedPostings.encode(entry[PAGES], max_impact, self.norms)
+        self.post_file.write(postings)
+        self.postings_offset += len(postings)
+
+        self.term_offset += len(key)
+        self.keys.append(key)
+
+    def close(self):
+        """
+        Write the blob of terms after the records, and the number of terms in the header.
+        :return: None
+        """
+        for key in self.keys:
+            self.dict_file.write(key)
+
+        self.dict_file.seek(0)
+        self.dict_file.write(DiskIndex.header.pack(self.magic, len(self.keys)))
+
+        self.dict_file.close()
+        self.post_file.close()
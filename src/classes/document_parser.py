@@ -1,6 +1,9 @@
-from helpers import afinn, PAGES, URL, CONTENT, TOTALS, TOTAL_DOCUMENTS, TOTAL_TOKENS, TOTAL_AFINN, AVG_TOKENS, AVG_AFINN
+from helpers import PAGES, URLS, TOTALS, TOTAL_DOCUMENTS, TOTAL_TOKENS, TOTAL_AFINN, AVG_TOKENS, AVG_AFINN, NORM
 
-import json
+from classes.sentiment_table import SentimentTable
+from classes.metrics import Metrics
+
+import os
 
 
 class DocumentParser:
@@ -9,81 +12,117 @@ class DocumentParser:
     stats_file = "url_stats.txt"
     summary = "SUMMARY:"
 
-    def __init__(self, file_to_parse):
+    def __init__(self, file_to_parse, directory=""):
         """
         Initialize the document parser with the file containing the pages and their content.
         A document correspond to a web page.
+        Each document gets an integer ID, in the order it was crawled. The stats hold the table of their URLs, so that
+        the index and the queries can work with IDs, and only look up the URLs when showing results.
         :param file_to_parse: file with the crawler's output
+        :param directory: directory in which the stats file is written, e.g. the directory of an index segment
         """
         self.file_to_parse = file_to_parse
-        self.stats = {PAGES: {}, TOTALS: {}}
+        self.stats_file = os.path.join(directory, DocumentParser.stats_file)
+        self.stats = {PAGES: {}, URLS: [], TOTALS: {}}
+        self.doc_ids = {}
 
-    def construct_stats(self):
+    def add_document(self, url, term_counts, terms):
         """
-        Parse the JSON file created by crawler.
-        For each result, write the URL, the number of terms parsed, and the total Afinn sentiment score of those terms
-        to an output file.
-        :return: None
+        Give the page an ID, and compute its number of terms and its Afinn score.
+        The Afinn score is the same as Afinn's score of the terms joined by spaces. It's computed by the SentimentTable
+        from the counts of the terms, and from the order of the terms only where they could form a phrase.
+        :param url: URL of the page
+        :param term_counts: Counter of the terms in the page
+        :param terms: list of terms in the page, in order
+        :return: ID of the page, or None if it was already added
         """
-        total_num_tokens = 0
-        total_num_afinn = 0
-
-        with open(self.file_to_parse) as file_to_parse:
-            results = json.load(file_to_parse)
+        # the crawler doesn't scrape a page twice, but keep the first one if it ever happens
+        if url in self.doc_ids:
+            return None
 
-            for result in results:
+        doc_id = len(self.stats[URLS])
+        self.doc_ids[url] = doc_id
+        self.stats[URLS].append(url)
 
-                doc_terms = len(result[CONTENT])
-                doc_afinn = afinn.score(" ".join(result[CONTENT]))
+        self.stats[PAGES][doc_id] = {
+            TOTAL_TOKENS: sum(term_counts.values()),
+            TOTAL_AFINN: SentimentTable.get().score_terms(terms, term_counts)
+        }
 
-                total_num_tokens += doc_terms
-                total_num_afinn += doc_afinn
+        return doc_id
 
-                self.stats[PAGES][result[URL]] = {
-                    TOTAL_TOKENS: len(result[CONTENT]),
-                    TOTAL_AFINN: afinn.score(" ".join(result[CONTENT]))
-                }
+    def compute_totals(self):
+        """
+        Tally the statistics of all pages, once they have all been added.
+        :return: None
+        """
+        DocumentParser.tally(self.stats)
 
-        self.stats[TOTALS][TOTAL_DOCUMENTS] = len(self.stats[PAGES])
-        self.stats[TOTALS][TOTAL_TOKENS] = total_num_tokens
-        self.stats[TOTALS][AVG_TOKENS] = total_num_tokens / len(self.stats[PAGES])
-        self.stats[TOTALS][TOTAL_AFINN] = total_num_afinn
-        self.stats[TOTALS][AVG_AFINN] = total_num_afinn / len(self.stats[PAGES])
+    @staticmethod
+    def tally(stats):
+        """
+        Compute the totals and averages of the statistics of the pages in a stats dictionary.
+        :param stats: dictionary containing page statistics
+        :return: None
+        """
+        total_num_tokens = sum(page_info[TOTAL_TOKENS] for page_info in stats[PAGES].values())
+        total_num_afinn = sum(page_info[TOTAL_AFINN] for page_info in stats[PAGES].values())
 
-        self.write_to_file(self.stats)
+        stats[TOTALS][TOTAL_DOCUMENTS] = len(stats[PAGES])
+        stats[TOTALS][TOTAL_TOKENS] = total_num_tokens
+        stats[TOTALS][AVG_TOKENS] = total_num_tokens / len(stats[PAGES])
+        stats[TOTALS][TOTAL_AFINN] = total_num_afinn
+        stats[TOTALS][AVG_AFINN] = total_num_afinn / len(stats[PAGES])
 
+    @Metrics.timed("DocumentParser.write_to_file")
     def write_to_file(self, stats):
         """
-        Write the statistics of each page to a "url_stats.txt" file.
+        Write the statistics of each page to a "url_stats.txt" file, in the order of their IDs.
         Also write a total tally of each statistic at the end.
         :param stats: dictionary containing page statistics
         :return: None
         """
         print("Outputting document stats to {} file...".format(self.stats_file))
+
+        DocumentParser.write_stats(stats, self.stats_file)
+
+        print("Document stats available at {}, showcasing:\n\t"
+              "- each scraped page's URL\n\t"
+              "- their total number of terms (non-distinct)\n\t"
+              "- their total Afinn sentiment score.\n"
+              "It also shows combined statistics of all documents.\n"
+              .format(self.stats_file))
+
+    @staticmethod
+    def write_stats(stats, file_path):
+        """
+        Write the statistics of each page to a file, without reporting it to the user.
+        The IDs of the pages have to go from 0 to the number of pages, since a page's ID is its line number.
+        The norm of a page's tf-idf vector is written after its Afinn score, once it has been computed.
+        :param stats: dictionary containing page statistics
+        :param file_path: path of the stats file
+        :return: None
+        """
         total_num_tokens = 0
         total_num_afinn = 0
 
-        with open(self.stats_file, "w", encoding="utf-8") as stats_file:
+        with open(file_path, "w", encoding="utf-8") as stats_file:
 
-            for page, page_info in stats[PAGES].items():
+            for doc_id, page_info in sorted(stats[PAGES].items()):
 
                 total_num_tokens += page_info[TOTAL_TOKENS]
                 total_num_afinn += page_info[TOTAL_AFINN]
 
-                stats_file.write("{} {} {}\n".format(page, page_info[TOTAL_TOKENS], page_info[TOTAL_AFINN]))
+                stats_file.write("{} {} {}".format(stats[URLS][doc_id], page_info[TOTAL_TOKENS], page_info[TOTAL_AFINN]))
+                if NORM in page_info:
+                    stats_file.write(" {}".format(page_info[NORM]))
+                stats_file.write("\n")
 
             stats_file.write(
                 "\n{} {} document(s): {} total tokens, {} average tokens, {} total Afinn score, {} average Afinn score\n"
-                .format(self.summary, len(stats[PAGES]), total_num_tokens, round(total_num_tokens / len(stats[PAGES]), 3), total_num_afinn, round(total_num_afinn / len(stats[PAGES]), 3))
+                .format(DocumentParser.summary, len(stats[PAGES]), total_num_tokens, round(total_num_tokens / len(stats[PAGES]), 3), total_num_afinn, round(total_num_afinn / len(stats[PAGES]), 3))
             )
 
-        print("Document stats available at {}, showcasing:\n\t"
-              "- each scraped page's URL\n\t"
-              "- their total number of terms (non-distinct)\n\t"
-              "- their total Afinn sentiment score.\n"
-              "It also shows combined statistics of all documents.\n"
-              .format(self.stats_file))
-
     def get_stats(self):
         """
         Get the statistics generated with the above methods.
@@ -92,15 +131,18 @@ class DocumentParser:
         return self.stats
 
     @staticmethod
-    def build_stats_from_file():
+    @Metrics.timed("DocumentParser.build_stats_from_file")
+    def build_stats_from_file(directory=""):
         """
         Build the statistics dictionary from the file.
+        Pages are written in the order of their IDs, so a page's ID is its line number.
+        :param directory: directory of the stats file
         :return: statistics dictionary of documents
         """
 
-        stats = {PAGES: {}, TOTALS: {}}
+        stats = {PAGES: {}, URLS: [], TOTALS: {}}
 
-        with open(DocumentParser.stats_file) as stats_file:
+        with open(os.path.join(directory, DocumentParser.stats_file), encoding="utf-8") as stats_file:
 
             for line in stats_file.readlines():
 
@@ -116,8 +158,12 @@ class DocumentParser:
                     stats[TOTALS][TOTAL_AFINN] = float(elements[9])
                     stats[TOTALS][AVG_AFINN] = float(elements[13])
                 else:
-                    stats[PAGES][elements[0]] = {}
-                    stats[PAGES][elements[0]][TOTAL_TOKENS] = int(elements[1])
-                    stats[PAGES][elements[0]][TOTAL_AFINN] = float(elements[2])
+                    doc_id = len(stats[URLS])
+                    stats[URLS].append(elements[0])
+                    stats[PAGES][doc_id] = {}
+                    stats[PAGES][doc_id][TOTAL_TOKENS] = int(elements[1])
+                    stats[PAGES][doc_id][TOTAL_AFINN] = float(elements[2])
+                    if len(elements) > 3:
+                        stats[PAGES][doc_id][NORM] = float(elements[3])
 
         return stats
@@ -1,85 +1,106 @@
-from helpers import afinn, SENTIMENT, PAGES, TF, CFT, DFT, IDF, TF_IDF
+from helpers import sqrt, SENTIMENT, PAGES, CFT, DFT, IDF, NORM, MAX_IMPACT
 from classes.tf_idf import TFIDF
+from classes.disk_index import DiskIndex
+from classes.postings import Postings
+from classes.sentiment_table import SentimentTable
+from classes.metrics import Metrics
 
-import json
+import os
 
 
 class IndexBuilder:
 
     # static variables
-    index_file = "index.txt"
+    index_file = "index"
 
-    def __init__(self, file_to_parse, stats):
+    def __init__(self, file_to_parse, stats, directory="", positional=False):
         """
         Initialize the index builder with the file containing the pages and their content.
         Also pass in a list of stats, which will be used, in conjunction with the index, to compute the tf-idf of terms.
         :param file_to_parse: file with the crawler's output
         :param stats: stats of web pages, such as number of total terms, Afinn score, etc.
+        :param directory: directory in which the index files are written, e.g. the directory of an index segment
+        :param positional: whether or not the positions of the terms in each document are kept, for phrase queries
         """
         self.file_to_parse = file_to_parse
+        self.index_file = os.path.join(directory, IndexBuilder.index_file)
+        self.positional = positional
         self.stats = stats
         self.index = {}
 
         self.tfidf = TFIDF(self.index, self.stats)
 
-    def construct_index(self):
+    def add_document(self, doc_id, term_counts, terms=None):
         """
-        Parse the JSON file created by crawler.
-        For each object in it (each object has an URL and a list of terms as content):
-         - iterate through the terms in the content, storing it in the index.
-           • if the term isn't in the index, create a new entry with it as the key, and an empty object {} as its value,
-             where we will store the URLs where the term appears.
-           • if the term is in the index, check if the current URL is in its value. If it isn't, set the frequency to 1
-             (so far); if it is, increment it by 1.
+        Store each term of a document in the index.
+         • if the term isn't in the index, create a new entry with it as the key, and an empty postings list, where we
+           will store the IDs of the documents where the term appears.
+         • add the document ID to the term's postings, along with the number of times the term appears in it, and the
+           positions it appears at, in a positional index.
+           Documents are added in the order of their IDs, so the postings stay sorted.
+        :param doc_id: ID of the document
+        :param term_counts: Counter of the terms in the document
+        :param terms: terms of the document, in order, which the positions come from in a positional index
         :return: None
         """
-        with open(self.file_to_parse) as file_to_parse:
-            results = json.load(file_to_parse)
-
-            for result in results:
-                url = result["url"]
-                terms = result["content"]
-
-                for term in terms:
-                    if term not in self.index:
-                        self.index[term] = {}
-                        self.index[term][CFT] = 0
-                        self.index[term][SENTIMENT] = afinn.score(term)
-                        self.index[term][PAGES] = {}
-                    self.index[term][CFT] += 1
-                    if url not in self.index[term][PAGES]:
-                        self.index[term][PAGES][url] = {}
-                        self.index[term][PAGES][url][TF] = 1
-                    else:
-                        self.index[term][PAGES][url][TF] += 1
-
-            for term in self.index:
-                self.index[term][DFT] = self.tfidf.dft(term)
-                self.index[term][IDF] = self.tfidf.idf(term)
-                term_urls = list(self.index[term][PAGES])
-                for url in term_urls:
-                    self.index[term][PAGES][url][TF_IDF] = self.tfidf.tf_idf(term, url)
+        sentiment_table = SentimentTable.get()
+
+        positions = None
+        if self.positional:
+            positions = {}
+            for position, term in enumerate(terms):
+                positions.setdefault(term, []).append(position)
+
+        for term, frequency in term_counts.items():
+            if term not in self.index:
+                self.index[term] = {}
+                self.index[term][CFT] = 0
+                self.index[term][SENTIMENT] = sentiment_table.term_score(term)
+                self.index[term][PAGES] = Postings()
+            self.index[term][CFT] += frequency
+            self.index[term][PAGES].add(doc_id, frequency, positions[term] if positions is not None else None)
+
+    @Metrics.timed("IndexBuilder.compute_weights")
+    def compute_weights(self):
+        """
+        Once all documents have been added, compute the document frequency, the idf, and the tf-idf of every term.
+        Also compute the norm of each document's tf-idf vector, over all of its terms, and store it in the document's
+        stats, so that queries can normalize the cosine similarity without going through the document's terms. Then,
+        compute the max impact of each term, which top-k queries use to skip documents.
+        :return: None
+        """
+        squares = {doc_id: 0.0 for doc_id in self.stats[PAGES]}
+
+        for term in self.index:
+            self.index[term][DFT] = self.tfidf.dft(term)
+            self.index[term][IDF] = self.tfidf.idf(term)
+            postings = self.index[term][PAGES]
+            postings.set_weights(self.index[term][IDF])
+            for doc_id, weight in zip(postings.doc_ids, postings.weights):
+                squares[doc_id] += weight * weight
+
+        norms = {doc_id: sqrt(square) for doc_id, square in squares.items()}
+        for doc_id, norm in norms.items():
+            self.stats[PAGES][doc_id][NORM] = norm
+
+        for term in self.index:
+            self.index[term][MAX_IMPACT] = Postings.max_impact(self.index[term][PAGES], norms)
 
         print("Index created. There's a total of {} distinct terms.".format(len(self.index)))
-        self.write_to_file(self.index)
 
+    @Metrics.timed("IndexBuilder.write_to_file")
     def write_to_file(self, index):
         """
-        Write the terms with the index.txt file, with their Afinn sentiment value, and the URLs in which they appear, as
-        well as the frequency at which they appear in every URL.
+        Write the index to the binary index files, with each term's Afinn sentiment value, and the IDs of the documents
+        in which it appears, as well as the frequency at which it appears in every document.
+        See DiskIndex for the layout of the files. The postings are compressed, with the max impact of each of their
+        blocks computed with the norms of the documents.
         :param index: the inverted index, the keys of which (terms) will be iterated through
         :return: None
         """
-        print("Writing index to {} file...\n".format(self.index_file))
-        with open(self.index_file, "w", encoding="utf-8") as index_file:
-            for term in sorted(index):
-                try:
-                    index_file.write("{} {} {} {} {}".format(term, index[term][CFT], index[term][DFT], index[term][IDF], index[term][SENTIMENT]))
-                    for url, stats in index[term][PAGES].items():
-                        index_file.write(" {} {} {}".format(url, stats[TF], stats[TF_IDF]))
-                    index_file.write("\n")
-                except UnicodeEncodeError:
-                    pass
+        print("Writing index to {} files...\n".format(", ".join(self.index_file + ext for ext in DiskIndex.extensions)))
+        norms = {doc_id: page_info[NORM] for doc_id, page_info in self.stats[PAGES].items() if NORM in page_info}
+        DiskIndex.write(index, self.index_file, norms if len(norms) == len(self.stats[PAGES]) else None)
 
     def get_index(self):
         """
@@ -89,31 +110,12 @@ class IndexBuilder:
         return self.index
 
     @staticmethod
-    def build_index_from_file():
+    @Metrics.timed("IndexBuilder.build_index_from_file")
+    def build_index_from_file(directory=""):
         """
-        Build the inverted index from the file.
+        Open the inverted index from the files.
+        The files are memory-mapped, and the postings of a term are only decoded when the term is looked up.
+        :param directory: directory of the index files
         :return: the inverted index
         """
-
-        index = {}
-
-        with open(IndexBuilder.index_file) as index_file:
-
-            for line in index_file.readlines():
-
-                elements = line.split()
-
-                index[elements[0]] = {}
-                index[elements[0]][CFT] = int(elements[1])
-                index[elements[0]][DFT] = int(elements[2])
-                index[elements[0]][IDF] = float(elements[3])
-                index[elements[0]][SENTIMENT] = float(elements[4])
-
-                index[elements[0]][PAGES] = {}
-
-                for i in range (5, len(elements), 3):
-                    index[elements[0]][PAGES][elements[i]] = {}
-                    index[elements[0]][PAGES][elements[i]][TF] = int(elements[i + 1])
-                    index[elements[0]][PAGES][elements[i]][TF_IDF] = float(elements[i + 2])
-
-        return index
+        return DiskIndex(os.path.join(directory, IndexBuilder.index_file))
@@ -0,0 +1,44 @@
+from classes.corpus_indexer import CorpusIndexer
+
+
+class IndexingPipeline:
+    """
+    Scrapy item pipeline which indexes pages while the crawl is running.
+    Each item yielded by ConcordiaSpider.parse_item is added to the stats and the index as soon as it's scraped. When
+    the spider closes, the tf-idf of the terms is computed and the stats and index files are written, so the index is
+    ready to be queried as soon as the crawl is over, without reading the feed file again.
+    More info: https://doc.scrapy.org/en/latest/topics/item-pipeline.html
+    """
+
+    # static variables
+    # kept on the class, since Scrapy creates the pipeline itself, and the script needs the index once the crawl is over
+    corpus_indexer = None
+
+    def open_spider(self, spider):
+        """
+        Start a new, empty index when the spider opens. It gets written to the directory in the INDEX_DIRECTORY setting,
+        and keeps the positions of the terms if the INDEX_POSITIONS setting is set.
+        :param spider: the spider which was opened
+        :return: None
+        """
+        IndexingPipeline.corpus_indexer = CorpusIndexer(
+            directory=spider.settings.get("INDEX_DIRECTORY", ""), positional=spider.settings.getbool("INDEX_POSITIONS")
+        )
+
+    def process_item(self, item, spider):
+        """
+        Add the page to the stats and the index.
+        :param item: scraped page, with its URL and its terms as content
+        :param spider: the spider which scraped the page
+        :return: the item, unchanged, so that it still gets written to the feed
+        """
+        IndexingPipeline.corpus_indexer.add_result(item)
+        return item
+
+    def close_spider(self, spider):
+        """
+        Compute the tf-idf of the terms, and write the stats and index files.
+        :param spider: the spider which was closed
+        :return: None
+        """
+        IndexingPipeline.corpus_indexer.finish()
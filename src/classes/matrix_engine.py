@@ -0,0 +1,174 @@
+from helpers import PAGES, URLS, IDF, NORM
+
+from collections import Counter
+from array import array
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:
+    numpy = None
+    sparse = None
+
+
+class MatrixEngine:
+    """
+    Scoring engine which compiles the index into a sparse document-term matrix, to score many queries at once.
+    NumPy and SciPy are optional: the engine is only available when both are installed.
+
+    Each row of the CSR matrix is a page, each column a term, and each value the tf-idf of the term in the page. The
+    norm of each row comes from the stats. A batch of queries is turned into a term-query matrix of query weights, and
+    the dot products of every page with every query are a single sparse matrix product. A second product, of the pages'
+    terms with the queries' terms, counts the query terms each page contains, which tells which pages match an OR query
+    (at least one) or an AND query (all of them). The best pages of each query are found with argpartition.
+
+    The scores are the same cosine similarities as Query computes, up to the rounding of sums done in another order.
+    """
+
+    # static variables
+    # number of queries scored by each matrix product, to bound the size of the products
+    batch_size = 512
+
+    def __init__(self, index, stats):
+        """
+        Compile the index into the matrix. Every term's postings are read once.
+        :param index: the inverted index
+        :param stats: stats of the pages, with the norm of each page
+        """
+        self.columns = {}
+        idf = array("d")
+        doc_ids = array("I")
+        weights = array("f")
+        offsets = array("Q", [0])
+
+        for term in index:
+            entry = index[term]
+            self.columns[term] = len(idf)
+            idf.append(entry[IDF])
+            doc_ids.extend(entry[PAGES].doc_ids)
+            weights.extend(entry[PAGES].weights)
+            offsets.append(len(doc_ids))
+
+        num_documents = len(stats[URLS])
+        shape = (num_documents, len(self.columns))
+
+        # the postings are the columns of the matrix, so it's built column by column, then converted to rows
+        self.matrix = sparse.csc_matrix(
+            (numpy.frombuffer(weights, dtype=numpy.float32).astype(numpy.float64), numpy.frombuffer(doc_ids, dtype=numpy.uint32), numpy.frombuffer(offsets, dtype=numpy.uint64)),
+            shape=shape
+        ).tocsr()
+        self.incidence = self.matrix.copy()
+        self.incidence.data = numpy.ones_like(self.incidence.data)
+
+        self.idf = numpy.frombuffer(idf, dtype=numpy.float64)
+        self.norms = numpy.zeros(num_documents)
+        for doc_id, page_info in stats[PAGES].items():
+            self.norms[doc_id] = page_info.get(NORM, 0.0)
+
+    @staticmethod
+    def available():
+        """
+        :return: whether NumPy and SciPy are installed
+        """
+        return numpy is not None
+
+    def query_matrices(self, batch):
+        """
+        Build the term-query matrices of a batch of queries: one of query weights (the term's count in the query times
+        its idf), and one of ones, for the terms of the queries which are in the index.
+        :param batch: list of queries, each a list of terms
+        :return: the matrix of weights, the matrix of ones, the number of distinct terms of each query, and the norm of
+        each query
+        """
+        rows, columns, values = [], [], []
+        num_terms = numpy.zeros(len(batch), dtype=numpy.int64)
+        query_norms = numpy.zeros(len(batch))
+
+        for column, terms in enumerate(batch):
+            counts = Counter(terms)
+            num_terms[column] = len(counts)
+            squares = 0.0
+            for term, count in counts.items():
+                if term in self.columns:
+                    weight = count * self.idf[self.columns[term]]
+                    rows.append(self.columns[term])
+                    columns.append(column)
+                    values.append(weight)
+                    squares += weight ** 2
+            query_norms[column] = numpy.sqrt(squares)
+
+        shape = (len(self.columns), len(batch))
+        weights = sparse.csc_matrix((values, (rows, columns)), shape=shape)
+        ones = sparse.csc_matrix((numpy.ones(len(values)), (rows, columns)), shape=shape)
+        return weights, ones, num_terms, query_norms
+
+    def search(self, batch, conjunctive=False, k=0):
+        """
+        Rank the pages for a batch of queries.
+        :param batch: list of queries, each a list of terms
+        :param conjunctive: True for AND queries, which only match the pages containing all of their terms, False for
+        OR queries
+        :param k: number of pages to keep per query, 0 for all of the matching pages
+        :return: for each query, list of (page ID, cosine similarity), best first, ties broken by lowest ID
+        """
+        rankings = []
+        for start in range(0, len(batch), self.batch_size):
+            rankings.extend(self.search_batch(batch[start:start + self.batch_size], conjunctive, k))
+        return rankings
+
+    def search_batch(self, batch, conjunctive, k):
+        """
+        Rank the pages for a batch of queries with two sparse matrix products.
+        :param batch: list of queries, each a list of terms
+        :param conjunctive: whether the queries are AND queries
+        :param k: number of pages to keep per query, 0 for all
+        :return: for each query, list of (page ID, cosine similarity)
+        """
+        weights, ones, num_terms, query_norms = self.query_matrices(batch)
+
+        dot_products = (self.matrix @ weights).tocsc()
+        dot_products.sort_indices()
+        matches = (self.incidence @ ones).tocsc()
+
+        rankings = []
+        for column in range(len(batch)):
+            doc_ids = matches.indices[matches.indptr[column]:matches.indptr[column + 1]]
+            if conjunctive:
+                counts = matches.data[matches.indptr[column]:matches.indptr[column + 1]]
+                doc_ids = doc_ids[counts == num_terms[column]]
+            if not len(doc_ids):
+                rankings.append([])
+                continue
+            doc_ids = numpy.sort(doc_ids)
+
+            # dot products which are 0 may not be stored, so they're looked up among the ones that are
+            scored_ids = dot_products.indices[dot_products.indptr[column]:dot_products.indptr[column + 1]]
+            scored_values = dot_products.data[dot_products.indptr[column]:dot_products.indptr[column + 1]]
+            positions = numpy.minimum(numpy.searchsorted(scored_ids, doc_ids), max(len(scored_ids) - 1, 0))
+            dot = numpy.where(scored_ids[positions] == doc_ids, scored_values[positions], 0.0) if len(scored_ids) else numpy.zeros(len(doc_ids))
+
+            denominators = query_norms[column] * self.norms[doc_ids]
+            cosine_similarities = numpy.divide(dot, denominators, out=numpy.zeros(len(doc_ids)), where=denominators != 0)
+
+            rankings.append(MatrixEngine.top_k(doc_ids, cosine_similarities, k))
+
+        return rankings
+
+    @staticmethod
+    def top_k(doc_ids, cosine_similarities, k):
+        """
+        Keep the k pages with the highest cosine similarity, best first, ties broken by lowest ID.
+        argpartition finds the k-th highest score without sorting everything. Every page tied with it is kept until the
+        final sort, so that the ties are broken the same way as with a full sort.
+        :param doc_ids: sorted IDs of the matching pages
+        :param cosine_similarities: cosine similarity of each page
+        :param k: number of pages to keep, 0 for all
+        :return: list of (page ID, cosine similarity)
+        """
+        if k and len(doc_ids) > k:
+            kth = cosine_similarities[numpy.argpartition(-cosine_similarities, k - 1)[k - 1]]
+            kept = cosine_similarities >= kth
+            doc_ids, cosine_similarities = doc_ids[kept], cosine_similarities[kept]
+
+        order = numpy.lexsort((doc_ids, -cosine_similarities))[:k or None]
+        return [(int(doc_ids[position]), float(cosine_similarities[position])) for position in order]
@@ -0,0 +1,320 @@
+from tabulate import tabulate
+
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+import json
+import threading
+import time
+
+
+class Metrics:
+    """
+    Timers, counters and latency histograms of the stages of a run: the crawl, the tokenization of the pages, the stats,
+    the index build and write, loading the index, and the queries. They're kept in the class, like the report of the
+    crawl, so that every stage adds to the same measures without passing them around, and are exported once the run is
+    over, as a JSON report, or in the Prometheus text format.
+
+    Measuring is off unless enabled. A timed function then only checks whether it's enabled before being called, so
+    instrumented code runs at the same speed as before. Only stages which run once per crawl, per page or per query are
+    timed, not the functions called for every term. Stages run in other processes, e.g. by tokenizer workers or query
+    workers, are measured in those processes, so they don't show up in the measures of the main process. Stages run in
+    other threads, e.g. the merge of segments in the background, are measured with the others, under a lock.
+    """
+
+    # static variables
+    enabled = False
+    started = None
+
+    # number of calls, total seconds and longest call of each timed stage, by name
+    timers = {}
+
+    # totals of the counters, by name
+    counters = {}
+
+    # histograms of latencies, by name and by kind of query
+    histograms = {}
+
+    # upper bounds of the buckets of the histograms, in seconds
+    buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    # prefix of the names of the metrics in the Prometheus format
+    namespace = "swc"
+
+    # held while the measures are changed or read
+    lock = threading.Lock()
+
+    @staticmethod
+    def enable():
+        """
+        Start measuring, from empty measures.
+        :return: None
+        """
+        Metrics.reset()
+        Metrics.enabled = True
+
+    @staticmethod
+    def disable():
+        """
+        Stop measuring, and keep the measures so far.
+        :return: None
+        """
+        Metrics.enabled = False
+
+    @staticmethod
+    def reset():
+        """
+        Drop every measure.
+        :return: None
+        """
+        with Metrics.lock:
+            Metrics.started = time.time()
+            Metrics.timers = {}
+            Metrics.counters = {}
+            Metrics.histograms = {}
+
+    @staticmethod
+    def timed(name):
+        """
+        Decorator timing each call of a function, when measuring is enabled.
+        :param name: name of the stage the function is
+        :return: the decorator
+        """
+        def decorator(function):
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                if not Metrics.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    Metrics.add_time(name, time.perf_counter() - start)
+            return timed_function
+        return decorator
+
+    @staticmethod
+    def timer(name):
+        """
+        Context manager timing a block of code, e.g. the part of a generator before it yields, when measuring is enabled.
+        :param name: name of the stage the block is
+        :return: the context manager
+        """
+        if not Metrics.enabled:
+            return nullcontext()
+        return Timer(name)
+
+    @staticmethod
+    def add_time(name, seconds):
+        """
+        :param name: name of the stage
+        :param seconds: duration of a call of the stage
+        :return: None
+        """
+        with Metrics.lock:
+            timer = Metrics.timers.get(name)
+            if timer is None:
+                timer = Metrics.timers[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+            timer["calls"] += 1
+            timer["seconds"] += seconds
+            if seconds > timer["max_seconds"]:
+                timer["max_seconds"] = seconds
+
+    @staticmethod
+    def count(name, value=1):
+        """
+        Add to a counter, when measuring is enabled.
+        :param name: name of the counter
+        :param value: amount to add
+        :return: None
+        """
+        if Metrics.enabled:
+            with Metrics.lock:
+                Metrics.counters[name] = Metrics.counters.get(name, 0) + value
+
+    @staticmethod
+    def observe(name, seconds, mode=None):
+        """
+        Add a latency to a histogram, when measuring is enabled.
+        :param name: name of the histogram
+        :param seconds: the latency
+        :param mode: kind of query the latency is of, None for none
+        :return: None
+        """
+        if not Metrics.enabled:
+            return
+
+        bucket = 0
+        while bucket < len(Metrics.buckets) and seconds > Metrics.buckets[bucket]:
+            bucket += 1
+
+        with Metrics.lock:
+            histogram = Metrics.histograms.setdefault(name, {}).get(mode)
+            if histogram is None:
+                histogram = Metrics.histograms[name][mode] = {"buckets": [0] * (len(Metrics.buckets) + 1), "count": 0, "sum": 0.0}
+            histogram["buckets"][bucket] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    @staticmethod
+    def get_snapshot():
+        """
+        Copy the measures, so that they can be exported while other threads keep adding to them.
+        :return: copies of the timers, the counters and the histograms
+        """
+        with Metrics.lock:
+            return (
+                {name: dict(timer) for name, timer in Metrics.timers.items()},
+                dict(Metrics.counters),
+                {
+                    name: {mode: dict(histogram, buckets=list(histogram["buckets"])) for mode, histogram in modes.items()}
+                    for name, modes in Metrics.histograms.items()
+                }
+            )
+
+    @staticmethod
+    def get_report():
+        """
+        :return: the measures, as a dictionary which can be encoded in JSON. The buckets of the histograms are
+        cumulative, like in the Prometheus format, and keyed by their upper bound
+        """
+        timers, counters, histograms = Metrics.get_snapshot()
+        report_histograms = {}
+        for name, modes in histograms.items():
+            report_histograms[name] = {}
+            for mode, histogram in modes.items():
+                report_histograms[name][mode or ""] = {
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "mean": histogram["sum"] / histogram["count"],
+                    "buckets": dict(zip(Metrics.get_bounds(), Metrics.get_cumulative(histogram)))
+                }
+
+        return {
+            "started": datetime.fromtimestamp(Metrics.started, timezone.utc).isoformat(timespec="seconds") if Metrics.started else None,
+            "seconds": time.time() - Metrics.started if Metrics.started else 0.0,
+            "stages": timers,
+            "counters": counters,
+            "histograms": report_histograms
+        }
+
+    @staticmethod
+    def get_bounds():
+        """
+        :return: upper bound of each bucket, as text, the last one being +Inf
+        """
+        return [repr(bound) for bound in Metrics.buckets] + ["+Inf"]
+
+    @staticmethod
+    def get_cumulative(histogram):
+        """
+        :param histogram: a histogram
+        :return: number of latencies up to the upper bound of each bucket
+        """
+        cumulative, total = [], 0
+        for count in histogram["buckets"]:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    @staticmethod
+    def to_prometheus():
+        """
+        Export the measures in the Prometheus text format: the stages as counters of their seconds and calls, labeled by
+        stage, the counters as counters, and the histograms as histograms, labeled by kind of query.
+        More info: https://prometheus.io/docs/instrumenting/exposition_formats/
+        :return: the measures, as text
+        """
+        timers, counters, histograms = Metrics.get_snapshot()
+        prefix = Metrics.namespace + "_"
+        lines = []
+
+        if timers:
+            for metric, key, description in [
+                ("stage_seconds_total", "seconds", "Time spent in each stage, in seconds."),
+                ("stage_calls_total", "calls", "Number of calls of each stage.")
+            ]:
+                lines.append("# HELP {}{} {}".format(prefix, metric, description))
+                lines.append("# TYPE {}{} counter".format(prefix, metric))
+                for name, timer in sorted(timers.items()):
+                    lines.append('{}{}{{stage="{}"}} {}'.format(prefix, metric, name, repr(timer[key])))
+
+        for name, value in sorted(counters.items()):
+            lines.append("# TYPE {}{}_total counter".format(prefix, name))
+            lines.append("{}{}_total {}".format(prefix, name, value))
+
+        for name, modes in sorted(histograms.items()):
+            lines.append("# TYPE {}{} histogram".format(prefix, name))
+            for mode, histogram in sorted(modes.items(), key=lambda item: item[0] or ""):
+                label = 'mode="{}",'.format(mode) if mode else ""
+                for bound, count in zip(Metrics.get_bounds(), Metrics.get_cumulative(histogram)):
+                    lines.append('{}{}_bucket{{{}le="{}"}} {}'.format(prefix, name, label, bound, count))
+                selector = "{{{}}}".format(label.rstrip(",")) if label else ""
+                lines.append("{}{}_sum{} {}".format(prefix, name, selector, repr(histogram["sum"])))
+                lines.append("{}{}_count{} {}".format(prefix, name, selector, histogram["count"]))
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def print_report():
+        """
+        Print the time spent in each stage, slowest first, the counters, and the latencies of the queries.
+        :return: None
+        """
+        timers, counters, histograms = Metrics.get_snapshot()
+        print(tabulate(
+            tabular_data=[
+                [name, timer["calls"], round(timer["seconds"], 3), round(timer["max_seconds"] * 1000, 3)]
+                for name, timer in sorted(timers.items(), key=lambda item: -item[1]["seconds"])
+            ],
+            headers=["stage", "calls", "total (s)", "longest call (ms)"],
+            tablefmt="fancy_grid", numalign="left", stralign="left"
+        ))
+        for name, value in sorted(counters.items()):
+            print("{}: {:,}".format(name, value))
+        for name, modes in sorted(histograms.items()):
+            for mode, histogram in sorted(modes.items(), key=lambda item: item[0] or ""):
+                print("{}{}: {:,} queries, {} ms on average".format(
+                    name, " ({})".format(mode) if mode else "", histogram["count"], round(histogram["sum"] / histogram["count"] * 1000, 3)
+                ))
+
+    @staticmethod
+    def write_report(file_path):
+        """
+        :param file_path: file the JSON report is written to
+        :return: None
+        """
+        with open(file_path, "w", encoding="utf-8") as report_file:
+            json.dump(Metrics.get_report(), report_file, indent=2)
+
+    @staticmethod
+    def write_prometheus(file_path):
+        """
+        Write the measures in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+        :param file_path: file the measures are written to
+        :return: None
+        """
+        with open(file_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(Metrics.to_prometheus())
+
+
+class Timer:
+    """
+    Context manager adding the time spent in a block of code to a stage's timer.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: name of the stage
+        """
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,134 @@
+from collections import Counter
+
+import hashlib
+import json
+
+
+class NearDuplicates:
+    """
+    Detect pages whose terms are nearly the same as those of a page seen before, like print views, URLs with tracking
+    parameters, or listings generated from the same template, which would otherwise be indexed several times, and skew
+    the document frequency, so the idf, of their terms.
+
+    Each page gets a 64-bit SimHash of its shingles, i.e. of its runs of consecutive terms: every shingle is hashed,
+    and each bit of the fingerprint is the one most of the shingles' hashes have. Pages sharing most of their shingles
+    get fingerprints differing by a few bits only, and two pages are near-duplicates when their fingerprints differ by
+    at most threshold bits.
+
+    The fingerprints are indexed with LSH banding: each fingerprint is split into threshold + 1 bands, and each band is
+    a key of its own bucket table. Two fingerprints differing by at most threshold bits can't differ in every band, so
+    they share the bucket of at least one band. Only the pages in the buckets of a fingerprint's bands are compared to
+    it, instead of every page seen.
+    """
+
+    # static variables
+    fingerprint_bits = 64
+    shingle_size = 3
+
+    def __init__(self, threshold=5):
+        """
+        :param threshold: largest number of bits two fingerprints of near-duplicates differ by
+        """
+        self.threshold = threshold
+
+        num_bands = threshold + 1
+        bounds = [NearDuplicates.fingerprint_bits * band // num_bands for band in range(num_bands + 1)]
+        self.bands = [(low, (1 << (high - low)) - 1) for low, high in zip(bounds, bounds[1:])]
+
+        # URL and fingerprint of each page which isn't a near-duplicate, and for each band, pages by the band's value
+        self.urls = []
+        self.fingerprints = []
+        self.buckets = [{} for _ in self.bands]
+
+    @staticmethod
+    def fingerprint(terms):
+        """
+        SimHash of the shingles of a page.
+        :param terms: terms of the page, in order
+        :return: 64-bit fingerprint
+        """
+        size = NearDuplicates.shingle_size
+        shingles = Counter(" ".join(terms[start:start + size]) for start in range(max(len(terms) - size + 1, 1)))
+
+        # the bits of each shingle's hash, as a string, repeated as many times as the shingle, so that the bits can be
+        # counted a column at a time
+        hashes = []
+        for shingle, count in shingles.items():
+            digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+            hashes.extend([format(int.from_bytes(digest, "little"), "064b")] * count)
+
+        fingerprint = 0
+        for column in zip(*hashes):
+            fingerprint = fingerprint << 1 | (column.count("1") * 2 > len(hashes))
+        return fingerprint
+
+    def get_bands(self, fingerprint):
+        """
+        :param fingerprint: fingerprint of a page
+        :return: value of each band of the fingerprint
+        """
+        return [(fingerprint >> low) & mask for low, mask in self.bands]
+
+    def find(self, fingerprint):
+        """
+        Find a page seen before whose fingerprint differs by at most threshold bits.
+        :param fingerprint: fingerprint of a page
+        :return: URL of the page, None if there is no such page
+        """
+        for buckets, value in zip(self.buckets, self.get_bands(fingerprint)):
+            for page in buckets.get(value, ()):
+                if bin(fingerprint ^ self.fingerprints[page]).count("1") <= self.threshold:
+                    return self.urls[page]
+        return None
+
+    def add(self, url, fingerprint):
+        """
+        Add a page which isn't a near-duplicate.
+        :param url: URL of the page
+        :param fingerprint: fingerprint of the page
+        :return: None
+        """
+        page = len(self.urls)
+        self.urls.append(url)
+        self.fingerprints.append(fingerprint)
+        for buckets, value in zip(self.buckets, self.get_bands(fingerprint)):
+            buckets.setdefault(value, []).append(page)
+
+    def check(self, url, terms):
+        """
+        Check whether a page is a near-duplicate of a page seen before, and add it if it isn't.
+        Pages without terms are never near-duplicates.
+        :param url: URL of the page
+        :param terms: terms of the page, in order
+        :return: the canonical URL, i.e. the URL of the page it's a near-duplicate of, None if it isn't one
+        """
+        if not terms:
+            return None
+
+        fingerprint = NearDuplicates.fingerprint(terms)
+        canonical_url = self.find(fingerprint)
+
+        if canonical_url is None:
+            self.add(url, fingerprint)
+        return canonical_url
+
+    def write(self, file_path):
+        """
+        Write the fingerprints of the pages, one per line, so that a resumed crawl still detects their near-duplicates.
+        :param file_path: file to write
+        :return: None
+        """
+        with open(file_path, "w", encoding="utf-8") as fingerprints_file:
+            for url, fingerprint in zip(self.urls, self.fingerprints):
+                fingerprints_file.write("{}\n".format(json.dumps([url, fingerprint])))
+
+    def read(self, file_path):
+        """
+        Add the pages of a file written by write.
+        :param file_path: file to read
+        :return: None
+        """
+        with open(file_path, encoding="utf-8") as fingerprints_file:
+            for line in fingerprints_file:
+                if line.strip():
+                    self.add(*json.loads(line))
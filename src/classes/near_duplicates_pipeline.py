@@ -0,0 +1,79 @@
+from helpers import URL, CONTENT
+from classes.near_duplicates import NearDuplicates
+
+from scrapy.exceptions import DropItem
+from scrapy.utils.job import job_dir
+
+import json
+import os
+
+
+class NearDuplicatesPipeline:
+    """
+    Scrapy item pipeline which drops the pages that are near-duplicates of a page already scraped, before they're
+    written to the feed or indexed. It comes after the TokenizerPipeline, since it needs the terms of the pages, and
+    before the IndexingPipeline.
+    The number of pages dropped, and the tokens and bytes of the feed they would have taken, are added to the crawl's
+    stats, which the CrawlReport prints. The URL of the page each dropped page is a near-duplicate of is kept in the
+    spider's canonical_urls, which the CrawlReport keeps too. With a job directory, the fingerprints of the pages are kept in it, so that a
+    resumed crawl still drops near-duplicates of the pages scraped before.
+    More info: https://doc.scrapy.org/en/latest/topics/item-pipeline.html
+    """
+
+    # static variables
+    fingerprints_file = "near_duplicates.jl"
+
+    def __init__(self, threshold, stats, directory=None):
+        """
+        :param threshold: largest number of bits the fingerprints of two near-duplicates differ by
+        :param stats: stats collector of the crawl
+        :param directory: job directory of the crawl, None if it can't be resumed
+        """
+        self.near_duplicates = NearDuplicates(threshold)
+        self.stats = stats
+        self.file_path = os.path.join(directory, NearDuplicatesPipeline.fingerprints_file) if directory else None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Create the pipeline from the DUPLICATE_THRESHOLD and JOBDIR settings.
+        :param crawler: the crawler using the pipeline
+        :return: the pipeline
+        """
+        return cls(crawler.settings.getint("DUPLICATE_THRESHOLD", 5), crawler.stats, job_dir(crawler.settings))
+
+    def open_spider(self, spider):
+        """
+        Read the fingerprints of the pages scraped by previous runs of the crawl.
+        :param spider: the spider which was opened
+        :return: None
+        """
+        if self.file_path and os.path.exists(self.file_path):
+            self.near_duplicates.read(self.file_path)
+
+    def process_item(self, item, spider):
+        """
+        Drop the page if it's a near-duplicate.
+        :param item: scraped page, with its URL and its terms as content
+        :param spider: the spider which scraped the page
+        :return: the item, unchanged, if it isn't a near-duplicate
+        """
+        canonical_url = self.near_duplicates.check(item[URL], item[CONTENT])
+        if canonical_url is None:
+            return item
+
+        spider.duplicate_pages += 1
+        spider.canonical_urls[item[URL]] = canonical_url
+        self.stats.inc_value("near_duplicates/pages", 1)
+        self.stats.inc_value("near_duplicates/tokens", len(item[CONTENT]))
+        self.stats.inc_value("near_duplicates/bytes", len(json.dumps(dict(item)).encode("utf-8")))
+        raise DropItem("Near-duplicate of {}: {}".format(canonical_url, item[URL]))
+
+    def close_spider(self, spider):
+        """
+        Keep the fingerprints in the job directory.
+        :param spider: the spider which was closed
+        :return: None
+        """
+        if self.file_path:
+            self.near_duplicates.write(self.file_path)
@@ -0,0 +1,174 @@
+from classes.seen_urls import SeenUrls
+
+import hashlib
+import json
+import os
+import sqlite3
+
+
+class PageValidators:
+    """
+    Store of what was known about each page the last time it was crawled, so that a crawl run again only downloads and
+    indexes the pages which changed since:
+     - its validators, the ETag and Last-Modified headers of its response, which are sent back in a conditional request,
+       If-None-Match and If-Modified-Since, to which the server answers 304 Not Modified, without the page, if it didn't
+       change.
+     - a hash of its content, for servers which don't send validators, so that an unchanged page is at least neither
+       parsed nor tokenized nor indexed again.
+     - its length, and the CPU time it took to parse and tokenize it, which is what skipping it saves.
+     - the links followed from it, since a 304 response has no links to follow.
+
+    The pages are keyed by the fingerprint of their canonical URL, like in SeenUrls. Changes are only committed once
+    the pages of the crawl were indexed, so that a crawl which fails before that doesn't mark its pages as indexed.
+    """
+
+    # static variables
+    validators_file = "validators.sqlite"
+
+    columns = ["etag", "last_modified", "content_hash", "length", "parse_seconds", "links"]
+
+    def __init__(self, path=None):
+        """
+        Open the store.
+        :param path: file the store is kept in, None to hold it in memory
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path or ":memory:")
+        if path:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "fingerprint BLOB PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash BLOB, length INTEGER, "
+            "parse_seconds REAL, links TEXT"
+            ") WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def remove(path):
+        """
+        Delete a store, e.g. when the index is rebuilt from scratch, since its pages aren't indexed anymore.
+        :param path: file of the store
+        :return: None
+        """
+        for file_path in [path, path + "-wal", path + "-shm"]:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+    @staticmethod
+    def content_hash(body):
+        """
+        :param body: body of a response
+        :return: 16-byte hash of the body
+        """
+        return hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, url):
+        """
+        :param url: URL of a page
+        :return: dictionary of what was known about the page, with its links as a list, None if it was never crawled
+        """
+        row = self.connection.execute(
+            "SELECT {} FROM pages WHERE fingerprint = ?".format(", ".join(PageValidators.columns)),
+            (SeenUrls.fingerprint(url),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        validators = dict(zip(PageValidators.columns, row))
+        validators["links"] = json.loads(validators["links"]) if validators["links"] else []
+        return validators
+
+    def update(self, url, etag, last_modified, content_hash, length, parse_seconds=None):
+        """
+        Keep the validators of a page which was downloaded, keeping its links and the time it took to parse it, unless
+        it was parsed again.
+        :param url: URL of the page
+        :param etag: ETag header of the response, None if there was none
+        :param last_modified: Last-Modified header of the response, None if there was none
+        :param content_hash: hash of the body of the response
+        :param length: length of the body of the response, in bytes
+        :param parse_seconds: CPU time it took to parse and tokenize the page, None if it wasn't parsed
+        :return: None
+        """
+        fingerprint = SeenUrls.fingerprint(url)
+        updated = self.connection.execute(
+            "UPDATE pages SET etag = ?, last_modified = ?, content_hash = ?, length = ?, "
+            "parse_seconds = COALESCE(?, parse_seconds) WHERE fingerprint = ?",
+            (etag, last_modified, content_hash, length, parse_seconds, fingerprint)
+        )
+        if not updated.rowcount:
+            self.connection.execute(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (fingerprint, etag, last_modified, content_hash, length, parse_seconds)
+            )
+
+    def set_links(self, url, links):
+        """
+        :param url: URL of a page already in the store
+        :param links: URLs of the links followed from the page
+        :return: None
+        """
+        self.connection.execute(
+            "UPDATE pages SET links = ? WHERE fingerprint = ?", (json.dumps(links), SeenUrls.fingerprint(url))
+        )
+
+    def delete(self, url):
+        """
+        Forget a page which was deleted from its site.
+        :param url: URL of the page
+        :return: None
+        """
+        self.connection.execute("DELETE FROM pages WHERE fingerprint = ?", (SeenUrls.fingerprint(url),))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self, commit=True):
+        """
+        Close the store.
+        :param commit: whether or not the changes of the crawl are kept, which they should only be once its pages were
+        indexed
+        :return: None
+        """
+        if commit:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+
+class ConditionalRequestsMiddleware:
+    """
+    Scrapy downloader middleware which turns the requests of pages crawled before into conditional requests, with the
+    validators kept in the spider's PageValidators store. What the store knows about the page is put in the request's
+    meta, and the spider is let to handle the responses which tell that the page didn't change (304 Not Modified) or was
+    deleted (404 Not Found, 410 Gone), which would otherwise be dropped by the HttpErrorMiddleware.
+    More info: https://doc.scrapy.org/en/latest/topics/downloader-middleware.html
+    """
+
+    # static variables
+    handled_statuses = [304, 404, 410]
+
+    def process_request(self, request, spider):
+        """
+        Add the If-None-Match and If-Modified-Since headers to the request, if the page was crawled before.
+        :param request: request about to be downloaded
+        :param spider: the spider which made the request, with its store of validators
+        :return: None, so that the request is downloaded
+        """
+        if getattr(spider, "validators", None) is None or request.method != "GET":
+            return None
+
+        validators = spider.validators.get(request.url)
+        if validators is None:
+            return None
+
+        if validators["etag"]:
+            request.headers.setdefault("If-None-Match", validators["etag"])
+        if validators["last_modified"]:
+            request.headers.setdefault("If-Modified-Since", validators["last_modified"])
+
+        request.meta["page_validators"] = validators
+        request.meta["handle_httpstatus_list"] = request.meta.get("handle_httpstatus_list", []) + ConditionalRequestsMiddleware.handled_statuses
+        return None
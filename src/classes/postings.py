@@ -0,0 +1,285 @@
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+import sys
+
+
+class Postings:
+    """
+    Postings list of a term, stored as parallel compact arrays sorted by document ID:
+     - doc_ids: IDs of the documents the term appears in
+     - tfs: number of times the term appears in each of those documents
+     - weights: tf-idf of the term in each of those documents
+     - positions: for a positional index, the positions of the term in each of those documents, None otherwise. The
+       positions of a document are delta-encoded, each one stored as the gap from the previous one, and the positions
+       of all of the documents are concatenated. A document has as many positions as its term frequency, so where its
+       positions start is the sum of the term frequencies before it.
+    A posting costs 12 bytes, instead of a URL string and a dictionary, plus 4 bytes per position.
+    """
+
+    def __init__(self, doc_ids=None, tfs=None, weights=None, positions=None):
+        """
+        Create a postings list, either empty or from existing arrays.
+        :param doc_ids: array('I') of document IDs, sorted
+        :param tfs: array('I') of term frequencies
+        :param weights: array('f') of tf-idf values
+        :param positions: array('I') of the gaps between the positions of the term in each document, None if they
+        aren't kept
+        """
+        self.doc_ids = doc_ids if doc_ids is not None else array("I")
+        self.tfs = tfs if tfs is not None else array("I")
+        self.weights = weights if weights is not None else array("f", bytes(4 * len(self.doc_ids)))
+        self.positions = positions
+
+        # where the positions of each document start, computed when they're first looked up
+        self.position_starts = None
+
+    def add(self, doc_id, tf=1, positions=None):
+        """
+        Add occurrences of the term in a document. Documents have to be added in increasing order of their ID, which is
+        the case when the pages are indexed in the order they were crawled.
+        The positions of the term, if they're kept, have to be added along with the first posting, and all at once for
+        each document.
+        :param doc_id: ID of the document
+        :param tf: number of occurrences
+        :param positions: sorted positions of the occurrences in the document, None if they aren't kept
+        :return: None
+        """
+        if self.doc_ids and self.doc_ids[-1] == doc_id:
+            self.tfs[-1] += tf
+        else:
+            self.doc_ids.append(doc_id)
+            self.tfs.append(tf)
+            self.weights.append(0.0)
+
+        if positions is not None:
+            if self.positions is None:
+                self.positions = array("I")
+            previous = 0
+            for position in positions:
+                self.positions.append(position - previous)
+                previous = position
+            self.position_starts = None
+
+    def find(self, doc_id):
+        """
+        Binary search the postings for a document.
+        :param doc_id: ID of the document
+        :return: position of the document in the postings, or -1 if the term doesn't appear in it
+        """
+        position = bisect_left(self.doc_ids, doc_id)
+        if position < len(self.doc_ids) and self.doc_ids[position] == doc_id:
+            return position
+        return -1
+
+    def tf(self, doc_id):
+        """
+        :param doc_id: ID of the document
+        :return: number of times the term appears in the document
+        """
+        position = self.find(doc_id)
+        return self.tfs[position] if position >= 0 else 0
+
+    def weight(self, doc_id):
+        """
+        :param doc_id: ID of the document
+        :return: tf-idf of the term in the document
+        """
+        position = self.find(doc_id)
+        return self.weights[position] if position >= 0 else 0.0
+
+    def set_weights(self, idf):
+        """
+        Compute the tf-idf of the term in every document, once its idf is known.
+        :param idf: inverse document frequency of the term
+        :return: None
+        """
+        self.weights = array("f", [tf * idf for tf in self.tfs])
+
+    def seek(self, doc_id, start=0):
+        """
+        Find the first position, from start, of a document ID at least as high as doc_id, by galloping.
+        :param doc_id: ID of the document to find
+        :param start: position to start from, e.g. where the previous search stopped
+        :return: position of the first ID not lower than doc_id, or the length of the postings if there is none
+        """
+        return Postings.gallop(self.doc_ids, doc_id, start)
+
+    def doc_id_at(self, position):
+        """
+        :param position: position in the postings
+        :return: ID of the document at the position
+        """
+        return self.doc_ids[position]
+
+    def weight_at(self, position):
+        """
+        :param position: position in the postings
+        :return: tf-idf of the term in the document at the position
+        """
+        return self.weights[position]
+
+    def has_positions(self):
+        """
+        :return: True if the positions of the term are kept
+        """
+        return self.positions is not None
+
+    def get_position_starts(self):
+        """
+        :return: array of where the positions of each document start, and where the last ones end
+        """
+        if self.position_starts is None:
+            self.position_starts = array("I", accumulate(self.tfs, initial=0))
+        return self.position_starts
+
+    def get_positions(self, position):
+        """
+        Decode the positions of the term in a document.
+        :param position: position of the document in the postings
+        :return: list of the positions of the term in the document, in increasing order
+        """
+        starts = self.get_position_starts()
+        return list(accumulate(self.positions[starts[position]:starts[position + 1]]))
+
+    def slice(self, start, end):
+        """
+        :param start: position of the first document to keep
+        :param end: position after the last document to keep
+        :return: postings of the documents from start to end (excluded), with their positions if they're kept
+        """
+        positions = None
+        if self.has_positions():
+            starts = self.get_position_starts()
+            positions = self.positions[starts[start]:starts[end]]
+        return Postings(self.doc_ids[start:end], self.tfs[start:end], self.weights[start:end], positions)
+
+    def block_max_impact(self, doc_id):
+        """
+        Bound of the term's max impact around a document, tighter than the max impact of the term, if the postings have
+        one. See CompressedPostings.
+        :param doc_id: ID of a document
+        :return: None, since postings held in memory don't have such bounds
+        """
+        return None
+
+    @staticmethod
+    def read_array(typecode, buffer, offset, length):
+        """
+        Read a little-endian column of numbers from a buffer.
+        :param typecode: array typecode of the column
+        :param buffer: buffer to read from
+        :param offset: position of the column in the buffer
+        :param length: number of values in the column
+        :return: array of values
+        """
+        values = array(typecode)
+        values.frombytes(buffer[offset:offset + length * values.itemsize])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    @staticmethod
+    def gallop(doc_ids, doc_id, start=0):
+        """
+        Find the first position, from start, of a document ID at least as high as doc_id, with a galloping search:
+        the step doubles until it goes past doc_id, then the last step is binary searched. Finding a document k
+        positions ahead costs O(log k), instead of O(log n) from the start or O(k) one by one.
+        :param doc_ids: sorted document IDs
+        :param doc_id: ID of the document to find
+        :param start: position to start from, e.g. where the previous search stopped
+        :return: position of the first ID not lower than doc_id, or the length of doc_ids if there is none
+        """
+        step = 1
+        end = start
+        while end < len(doc_ids) and doc_ids[end] < doc_id:
+            start = end + 1
+            end += step
+            step *= 2
+        return bisect_left(doc_ids, doc_id, start, min(end, len(doc_ids)))
+
+    @staticmethod
+    def intersect(lists_of_postings):
+        """
+        Get the IDs of the documents which are in every postings list.
+        The shortest list is gone through, and each of its documents is searched in the next shortest list, by galloping
+        from where the previous search stopped. The documents left are then searched in the next list, and so on. The
+        intersection stops as soon as a list is exhausted, so its cost depends on the length of the rarest term's list.
+        :param lists_of_postings: list of postings lists
+        :return: sorted list of the IDs of the documents in every list
+        """
+        if not lists_of_postings or not all(lists_of_postings):
+            return []
+
+        lists_of_postings = sorted(lists_of_postings, key=len)
+        doc_ids = list(lists_of_postings[0].doc_ids)
+
+        for postings in lists_of_postings[1:]:
+            matches = []
+            position = 0
+            for doc_id in doc_ids:
+                position = postings.seek(doc_id, position)
+                if position == len(postings):
+                    break
+                if postings.doc_id_at(position) == doc_id:
+                    matches.append(doc_id)
+            doc_ids = matches
+            if not doc_ids:
+                break
+
+        return doc_ids
+
+    @staticmethod
+    def match_phrase(lists_of_positions):
+        """
+        Find where the terms of a phrase follow each other in a document, with a positional merge.
+        The positions of the rarest term, shifted back by its offset in the phrase, are the candidate starts of the
+        phrase. Each other term, from the next rarest, keeps the starts it appears after at its own offset, by walking
+        through its sorted positions along with the sorted starts.
+        :param lists_of_positions: sorted positions in the document of each term of the phrase, in the phrase's order
+        :return: list of the positions the phrase starts at, empty if it's not in the document
+        """
+        if not lists_of_positions:
+            return []
+
+        offsets = sorted(range(len(lists_of_positions)), key=lambda offset: len(lists_of_positions[offset]))
+        starts = [position - offsets[0] for position in lists_of_positions[offsets[0]]]
+
+        for offset in offsets[1:]:
+            positions = lists_of_positions[offset]
+            matches = []
+            current = 0
+            for start in starts:
+                while current < len(positions) and positions[current] < start + offset:
+                    current += 1
+                if current == len(positions):
+                    break
+                if positions[current] == start + offset:
+                    matches.append(start)
+            starts = matches
+            if not starts:
+                break
+
+        return starts
+
+    @staticmethod
+    def max_impact(postings, norms):
+        """
+        Highest tf-idf of a term in a document, divided by the norm of the document's vector. Times the weight of the
+        term in a query, it bounds what the term adds to the cosine similarity of any document, before dividing by the
+        query's norm.
+        :param postings: postings of the term, with their tf-idf values
+        :param norms: norm of each document, by ID
+        :return: the max impact, 0 if the term has no weight in any document
+        """
+        return max((weight / norms[doc_id] for doc_id, weight in zip(postings.doc_ids, postings.weights) if weight), default=0.0)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return self.find(doc_id) >= 0
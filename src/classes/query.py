@@ -1,25 +1,44 @@
-from helpers import clean_terms, afinn, sqrt, PAGES, TOTAL_AFINN, SENTIMENT, COSINE_SIMILARITY, AFINN_SCORE, URL
-from classes.tf_idf import TFIDF
+from helpers import fast_clean_terms, sqrt, PAGES, URLS, TOTAL_AFINN, SENTIMENT, IDF, NORM, MAX_IMPACT, COSINE_SIMILARITY, AFINN_SCORE, URL
+from classes.sentiment_table import SentimentTable
+from classes.postings import Postings
+from classes.query_cache import QueryCache
+from classes.metrics import Metrics
 
 from tabulate import tabulate
 
+from collections import Counter
+from heapq import heappush, heapreplace
 from abc import abstractmethod
 
+import time
+
 
 class Query:
 
-    def __init__(self, index, stats, remove_stopwords=False):
+    # static variables
+    # whether a page has to contain all of the query's terms to be a result
+    conjunctive = False
+    # kind of the query, as shown in the results of a file of queries
+    mode = None
+
+    def __init__(self, index, stats, remove_stopwords=False, engine=None):
         """
         Query constructor.
         :param index: dictionary generated by the crawler
-        :param stats: dictionary of pages scraped, with total number of terms, and Afinn score, for each page
+        :param stats: dictionary of pages scraped, with total number of terms, and Afinn score, for each page, as well as
+        the URL of each document ID
         :param remove_stopwords: whether or not stopwords in queries will be ignored
+        :param engine: MatrixEngine compiled from the index to score the queries with, or None to score them from the
+        postings
         """
         self.index = index
         self.stats = stats
         self.remove_stopwords = remove_stopwords
+        self.engine = engine
+        self.top_k = 0
 
-        self.tf_idf = TFIDF(self.index, self.stats)
+        # rankings of the queries already conducted
+        self.cache = QueryCache()
 
         self.original_terms = ""
         self.terms = []
@@ -44,7 +63,7 @@ class Query:
         Split the query into individual terms.
         For each terms, store in a dictionary the documents in which the term appears (postings list).
         :param: the user's query
-        :return: list of postings lists found from the terms in the query
+        :return: list of postings lists found from the terms in the query, which iterate over document IDs
         """
         results = {}
 
@@ -56,63 +75,57 @@ class Query:
 
         return list(results.values())
 
-    def get_tf_idf_of_terms_in_query(self):
-        """
-        Get tf-idf values of terms in the user's query.
-        :return: list of tf-idf values
-        """
-        tf_idf_values = []
-
-        for term in self.terms:
-
-            term_frequency_in_query = self.terms.count(term)
-            term_idf = self.tf_idf.idf(term)
-
-            tf_idf_values.append(term_frequency_in_query * term_idf)
-
-        return tf_idf_values
-
-    def get_tf_idf_of_terms_in_index(self, url):
-        """
-        Get tf-idf values of terms in the index.
-        :return: list of tf-idf values
-        """
-        tf_idf_values = []
-
-        for term in self.terms:
-
-            term_frequency_in_index = self.tf_idf.tf(term, url)
-            term_idf = self.tf_idf.idf(term)
-
-            tf_idf_values.append(term_frequency_in_index * term_idf)
-
-        return tf_idf_values
-
     def get_cosine_similarities(self):
         """
         For each result obtained from the query, get the cosine similarity between the query and the page. The closer it
-        is to 0, the more the query and the document are a match.
-        :return: list of cosine similarities between user's query and documents
+        is to 1, the more the query and the document are a match.
+
+        The dot products are accumulated term-at-a-time: the postings of each distinct query term are read once, and
+        the tf-idf of each of its documents, times the term's weight in the query, is added to the document's
+        accumulator. The idf of the term is read from its entry in the index, and the norm of each document's vector,
+        over all of its terms, from the stats, so the cost is the total length of the query terms' postings.
+        The terms are gone through in sorted order, so that the scores don't depend on the order the terms were typed in,
+        and a cached ranking is exactly the ranking the query would get again.
+        :return: None
         """
-        tf_idf_to_query = self.get_tf_idf_of_terms_in_query()
+        accumulators = {}
+        query_norm = 0.0
+
+        for term, count in sorted(Counter(self.terms).items()):
+            try:
+                entry = self.index[term]
+            except KeyError:
+                continue
 
-        for url in self.results:
+            query_weight = count * entry[IDF]
+            query_norm += query_weight ** 2
 
-            tf_idf_to_index = self.get_tf_idf_of_terms_in_index(url)
+            self.accumulate(entry[PAGES], query_weight, accumulators)
 
-            dot_product = sum(i * j for i, j in zip(tf_idf_to_query, tf_idf_to_index))
+        query_norm = sqrt(query_norm)
 
-            vector_norm_query = sqrt(sum(i**2 for i in tf_idf_to_query))
-            vector_norm_index = sqrt(sum(i**2 for i in tf_idf_to_index))
+        for doc_id in self.results:
 
             try:
-                cosine_similarity = dot_product / (vector_norm_query * vector_norm_index)
+                cosine_similarity = accumulators.get(doc_id, 0.0) / (query_norm * self.stats[PAGES][doc_id][NORM])
             except ZeroDivisionError:
                 cosine_similarity = 0.0
 
-            self.results_with_cosine_similarity[url] = {}
-            self.results_with_cosine_similarity[url][COSINE_SIMILARITY] = cosine_similarity
-            self.results_with_cosine_similarity[url][SENTIMENT] = self.stats[PAGES][url][TOTAL_AFINN]
+            self.results_with_cosine_similarity[doc_id] = {}
+            self.results_with_cosine_similarity[doc_id][COSINE_SIMILARITY] = cosine_similarity
+            self.results_with_cosine_similarity[doc_id][SENTIMENT] = self.stats[PAGES][doc_id][TOTAL_AFINN]
+
+    def accumulate(self, postings, query_weight, accumulators):
+        """
+        Add the tf-idf of a term in each of its documents, times the term's weight in the query, to the documents'
+        accumulators.
+        :param postings: postings of the term
+        :param query_weight: tf-idf of the term in the query
+        :param accumulators: dot product of the query with each document so far
+        :return: None
+        """
+        for doc_id, weight in zip(postings.doc_ids, postings.weights):
+            accumulators[doc_id] = accumulators.get(doc_id, 0.0) + query_weight * weight
 
     def generate_results_table(self, rows):
         """
@@ -122,12 +135,50 @@ class Query:
         """
         print(tabulate(tabular_data=rows, headers=self.headers, tablefmt="fancy_grid", numalign="left", stralign="left"))
 
-    @abstractmethod
+    @Metrics.timed("Query.execute")
     def execute(self, terms):
+        """
+        Find and score the pages matching the query, then print them.
+        :param terms: the user's query.
+        :return: None
+        """
+        self.search(terms)
+        self.print_results()
+
+    def search(self, terms):
+        """
+        Find and score the pages matching the query, without printing them.
+        When measuring is enabled, the latency of the query goes into the histogram of its kind of query.
+        :param terms: the user's query.
+        :return: list of (page ID, cosine similarity), best first, ties broken by lowest ID
+        """
+        start = time.perf_counter()
+        self.original_terms = terms
+        self.terms = list(fast_clean_terms(terms, self.remove_stopwords))
+
+        key = self.cache_key(self.terms, self.top_k)
+        version = self.get_index_version()
+        ranking = self.cache.get(key, version)
+
+        if ranking is None:
+            if self.engine is not None:
+                ranking = self.engine.search([self.terms], self.conjunctive, self.top_k)[0]
+            else:
+                self.score()
+                ranking = self.get_ranking()
+            self.cache.put(key, version, ranking)
+        else:
+            Metrics.count("query_cache_hits")
+
+        self.set_ranking(ranking)
+        Metrics.observe("query_latency_seconds", time.perf_counter() - start, self.mode)
+        return ranking
+
+    @abstractmethod
+    def score(self):
         """
         Abstract method, to be implemented by subclasses.
         If run by parent class, will print out message pointing out error.
-        :param terms: the user's query.
         :return: None
         """
         if self.__class__.__name__ == Query.__class__.__name__:
@@ -135,6 +186,96 @@ class Query:
             print("Make sure to use either AndQuery or OrQuery.\n")
         return
 
+    def cache_key(self, terms, top_k):
+        """
+        :param terms: cleaned terms of the query
+        :param top_k: number of pages kept
+        :return: key of the query's ranking in the cache, see QueryCache.key
+        """
+        return QueryCache.key(terms, self.conjunctive, self.remove_stopwords, top_k)
+
+    def set_ranking(self, ranking):
+        """
+        Store a ranking of pages as the results of the query.
+        :param ranking: list of (page ID, cosine similarity)
+        :return: None
+        """
+        self.results = []
+        self.results_with_cosine_similarity = {}
+        for doc_id, cosine_similarity in ranking:
+            self.results.append(doc_id)
+            self.results_with_cosine_similarity[doc_id] = {}
+            self.results_with_cosine_similarity[doc_id][COSINE_SIMILARITY] = cosine_similarity
+            self.results_with_cosine_similarity[doc_id][SENTIMENT] = self.stats[PAGES][doc_id][TOTAL_AFINN]
+
+    def get_results(self, ranking):
+        """
+        :param ranking: list of (page ID, cosine similarity)
+        :return: list of the cosine similarity, Afinn score and URL of each page, as dictionaries, e.g. to be sent as JSON
+        """
+        return [
+            {COSINE_SIMILARITY: cosine_similarity, AFINN_SCORE: self.stats[PAGES][doc_id][TOTAL_AFINN], URL: self.stats[URLS][doc_id]}
+            for doc_id, cosine_similarity in ranking
+        ]
+
+    def get_index_version(self):
+        """
+        Version of the index, which the cached rankings are stamped with.
+        An index read from segments is identified by the names of its segments, since a segment never changes once it's
+        written. Any other index is identified by the object itself, along with the number of pages.
+        :return: the version
+        """
+        return getattr(self.index, "version", None) or (id(self.index), len(self.stats[URLS]))
+
+    def get_ranking(self):
+        """
+        :return: list of (page ID, cosine similarity) of the results, best first, ties broken by lowest ID
+        """
+        ranking = [(doc_id, result[COSINE_SIMILARITY]) for doc_id, result in self.results_with_cosine_similarity.items()]
+        ranking.sort(key=lambda result: (-result[1], result[0]))
+        return ranking
+
+    def rank(self, terms, k=0):
+        """
+        Rank the pages for cleaned terms from the postings, without the cache or the engine.
+        :param terms: cleaned terms of the query
+        :param k: number of pages to keep, 0 for all of them
+        :return: list of (page ID, cosine similarity), best first, ties broken by lowest ID
+        """
+        top_k = self.top_k
+        self.top_k = k
+        self.terms = terms
+        self.score()
+        self.top_k = top_k
+
+        return self.get_ranking()[:k or None]
+
+    def search_batch(self, queries, k=0):
+        """
+        Rank the pages for many queries without printing them, e.g. for offline evaluation.
+        With an engine, all of the queries are scored together, otherwise they're scored one at a time.
+        :param queries: list of queries, as typed by users
+        :param k: number of pages to keep per query, 0 for all of them
+        :return: for each query, list of (page ID, cosine similarity), best first, ties broken by lowest ID
+        """
+        batch = [list(fast_clean_terms(query, self.remove_stopwords)) for query in queries]
+        keys = [self.cache_key(terms, k) for terms in batch]
+        version = self.get_index_version()
+
+        rankings = [self.cache.get(key, version) for key in keys]
+        misses = [position for position, ranking in enumerate(rankings) if ranking is None]
+
+        if self.engine is not None:
+            scored = self.engine.search([batch[position] for position in misses], self.conjunctive, k)
+        else:
+            scored = [self.rank(batch[position], k) for position in misses]
+
+        for position, ranking in zip(misses, scored):
+            rankings[position] = ranking
+            self.cache.put(keys[position], version, ranking)
+
+        return rankings
+
     def print_results(self):
         """
         Print out terms in the query, and the postings found.
@@ -142,24 +283,27 @@ class Query:
         If the score is negative, print it in red.
         If the score is 0, don't print it in a specific colour.
 
-        Results are sorted by cosine similarity.
+        Results are sorted by cosine similarity, and the URLs of their document IDs are looked up in the stats.
         The top 10 results are resorted again by sentiment:
          - If the query was overall positive, sort the top 10 descending by sentiment score.
          - If the query was overall negative, sort the top 10 ascending by sentiment score.
          - If the query was neither positive nor negative, keep the results sorted solely by cosine similarity.
         :return: None
         """
-        score = afinn.score(self.original_terms)
+        score = SentimentTable.get().score(self.original_terms)
 
         print("{}: {}\nSentiment value: {}".format(self.__class__.__name__, self.original_terms, score))
 
         if self.results:
 
-            print("{} page(s) found:".format("{:,}".format(len(self.results))))
+            if self.top_k:
+                print("{} best page(s) found:".format("{:,}".format(len(self.results))))
+            else:
+                print("{} page(s) found:".format("{:,}".format(len(self.results))))
 
             rows = []
-            for url, cos_and_score in self.results_with_cosine_similarity.items():
-                row = [cos_and_score[COSINE_SIMILARITY], cos_and_score[SENTIMENT], url]
+            for doc_id, cos_and_score in self.results_with_cosine_similarity.items():
+                row = [cos_and_score[COSINE_SIMILARITY], cos_and_score[SENTIMENT], self.stats[URLS][doc_id]]
                 rows.append(row)
 
             # sort rows by cosine similarity, ascending
@@ -180,55 +324,269 @@ class Query:
 
 class AndQuery(Query):
 
-    def __init__(self, index, stats, remove_stopwords=False):
-        Query.__init__(self, index, stats, remove_stopwords)
+    # static variables
+    conjunctive = True
+    mode = "and"
+
+    def __init__(self, index, stats, remove_stopwords=False, engine=None):
+        Query.__init__(self, index, stats, remove_stopwords, engine)
 
         self.remove_stopwords = remove_stopwords
 
-    def execute(self, terms):
+    def score(self):
         """
         Get pages each term appears in, and conduct their intersection (AND).
-        :param terms: the user's query
+        The postings are sorted by document ID, so they're intersected from the rarest term's, by galloping through the
+        others, without building a set for any of them.
         :return: list of pages containing all of the terms in the query (AND).
         """
-        self.original_terms = terms
-        self.terms = clean_terms(terms, self.remove_stopwords)
         self.results_with_cosine_similarity = {}
 
-        lists_of_pages = self.get_pages()
-
-        try:
-            self.results = set(lists_of_pages[0]).intersection(*[set(urls) for urls in lists_of_pages[1:]])
+        self.results = Postings.intersect(self.get_pages())
+        if self.results:
             self.get_cosine_similarities()
-        except IndexError:
-            self.results = []
 
-        self.print_results()
+    def accumulate(self, postings, query_weight, accumulators):
+        """
+        Every result is in the postings of every term, so only the results' tf-idf values are looked up, by galloping
+        through the postings in order, instead of going through all of the postings.
+        :param postings: postings of the term
+        :param query_weight: tf-idf of the term in the query
+        :param accumulators: dot product of the query with each result so far
+        :return: None
+        """
+        position = 0
+        for doc_id in self.results:
+            position = postings.seek(doc_id, position)
+            accumulators[doc_id] = accumulators.get(doc_id, 0.0) + query_weight * postings.weight_at(position)
 
 
-class OrQuery(Query):
+class PhraseQuery(AndQuery):
+
+    # static variables
+    mode = "phrase"
+    no_positions = "The index doesn't have the positions of its terms. Index the pages with --positions for phrase queries."
 
     def __init__(self, index, stats, remove_stopwords=False):
-        Query.__init__(self, index, stats, remove_stopwords)
+        """
+        Phrase queries are always scored from the postings, since neither engine knows the positions of the terms.
+        Whether the index has the positions is checked once, here.
+        """
+        AndQuery.__init__(self, index, stats, remove_stopwords)
+        self.positional = PhraseQuery.is_positional(index)
+
+    @staticmethod
+    def is_positional(index):
+        """
+        :param index: the inverted index, either opened from its files, across segments, or built in memory
+        :return: whether the index keeps the positions of its terms, which phrase queries need
+        """
+        positional = getattr(index, "positional", None)
+        if positional is None:
+            entry = next(iter(index.values()), None)
+            positional = entry is not None and entry[PAGES].has_positions()
+        return positional
+
+    def cache_key(self, terms, top_k):
+        """
+        The order of the terms of a phrase matters, unlike for AND and OR queries.
+        """
+        return tuple(terms), self.mode, self.remove_stopwords, top_k
+
+    def score(self):
+        """
+        Get the pages where the terms of the query appear next to each other, in the same order.
+        The postings are intersected from the rarest term's, like for an AND query. Then the positions of the terms in
+        each page of the intersection are merged, from the rarest term's, to find where the phrase starts. Only the
+        positions of the pages of the intersection are decoded. The pages are then ranked by cosine similarity, like the
+        results of an AND query.
+        The index has to have the positions of its terms, otherwise no ranking is cached, since none would be right.
+        :return: list of pages containing the phrase
+        :raise ValueError: if the index doesn't have the positions of its terms
+        """
+        if not self.positional:
+            raise ValueError(PhraseQuery.no_positions)
+
+        self.results = []
+        self.results_with_cosine_similarity = {}
+
+        lists_of_postings = self.get_pages()
+        if not lists_of_postings or not all(lists_of_postings):
+            return
+
+        postings_by_term = dict(zip(dict.fromkeys(self.terms), lists_of_postings))
+        cursors = dict.fromkeys(postings_by_term, 0)
+
+        for doc_id in Postings.intersect(lists_of_postings):
+            positions = {}
+            for term, postings in postings_by_term.items():
+                cursors[term] = postings.seek(doc_id, cursors[term])
+                positions[term] = postings.get_positions(cursors[term])
+
+            if Postings.match_phrase([positions[term] for term in self.terms]):
+                self.results.append(doc_id)
+
+        if self.results:
+            self.get_cosine_similarities()
+
+
+class OrQuery(Query):
+
+    # static variables
+    mode = "or"
+    # bounds are made slightly larger, so that rounding never prunes a document which should be in the top k
+    bound_margin = 1e-9
+
+    def __init__(self, index, stats, remove_stopwords=False, top_k=0, engine=None):
+        """
+        :param top_k: if not 0, only the top_k pages with the highest cosine similarity are scored and shown
+        """
+        Query.__init__(self, index, stats, remove_stopwords, engine)
 
         self.remove_stopwords = remove_stopwords
+        self.top_k = top_k
 
-    def execute(self, terms):
+    def score(self):
         """
         Get pages each term appears in, and conduct their union (OR).
-        :param terms: the user's query
+        With top_k, the union isn't built: only the best pages are found, with MaxScore.
         :return: list of pages containing at least one of the terms in the query (OR).
         """
-        self.original_terms = terms
-        self.terms = clean_terms(terms, self.remove_stopwords)
         self.results_with_cosine_similarity = {}
 
+        if self.top_k:
+            self.get_top_k_cosine_similarities(self.top_k)
+            return
+
         lists_of_pages = self.get_pages()
 
         try:
-            self.results = set(lists_of_pages[0]).union(*[set(urls) for urls in lists_of_pages[1:]])
+            self.results = set(lists_of_pages[0]).union(*[set(doc_ids) for doc_ids in lists_of_pages[1:]])
             self.get_cosine_similarities()
         except IndexError:
             self.results = []
 
-        self.print_results()
+    def get_norms(self):
+        """
+        :return: norm of each page, by ID, from the stats
+        """
+        return {doc_id: page_info[NORM] for doc_id, page_info in self.stats[PAGES].items()}
+
+    def get_top_k_cosine_similarities(self, k):
+        """
+        Find the k pages with the highest cosine similarity with the query, and only those, with MaxScore.
+
+        Each query term has an upper bound on what it can add to a page's cosine similarity: its weight in the query,
+        times its max impact from the index, divided by the query's norm. The terms are sorted by bound. Once k pages
+        have been scored, the lowest of their scores is the threshold a page has to beat. The terms with the smallest
+        bounds, whose bounds add up to no more than the threshold, are non-essential: a page which only contains those
+        can't make it into the top k, so only the postings of the essential terms are walked through, in order of
+        document ID. The postings of the non-essential terms are only searched for the pages found that way, and not
+        even then when the score so far plus their bounds can't beat the threshold. Compressed postings bound the max
+        impact of each of their blocks too, so a page is also pruned when the block of a non-essential term it would be in
+        can't lift it above the threshold, before that block is even decoded.
+
+        The scores of the pages which are kept are added up in the same order as get_cosine_similarities does, so the
+        top k pages, ties broken by lowest ID, are exactly the first k of the exhaustive ranking.
+        :param k: number of pages to find
+        :return: None
+        """
+        terms = []
+        query_norm = 0.0
+        norms = None
+
+        for order, (term, count) in enumerate(sorted(Counter(self.terms).items())):
+            try:
+                entry = self.index[term]
+            except KeyError:
+                continue
+
+            query_weight = count * entry[IDF]
+            query_norm += query_weight ** 2
+
+            # indexes written before the max impacts were stored don't have them
+            max_impact = entry.get(MAX_IMPACT)
+            if max_impact is None:
+                norms = norms or self.get_norms()
+                max_impact = Postings.max_impact(entry[PAGES], norms)
+
+            terms.append([query_weight * max_impact, order, query_weight, entry[PAGES], 0])
+
+        query_norm = sqrt(query_norm)
+
+        # cumulative bounds of the terms, from the smallest, in units of cosine similarity
+        terms.sort(key=lambda term: term[0])
+        cumulative_bounds = []
+        for bound, _, _, _, _ in terms:
+            previous = cumulative_bounds[-1] if cumulative_bounds else 0.0
+            cumulative_bounds.append(previous + (bound / query_norm if query_norm else 0.0) * (1 + self.bound_margin) + self.bound_margin)
+
+        heap = []
+        threshold = -1.0
+        first_essential = 0
+
+        while True:
+            # next page in the postings of the essential terms
+            doc_id = None
+            for _, _, _, postings, position in terms[first_essential:]:
+                if position < len(postings.doc_ids) and (doc_id is None or postings.doc_ids[position] < doc_id):
+                    doc_id = postings.doc_ids[position]
+            if doc_id is None:
+                break
+
+            contributions = {}
+            for term in terms[first_essential:]:
+                _, order, query_weight, postings, position = term
+                if position < len(postings.doc_ids) and postings.doc_ids[position] == doc_id:
+                    contributions[order] = query_weight * postings.weights[position]
+                    term[4] += 1
+
+            scale = query_norm * self.stats[PAGES][doc_id][NORM]
+            partial = sum(contributions.values())
+
+            pruned = False
+            for position in reversed(range(first_essential)):
+                if (partial / scale if scale else 0.0) + cumulative_bounds[position] <= threshold:
+                    pruned = True
+                    break
+
+                term = terms[position]
+                _, order, query_weight, postings, start = term
+
+                # the block of compressed postings the page would be in has a tighter bound than the whole term
+                block_max_impact = postings.block_max_impact(doc_id)
+                if block_max_impact is not None:
+                    block_bound = (query_weight * block_max_impact / query_norm if query_norm else 0.0) * (1 + self.bound_margin) + self.bound_margin
+                    if (partial / scale if scale else 0.0) + (cumulative_bounds[position - 1] if position else 0.0) + block_bound <= threshold:
+                        pruned = True
+                        break
+
+                term[4] = postings.seek(doc_id, start)
+                if term[4] < len(postings) and postings.doc_id_at(term[4]) == doc_id:
+                    contributions[order] = query_weight * postings.weight_at(term[4])
+                    partial += contributions[order]
+
+            if pruned:
+                continue
+
+            dot_product = 0.0
+            for order in sorted(contributions):
+                dot_product += contributions[order]
+            try:
+                cosine_similarity = dot_product / scale
+            except ZeroDivisionError:
+                cosine_similarity = 0.0
+
+            # pages come in increasing order of ID, so a page tied with the lowest score never replaces it
+            if len(heap) < k:
+                heappush(heap, (cosine_similarity, -doc_id))
+            elif cosine_similarity > heap[0][0]:
+                heapreplace(heap, (cosine_similarity, -doc_id))
+
+            if len(heap) == k:
+                threshold = heap[0][0]
+                while first_essential < len(terms) and cumulative_bounds[first_essential] <= threshold:
+                    first_essential += 1
+
+        ranking = sorted(heap, key=lambda result: (-result[0], -result[1]))
+        self.set_ranking([(-doc_id, cosine_similarity) for cosine_similarity, doc_id in ranking])
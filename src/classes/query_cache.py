@@ -0,0 +1,119 @@
+from collections import Counter, OrderedDict
+
+import sys
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of the rankings of queries, so that a query which was already conducted isn't scored again.
+
+    Queries are keyed by their terms once cleaned, counted regardless of their order, along with the kind of query, the
+    stopwords setting and the number of pages kept, so "concordia university" and "University, Concordia" share an
+    entry. Each entry is stamped with the version of the index it was computed from, and is dropped when it's looked up
+    against another version, e.g. after the index is rebuilt from new segments.
+
+    The cache is bounded by its number of entries and by an estimate of their size in memory, since the ranking of an
+    OR query over common terms can hold most of the pages.
+    """
+
+    # static variables
+    max_entries = 1024
+    max_bytes = 16 * 1024 * 1024
+
+    # size of a (page ID, cosine similarity) tuple, with its integer and float
+    result_bytes = sys.getsizeof((0, 0.0)) + sys.getsizeof(2 ** 40) + sys.getsizeof(0.0)
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        """
+        :param max_entries: number of queries kept, 0 to disable the cache
+        :param max_bytes: estimated size in bytes of the rankings kept
+        """
+        self.max_entries = QueryCache.max_entries if max_entries is None else max_entries
+        self.max_bytes = QueryCache.max_bytes if max_bytes is None else max_bytes
+
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(terms, conjunctive, remove_stopwords, top_k):
+        """
+        :param terms: cleaned terms of the query
+        :param conjunctive: whether it's an AND query
+        :param remove_stopwords: whether stopwords were removed from the query
+        :param top_k: number of pages kept, 0 for all
+        :return: key of the query, the same for any order of its terms
+        """
+        return tuple(sorted(Counter(terms).items())), conjunctive, remove_stopwords, top_k
+
+    @staticmethod
+    def size(key, ranking):
+        """
+        :param key: key of a query
+        :param ranking: list of (page ID, cosine similarity)
+        :return: estimated size in bytes of the entry
+        """
+        return sys.getsizeof(key) + sys.getsizeof(key[0]) + sys.getsizeof(ranking) + len(ranking) * QueryCache.result_bytes
+
+    def get(self, key, version):
+        """
+        Look up the ranking of a query. An entry computed from another version of the index is dropped.
+        :param key: key of the query
+        :param version: version of the index
+        :return: the ranking, or None if it isn't cached
+        """
+        entry = self.entries.get(key)
+
+        if entry is not None and entry[0] != version:
+            self.remove(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, version, ranking):
+        """
+        Cache the ranking of a query, then evict the least recently used entries until the cache fits its bounds.
+        A ranking too large for the cache on its own isn't cached.
+        :param key: key of the query
+        :param version: version of the index the ranking was computed from
+        :param ranking: list of (page ID, cosine similarity)
+        :return: None
+        """
+        size = QueryCache.size(key, ranking)
+        if not self.max_entries or size > self.max_bytes:
+            return
+
+        self.remove(key)
+        self.entries[key] = (version, ranking, size)
+        self.num_bytes += size
+
+        while len(self.entries) > self.max_entries or self.num_bytes > self.max_bytes:
+            self.num_bytes -= self.entries.popitem(last=False)[1][2]
+
+    def remove(self, key):
+        """
+        :param key: key of a query
+        :return: None
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.num_bytes -= entry[2]
+
+    def clear(self):
+        """
+        Drop every entry, but keep the counters.
+        :return: None
+        """
+        self.entries.clear()
+        self.num_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
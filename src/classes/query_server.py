@@ -0,0 +1,282 @@
+from helpers import URLS
+from classes.metrics import Metrics
+
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import asyncio
+import json
+import multiprocessing
+import time
+
+
+# queries of the server, by mode, which the worker processes inherit from the process which loaded the index
+server_queries = {}
+
+
+def score_query(mode, text, k):
+    """
+    Score a query with the server's queries, and encode its results.
+    This is a module-level function so that it can be sent to a pool of worker processes.
+    :param mode: "and" or "or"
+    :param text: the query, as typed by a user
+    :param k: number of pages to return, 0 for all
+    :return: the results, as a JSON document encoded in UTF-8
+    """
+    # a shallow copy shares the index and the cache, but not the state of the query being scored, e.g. its top_k
+    query = copy(server_queries[mode])
+    query.top_k = k
+    ranking = query.search(text)[:k or None]
+
+    return json.dumps({
+        "query": text,
+        "mode": mode,
+        "pages": len(ranking),
+        "results": query.get_results(ranking)
+    }).encode("utf-8")
+
+
+class QueryServer:
+    """
+    HTTP server answering AND and OR queries against an index loaded once, with JSON results.
+
+    Endpoints:
+     - GET /and?q=<query>[&k=<k>]: pages containing all of the query's terms
+     - GET /or?q=<query>[&k=<k>]: pages containing at least one of the query's terms
+     - GET /health: whether the server is up, and how many pages it serves
+     - GET /metrics: when measuring is enabled, the latencies of the requests, in the Prometheus text format
+
+    Connections are handled on an asyncio event loop, so many clients can be connected at once, and connections are
+    kept alive between requests. Scoring a query is CPU-bound, so it's done in an executor, which keeps the event loop
+    free to accept connections and read requests in the meantime. Query objects aren't safe to use from several
+    threads, so the executor is either a single thread, or a pool of worker processes forked from the process which
+    loaded the index, sharing its memory-mapped segments, to score queries on several cores.
+
+    The latency of a request is measured from the event loop, so it includes the time the query waited for the
+    executor, and it's measured the same whether queries are scored in a thread or by worker processes.
+
+    Only the small part of HTTP/1.1 needed by the endpoints is implemented, so that no web framework is needed.
+    """
+
+    # static variables
+    reasons = {
+        200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+        500: "Internal Server Error"
+    }
+    max_header_lines = 100
+    # longest request line or header line read, in bytes, past which the request is rejected
+    max_line_length = 8192
+    # largest body read, in bytes, since none of the endpoints need one
+    max_body_size = 65536
+
+    def __init__(self, and_query, or_query, host="127.0.0.1", port=8080, workers=0, top_k=10):
+        """
+        :param and_query: AndQuery answering /and
+        :param or_query: OrQuery answering /or
+        :param host: address to listen on
+        :param port: port to listen on
+        :param workers: number of worker processes scoring queries, 0 to score them in a single thread
+        :param top_k: number of pages returned when a request doesn't give k, 0 for all
+        """
+        self.queries = {"and": and_query, "or": or_query}
+        self.stats = or_query.stats
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.top_k = top_k
+
+        self.executor = None
+        self.server = None
+        self.requests = 0
+
+    def create_executor(self):
+        """
+        Create the executor the queries are scored in.
+        :return: the executor
+        """
+        server_queries.update(self.queries)
+
+        if self.workers and "fork" in multiprocessing.get_all_start_methods():
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+
+        if self.workers:
+            print("Worker processes can't share the index on this platform, queries will be scored in a single thread.")
+            self.workers = 0
+        return ThreadPoolExecutor(1)
+
+    async def start(self):
+        """
+        Start listening for connections.
+        :return: None
+        """
+        self.executor = self.create_executor()
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=self.max_line_length)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve(self):
+        """
+        Serve queries until the task is cancelled.
+        :return: None
+        """
+        await self.start()
+        print("Serving queries at http://{}:{}/ with {}...".format(
+            self.host, self.port, "{} worker process(es)".format(self.workers) if self.workers else "a single scoring thread"
+        ))
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.executor.shutdown()
+
+    def serve_forever(self):
+        """
+        Run the server on a new event loop, until it's interrupted with Ctrl+C.
+        :return: None
+        """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("\nServed {:,} request(s).".format(self.requests))
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answer the requests of a connection, until the client closes it or asks for it to be closed.
+        A malformed request, a line longer than max_line_length, more than max_header_lines headers, or a body larger
+        than max_body_size, is answered with an error, and the connection is closed, since the rest of the stream can't
+        be trusted to start with the next request.
+        :param reader: stream of the connection's requests
+        :param writer: stream of the connection's responses
+        :return: None
+        """
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "request line longer than {} bytes".format(self.max_line_length)}, False)
+                    break
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send(writer, 400, {"error": "malformed request line"}, False)
+                    break
+
+                headers = {}
+                try:
+                    for _ in range(self.max_header_lines):
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    else:
+                        await self.send(writer, 400, {"error": "more than {} header lines".format(self.max_header_lines)}, False)
+                        break
+                except ValueError:
+                    await self.send(writer, 400, {"error": "header line longer than {} bytes".format(self.max_line_length)}, False)
+                    break
+
+                # requests to these endpoints have no use for a body, but it has to be read to get to the next request
+                length = headers.get("content-length", "0")
+                # isdigit is also True for digits int can't parse, e.g. superscripts
+                if not (length.isascii() and length.isdigit()):
+                    await self.send(writer, 400, {"error": "malformed Content-Length"}, False)
+                    break
+                length = int(length)
+                if length > self.max_body_size:
+                    await self.send(writer, 413, {"error": "body larger than {} bytes".format(self.max_body_size)}, False)
+                    break
+                if length:
+                    await reader.readexactly(length)
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                status, body = await self.respond(method, target)
+                self.requests += 1
+                await self.send(writer, status, body, keep_alive)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def respond(self, method, target):
+        """
+        Route a request to its endpoint.
+        :param method: HTTP method of the request
+        :param target: path and query string of the request
+        :return: the status code, and the body of the response, either encoded, as text, or as a dictionary to encode in
+        JSON
+        """
+        try:
+            url = urlsplit(target)
+            parameters = parse_qs(url.query)
+        except ValueError:
+            return 400, {"error": "malformed request target"}
+
+        if url.path == "/health":
+            return 200, {"status": "ok", "pages": len(self.stats[URLS])}
+
+        if url.path == "/metrics":
+            if not Metrics.enabled:
+                return 404, {"error": "measuring isn't enabled, start the server with --metrics"}
+            return 200, Metrics.to_prometheus()
+
+        mode = url.path.strip("/")
+        if mode not in self.queries:
+            return 404, {"error": "unknown endpoint {}, use /and or /or".format(url.path)}
+        if method != "GET":
+            return 405, {"error": "only GET requests are supported"}
+
+        text = parameters.get("q", [""])[0]
+        if not text.strip():
+            return 400, {"error": "missing query, pass it as the q parameter"}
+
+        try:
+            k = int(parameters.get("k", [self.top_k])[0])
+            if k < 0:
+                raise ValueError
+        except ValueError:
+            return 400, {"error": "k has to be a positive number, or 0 for all pages"}
+
+        try:
+            start = time.perf_counter()
+            body = await asyncio.get_running_loop().run_in_executor(self.executor, score_query, mode, text, k)
+            Metrics.observe("request_latency_seconds", time.perf_counter() - start, mode)
+            return 200, body
+        except Exception as error:
+            return 500, {"error": "{}: {}".format(error.__class__.__name__, error)}
+
+    async def send(self, writer, status, body, keep_alive):
+        """
+        Write a JSON response, or a plain text one, like the metrics.
+        :param writer: stream of the connection's responses
+        :param status: status code
+        :param body: body of the response, either encoded JSON, text, or a dictionary to encode in JSON
+        :param keep_alive: whether the connection stays open for other requests
+        :return: None
+        """
+        content_type = "application/json"
+        if isinstance(body, str):
+            content_type = "text/plain; version=0.0.4"
+            body = body.encode("utf-8")
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+
+        writer.write(
+            "HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n"
+            .format(status, self.reasons[status], content_type, len(body), "keep-alive" if keep_alive else "close")
+            .encode("latin-1") + body
+        )
+        await writer.drain()
@@ -0,0 +1,223 @@
+from functools import lru_cache
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.utils.job import job_dir
+from urllib.parse import urlsplit, urlunsplit
+from w3lib.url import canonicalize_url
+
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+
+
+class BloomFilter:
+    """
+    Set of fingerprints in a fixed array of bits, which can tell for sure that a fingerprint was never added, but only
+    that it probably was. Each fingerprint sets a few bits, picked by double hashing, so the array takes about 10 bits
+    per fingerprint for 1% of false positives, whatever the length of the URLs.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: number of fingerprints the filter is sized for
+        :param error_rate: rate of false positives once the filter holds its capacity
+        """
+        self.capacity = capacity
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def positions(self, fingerprint):
+        """
+        :param fingerprint: fingerprint of at least 16 bytes, e.g. a hash
+        :return: generator of the bits of the fingerprint
+        """
+        first = int.from_bytes(fingerprint[:8], "little")
+        second = int.from_bytes(fingerprint[8:16], "little") | 1
+        return ((first + hash_number * second) % self.num_bits for hash_number in range(self.num_hashes))
+
+    def add(self, fingerprint):
+        """
+        :param fingerprint: fingerprint to add
+        :return: None
+        """
+        for position in self.positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(fingerprint))
+
+
+class SeenUrls:
+    """
+    Set of the URLs already seen by the crawler, e.g. requested or scraped, in canonical form, so that the same page
+    isn't fetched or indexed twice, even across runs of a crawl.
+
+    Each URL is kept as a 16-byte hash in an exact store, a table of SQLite, which is a file when the set is persisted,
+    or held in memory otherwise. A Bloom filter in front of the store answers most lookups of new URLs without reading
+    the store, so checking a URL takes constant time, instead of going through a list of every URL seen. The filter is
+    rebuilt from the store when the set is opened, and rebuilt twice as large whenever it holds its capacity, so that
+    its rate of false positives stays low.
+    """
+
+    # static variables
+    # files of the sets kept in the job directory of a crawl
+    requests_file = "requests.sqlite"
+    pages_file = "pages.sqlite"
+
+    # ports which are left out of canonical URLs, since they're implied by their scheme
+    default_ports = {"http": 80, "https": 443}
+
+    def __init__(self, path=None, capacity=100000, error_rate=0.01):
+        """
+        Open the set, with the URLs already in it if it was persisted.
+        :param path: file the set is persisted to, None to hold it in memory
+        :param capacity: number of URLs the Bloom filter is sized for at first
+        :param error_rate: rate of false positives of the Bloom filter
+        """
+        self.path = path
+        self.error_rate = error_rate
+
+        self.connection = sqlite3.connect(path or ":memory:")
+        if path:
+            # commits only append to the write-ahead log, so each URL can be committed as soon as it's seen
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS urls (fingerprint BLOB PRIMARY KEY) WITHOUT ROWID")
+
+        self.count = self.connection.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        self.bloom_filter = None
+        self.build_filter(max(capacity, self.count * 2))
+
+        # lookups which had to read the store, and those which found that the URL wasn't in it after all
+        self.store_lookups = 0
+        self.false_positives = 0
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def canonicalize(url):
+        """
+        Canonical form of a URL, so that the different ways of writing the same URL are seen as one: the query
+        arguments are sorted, the fragment is dropped, the percent-encoding is normalized, the scheme and host are
+        lowercased, and the default port and the empty path are written out the same way.
+        Canonical forms are cached, since menus, headers and footers link to the same URLs on every page.
+        :param url: URL
+        :return: canonical URL
+        """
+        scheme, netloc, path, query, _ = urlsplit(canonicalize_url(url))
+        scheme, netloc = scheme.lower(), netloc.lower()
+
+        default_port = SeenUrls.default_ports.get(scheme)
+        if default_port and netloc.endswith(":{}".format(default_port)):
+            netloc = netloc[:-len(str(default_port)) - 1]
+
+        return urlunsplit((scheme, netloc, path or "/", query, ""))
+
+    @staticmethod
+    def fingerprint(url):
+        """
+        :param url: URL
+        :return: 16-byte hash of the canonical form of the URL
+        """
+        return hashlib.blake2b(SeenUrls.canonicalize(url).encode("utf-8"), digest_size=16).digest()
+
+    def build_filter(self, capacity):
+        """
+        Build the Bloom filter from the fingerprints in the store.
+        :param capacity: number of URLs the filter is sized for
+        :return: None
+        """
+        self.bloom_filter = BloomFilter(capacity, self.error_rate)
+        for fingerprint, in self.connection.execute("SELECT fingerprint FROM urls"):
+            self.bloom_filter.add(fingerprint)
+
+    def contains_fingerprint(self, fingerprint):
+        """
+        :param fingerprint: fingerprint of a URL
+        :return: True if the URL was seen
+        """
+        if fingerprint not in self.bloom_filter:
+            return False
+
+        self.store_lookups += 1
+        if self.connection.execute("SELECT 1 FROM urls WHERE fingerprint = ?", (fingerprint,)).fetchone():
+            return True
+        self.false_positives += 1
+        return False
+
+    def __contains__(self, url):
+        return self.contains_fingerprint(SeenUrls.fingerprint(url))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, url):
+        """
+        Add a URL to the set, unless it was already seen.
+        :param url: URL
+        :return: True if the URL wasn't seen before
+        """
+        fingerprint = SeenUrls.fingerprint(url)
+        if self.contains_fingerprint(fingerprint):
+            return False
+
+        with self.connection:
+            self.connection.execute("INSERT INTO urls VALUES (?)", (fingerprint,))
+        self.bloom_filter.add(fingerprint)
+        self.count += 1
+
+        if self.count >= self.bloom_filter.capacity:
+            self.build_filter(self.bloom_filter.capacity * 2)
+
+        return True
+
+    def close(self):
+        """
+        Close the store. URLs were committed as they were added, so nothing is lost.
+        :return: None
+        """
+        self.connection.close()
+
+
+class SeenUrlsDupeFilter(BaseDupeFilter):
+    """
+    Scrapy duplicate filter, which drops the requests of URLs already requested, using a SeenUrls set. With a job
+    directory (the JOBDIR setting), the set is kept in it, so that a resumed crawl doesn't request those URLs again.
+    More info: https://doc.scrapy.org/en/latest/topics/settings.html#dupefilter-class
+    """
+
+    def __init__(self, path=None, debug=False):
+        """
+        :param path: job directory of the crawl, None to only keep the requested URLs in memory
+        :param debug: whether or not every dropped request is logged, instead of only the first one
+        """
+        self.seen_urls = SeenUrls(os.path.join(path, SeenUrls.requests_file) if path else None)
+        self.debug = debug
+        self.logged = False
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(job_dir(settings), settings.getbool("DUPEFILTER_DEBUG"))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls.from_settings(crawler.settings)
+
+    def request_seen(self, request):
+        """
+        :param request: request about to be scheduled
+        :return: True if its URL was already requested. Requests other than plain GET requests are never dropped
+        """
+        if request.method != "GET" or request.body:
+            return False
+        return not self.seen_urls.add(request.url)
+
+    def close(self, reason):
+        self.seen_urls.close()
+
+    def log(self, request, spider):
+        if self.debug or not self.logged:
+            self.logger.debug("Filtered duplicate request: %s", request.url)
+            self.logged = True
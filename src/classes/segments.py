@@ -0,0 +1,695 @@
+from helpers import log10, sqrt, PAGES, URLS, TOTALS, CFT, DFT, IDF, SENTIMENT, NORM, MAX_IMPACT
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.disk_index import DiskIndex, DiskIndexWriter
+from classes.postings import Postings
+from classes.metrics import Metrics
+
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from heapq import merge
+from math import log
+
+import json
+import os
+import shutil
+import threading
+
+
+class SegmentSet:
+    """
+    The index is made of immutable segments. Each crawl writes its pages to a new segment, a directory with its own
+    url_stats.txt file and index files, instead of rebuilding the whole index. Queries read across all live segments.
+
+    The segments are listed, oldest first, in a manifest file, which is replaced atomically whenever a segment is added
+    or segments are merged. When a page was crawled again, its copy in the newest segment is the live one, and the
+    older copies are ignored. A segment can also list pages which were deleted since they were crawled, e.g. which answered
+    404 Not Found when crawled again: like a newer copy, this tombstone hides the copies of the page in older segments.
+    A segment may have tombstones only, when a crawl deleted pages without finding any new or changed one.
+
+    Segments are merged in a log-structured way: whenever there are merge_factor contiguous segments of the same size
+    tier, they're merged into one, which is written term by term from their sorted term dictionaries (like SPIMI's
+    merge of blocks). Merging drops the pages that aren't live anymore, and recomputes the idf of each term from its
+    merged document frequency and number of pages. The tombstones of the merged segments are kept, as long as an older
+    segment still has a copy of their page.
+
+    The segments replaced by a merge may still be read by an index loaded before it, e.g. while queries are conducted
+    during a merge in the background, and a memory-mapped file can't be deleted on Windows. So they're listed as
+    obsolete in the manifest, and only deleted once no index of the process reads them anymore, or else the next time
+    the segments are opened.
+
+    Unless there's a single segment without dead pages, the norms of the pages come from the global idf values, which
+    take a read of every term to compute. They're computed whenever a segment is added or segments are merged, and kept
+    in a file next to the manifest, along with the names of the segments they're for, so that loading the index doesn't
+    read it all again.
+    """
+
+    # static variables
+    segments_directory = "segments"
+    manifest_file = "manifest.json"
+    deleted_file = "deleted_urls.txt"
+    norms_file = "norms.bin"
+    merge_factor = 4
+
+    # number of open indexes reading each segment in this process, by path
+    readers = {}
+    readers_lock = threading.Lock()
+
+    def __init__(self, directory=None):
+        """
+        Read the manifest of the segments, if there is one.
+        :param directory: directory of the segments
+        """
+        self.directory = directory or SegmentSet.segments_directory
+        self.manifest_path = os.path.join(self.directory, SegmentSet.manifest_file)
+        self.lock = threading.Lock()
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            self.manifest = {"next_segment": 0, "segments": []}
+
+    @staticmethod
+    def exists(directory=None):
+        """
+        Check whether a set of segments has been written.
+        :param directory: directory of the segments
+        :return: True if there's a manifest with at least one segment
+        """
+        return bool(SegmentSet(directory).manifest["segments"])
+
+    def write_manifest(self):
+        """
+        Replace the manifest atomically, so that a crash never leaves a half-written list of segments.
+        :return: None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.manifest_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=4)
+        os.replace(temporary_path, self.manifest_path)
+
+    def get_path(self, name):
+        """
+        :param name: name of a segment
+        :return: directory of the segment
+        """
+        return os.path.join(self.directory, name)
+
+    def new_segment(self):
+        """
+        Reserve the name of a new segment, and create its directory.
+        :return: directory of the new segment, in which the stats and index files are written
+        """
+        with self.lock:
+            name = "segment_{:06d}".format(self.manifest["next_segment"])
+            self.manifest["next_segment"] += 1
+            self.write_manifest()
+
+        os.makedirs(self.get_path(name), exist_ok=True)
+        return self.get_path(name)
+
+    def add_segment(self, path, num_documents, deleted_urls=()):
+        """
+        Make a written segment live, by adding it to the manifest.
+        :param path: directory of the segment
+        :param num_documents: number of pages in the segment
+        :param deleted_urls: URLs of the pages deleted since they were crawled, whose older copies aren't live anymore
+        :return: None
+        """
+        entry = {"name": os.path.basename(path), "documents": num_documents}
+        if deleted_urls:
+            SegmentSet.write_deleted(path, deleted_urls)
+            entry["deleted"] = len(deleted_urls)
+
+        with self.lock:
+            self.manifest["segments"].append(entry)
+            self.write_manifest()
+
+        self.update_norms()
+
+    @staticmethod
+    def write_deleted(path, urls):
+        """
+        Write the tombstones of a segment, one URL per line.
+        :param path: directory of the segment
+        :param urls: URLs of the deleted pages
+        :return: None
+        """
+        with open(os.path.join(path, SegmentSet.deleted_file), "w", encoding="utf-8") as deleted_file:
+            for url in urls:
+                deleted_file.write("{}\n".format(url))
+
+    @staticmethod
+    def read_deleted(path):
+        """
+        :param path: directory of a segment
+        :return: URLs of the pages the segment deleted, empty if it has no tombstones
+        """
+        if not os.path.exists(os.path.join(path, SegmentSet.deleted_file)):
+            return []
+        with open(os.path.join(path, SegmentSet.deleted_file), encoding="utf-8") as deleted_file:
+            return [line.rstrip("\n") for line in deleted_file if line.strip()]
+
+    def discard_segment(self, path):
+        """
+        Delete the directory of a segment which was never added, e.g. when a crawl didn't scrape anything.
+        :param path: directory of the segment
+        :return: None
+        """
+        shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        """
+        Delete every segment, to rebuild the index from scratch.
+        :return: None
+        """
+        with self.lock:
+            for segment in self.manifest["segments"]:
+                shutil.rmtree(self.get_path(segment["name"]), ignore_errors=True)
+            self.manifest["segments"] = []
+            self.write_manifest()
+
+        self.delete_obsolete()
+
+    def acquire(self, names):
+        """
+        Count an open index reading segments, so that they aren't deleted while it reads them.
+        :param names: names of the segments
+        :return: None
+        """
+        with SegmentSet.readers_lock:
+            for name in names:
+                path = os.path.abspath(self.get_path(name))
+                SegmentSet.readers[path] = SegmentSet.readers.get(path, 0) + 1
+
+    def release(self, names):
+        """
+        Stop counting a closed index reading segments, and delete those which are obsolete and not read anymore.
+        :param names: names of the segments
+        :return: None
+        """
+        with SegmentSet.readers_lock:
+            for name in names:
+                path = os.path.abspath(self.get_path(name))
+                SegmentSet.readers[path] -= 1
+                if not SegmentSet.readers[path]:
+                    del SegmentSet.readers[path]
+
+        self.delete_obsolete()
+
+    def delete_obsolete(self):
+        """
+        Delete the segments which were replaced by a merge, unless an open index of this process still reads them.
+        A segment which can't be deleted yet, e.g. when another process has its files open on Windows, stays listed as
+        obsolete until it can.
+        :return: None
+        """
+        with self.lock:
+            obsolete = self.manifest.get("obsolete", [])
+            if not obsolete:
+                return
+
+            remaining = []
+            for name in obsolete:
+                path = self.get_path(name)
+                with SegmentSet.readers_lock:
+                    read = os.path.abspath(path) in SegmentSet.readers
+                if not read:
+                    shutil.rmtree(path, ignore_errors=True)
+                if os.path.exists(path):
+                    remaining.append(name)
+
+            if remaining != obsolete:
+                self.manifest["obsolete"] = remaining
+                self.write_manifest()
+
+    @Metrics.timed("SegmentSet.load")
+    def load(self):
+        """
+        Open every segment, and build the stats of the live pages, with the norms computed from the global idf values,
+        which are read from the norms file unless it's missing or for other segments.
+        :return: the inverted index across all segments, and the stats of the live pages
+        """
+        index, stats = self.open()
+
+        if SegmentSet.needs_norms(index):
+            norms = self.read_norms(index.version, len(stats[PAGES]))
+            if norms is None:
+                index.compute_norms()
+                self.write_norms(index)
+            else:
+                index.set_norms(dict(zip(sorted(stats[PAGES]), norms)))
+
+        return index, stats
+
+    def update_norms(self):
+        """
+        Compute the norms of the live pages from the global idf values, and write them to the norms file, if the
+        segments need them. This reads the whole index, which is done once segments are added or merged, instead of
+        every time the index is loaded.
+        :return: None
+        """
+        index, _ = self.open()
+        if SegmentSet.needs_norms(index):
+            index.compute_norms()
+            self.write_norms(index)
+        index.close()
+
+    @staticmethod
+    def needs_norms(index):
+        """
+        The norms of a segment's pages come from its own idf values, which are only the global ones when it's alone and
+        has no dead pages.
+        :param index: the index across all segments
+        :return: True if the norms of the pages have to be computed again from the global idf values
+        """
+        segments = index.segments
+        return len(segments) > 1 or bool(segments and segments[0][2]) or any(NORM not in page_info for page_info in index.stats[PAGES].values())
+
+    def write_norms(self, index):
+        """
+        Write the norms of the live pages, in the order of their IDs, after a line with the names of the segments they
+        were computed for. The file is replaced atomically, like the manifest.
+        :param index: the index across all segments, with its norms computed
+        :return: None
+        """
+        temporary_path = os.path.join(self.directory, SegmentSet.norms_file + ".tmp")
+        with open(temporary_path, "wb") as norms_file:
+            norms_file.write((json.dumps({"segments": list(index.version), "pages": len(index.norms)}) + "\n").encode("utf-8"))
+            array("d", [index.norms[doc_id] for doc_id in sorted(index.norms)]).tofile(norms_file)
+        os.replace(temporary_path, os.path.join(self.directory, SegmentSet.norms_file))
+
+    def read_norms(self, version, num_pages):
+        """
+        :param version: names of the segments the norms are needed for
+        :param num_pages: number of live pages
+        :return: norms of the live pages, in the order of their IDs, or None if the file is missing or for other segments
+        """
+        norms_path = os.path.join(self.directory, SegmentSet.norms_file)
+        if not os.path.exists(norms_path):
+            return None
+
+        with open(norms_path, "rb") as norms_file:
+            header = json.loads(norms_file.readline().decode("utf-8"))
+            if tuple(header["segments"]) != tuple(version) or header["pages"] != num_pages:
+                return None
+            norms = array("d")
+            norms.frombytes(norms_file.read())
+
+        return norms if len(norms) == num_pages else None
+
+    def open(self):
+        """
+        Open every segment, and build the stats of the live pages. The segments stay until the index is closed, even if
+        they're merged in the meantime.
+        Document IDs are global: the pages of each segment are numbered after those of the previous segments.
+        :return: the inverted index across all segments, without the global norms, and the stats of the live pages
+        """
+        self.delete_obsolete()
+
+        with self.lock:
+            entries = list(self.manifest["segments"])
+            names = [entry["name"] for entry in entries]
+            self.acquire(names)
+
+        segments = []
+        deleted = []
+        stats = {PAGES: {}, URLS: [], TOTALS: {}}
+
+        for entry in entries:
+            path = self.get_path(entry["name"])
+            deleted.append(SegmentSet.read_deleted(path) if entry.get("deleted") else [])
+
+            # a segment with tombstones only has no index
+            if not entry["documents"]:
+                segments.append([None, len(stats[URLS]), set()])
+                continue
+
+            segment_stats = DocumentParser.build_stats_from_file(path)
+            segments.append([IndexBuilder.build_index_from_file(path), len(stats[URLS]), set()])
+            for doc_id, page_info in segment_stats[PAGES].items():
+                stats[PAGES][len(stats[URLS]) + doc_id] = page_info
+            stats[URLS].extend(segment_stats[URLS])
+
+        # a page crawled again is only live in the newest segment it appears in, and a deleted page isn't live in the
+        # segments older than its tombstone
+        bounds = [base for _, base, _ in segments] + [len(stats[URLS])]
+        seen = set()
+        for position in reversed(range(len(segments))):
+            _, base, dead = segments[position]
+            for doc_id in range(base, bounds[position + 1]):
+                if stats[URLS][doc_id] in seen:
+                    dead.add(doc_id - base)
+                    del stats[PAGES][doc_id]
+                else:
+                    seen.add(stats[URLS][doc_id])
+            seen.update(deleted[position])
+
+        segments = [segment for segment in segments if segment[0] is not None]
+
+        if stats[PAGES]:
+            DocumentParser.tally(stats)
+
+        return SegmentedIndex(segments, stats, tuple(names), segment_set=self), stats
+
+    def find_merge(self):
+        """
+        Find segments to merge: the oldest run of merge_factor contiguous segments in the same size tier.
+        A segment's tier is the logarithm of its number of pages, in base merge_factor.
+        :return: names of the segments to merge, or None if no merge is needed
+        """
+        with self.lock:
+            segments = list(self.manifest["segments"])
+
+        tiers = [int(log(max(segment["documents"], 1), self.merge_factor)) for segment in segments]
+
+        start = 0
+        for end in range(1, len(segments) + 1):
+            if end == len(segments) or tiers[end] != tiers[start]:
+                if end - start >= self.merge_factor:
+                    return [segment["name"] for segment in segments[start:start + self.merge_factor]]
+                start = end
+
+        return None
+
+    def merge_tiers(self):
+        """
+        Keep merging segments until no tier has merge_factor contiguous segments.
+        :return: None
+        """
+        names = self.find_merge()
+        while names:
+            self.merge(names)
+            names = self.find_merge()
+
+    def merge_all(self):
+        """
+        Merge every segment into one, which also makes the idf of every term exact.
+        :return: None
+        """
+        with self.lock:
+            names = [segment["name"] for segment in self.manifest["segments"]]
+        if len(names) > 1:
+            self.merge(names)
+
+    def merge_in_background(self):
+        """
+        Merge segments in a separate thread, so that queries can be conducted in the meantime. The queries keep using
+        the segments they were loaded with, which are only deleted once their index is closed.
+        :return: the thread doing the merge
+        """
+        thread = threading.Thread(target=self.merge_tiers, name="segment-merge")
+        thread.start()
+        return thread
+
+    @Metrics.timed("SegmentSet.merge")
+    def merge(self, names):
+        """
+        Merge contiguous segments into a new one, and replace them with it in the manifest.
+         - the live pages of the segments are numbered again, in the same order, without gaps.
+         - the term dictionaries of the segments are read in parallel, in sorted order. For each term, the postings of
+           the live pages are concatenated, with their positions if every segment has them, and its document frequency,
+           idf, and tf-idf are computed again.
+         - the norm of each page is computed again from its new tf-idf values, so the stats are written last, and the
+           max impact of each term is stored once the norms are known.
+         - the tombstones of the segments are kept for the pages which still have a copy in an older segment.
+         - the merged segments are deleted once no open index reads them anymore.
+        :param names: names of contiguous segments, oldest first
+        :return: None
+        """
+        with self.lock:
+            all_entries = list(self.manifest["segments"])
+        all_names = [entry["name"] for entry in all_entries]
+        first = all_names.index(names[0])
+        entries = all_entries[first:first + len(names)]
+
+        # pages crawled again, or deleted, in a newer segment aren't live anymore
+        seen = set()
+        for entry in all_entries[first + len(names):]:
+            seen.update(self.read_segment_urls(entry))
+            seen.update(SegmentSet.read_deleted(self.get_path(entry["name"])))
+
+        segments_stats = [
+            DocumentParser.build_stats_from_file(self.get_path(entry["name"])) if entry["documents"] else {PAGES: {}, URLS: []}
+            for entry in entries
+        ]
+        segments_deleted = [SegmentSet.read_deleted(self.get_path(name)) for name in names]
+        new_ids = [{} for _ in names]
+        for position in reversed(range(len(names))):
+            for doc_id, url in enumerate(segments_stats[position][URLS]):
+                if url not in seen:
+                    seen.add(url)
+                    new_ids[position][doc_id] = None
+            seen.update(segments_deleted[position])
+
+        # tombstones are only needed while an older segment has a copy of their page
+        older_urls = set()
+        if any(segments_deleted):
+            for entry in all_entries[:first]:
+                older_urls.update(self.read_segment_urls(entry))
+        deleted_urls = sorted({url for urls in segments_deleted for url in urls} & older_urls)
+
+        stats = {PAGES: {}, URLS: [], TOTALS: {}}
+        for position, segment_stats in enumerate(segments_stats):
+            for doc_id in sorted(new_ids[position]):
+                new_ids[position][doc_id] = len(stats[URLS])
+                stats[PAGES][len(stats[URLS])] = segment_stats[PAGES][doc_id]
+                stats[URLS].append(segment_stats[URLS][doc_id])
+
+        merged_path = self.new_segment()
+        num_documents = len(stats[URLS])
+
+        if num_documents:
+            squares = [0.0] * num_documents
+
+            indexes = [
+                IndexBuilder.build_index_from_file(self.get_path(entry["name"])) if entry["documents"] else None
+                for entry in entries
+            ]
+            merged_prefix = os.path.join(merged_path, IndexBuilder.index_file)
+            # positions are only kept if every merged segment has them
+            positional = all(index.positional for index in indexes if index is not None)
+            writer = DiskIndexWriter(merged_prefix, positional=positional)
+
+            terms = merge(*[
+                SegmentSet.scan_segment(index, position) for position, index in enumerate(indexes) if index is not None
+            ])
+
+            current_key, postings, sentiment = None, Postings(), 0.0
+            for key, position, record in terms:
+                if key != current_key:
+                    SegmentSet.write_term(writer, current_key, postings, sentiment, num_documents, squares)
+                    current_key, postings = key, Postings()
+
+                entry = indexes[position].decode(record)
+                sentiment = entry[SENTIMENT]
+                for offset, (doc_id, tf) in enumerate(zip(entry[PAGES].doc_ids, entry[PAGES].tfs)):
+                    if doc_id in new_ids[position]:
+                        postings.add(new_ids[position][doc_id], tf, entry[PAGES].get_positions(offset) if positional else None)
+
+            SegmentSet.write_term(writer, current_key, postings, sentiment, num_documents, squares)
+            writer.close()
+
+            for index in indexes:
+                if index is not None:
+                    index.close()
+
+            norms = [sqrt(square) for square in squares]
+            DiskIndex.write_max_impacts(merged_prefix, norms)
+
+            for doc_id, norm in enumerate(norms):
+                stats[PAGES][doc_id] = dict(stats[PAGES][doc_id], **{NORM: norm})
+
+            DocumentParser.tally(stats)
+            DocumentParser.write_stats(stats, os.path.join(merged_path, DocumentParser.stats_file))
+
+        merged = []
+        if num_documents or deleted_urls:
+            merged.append({"name": os.path.basename(merged_path), "documents": num_documents})
+        if deleted_urls:
+            SegmentSet.write_deleted(merged_path, deleted_urls)
+            merged[0]["deleted"] = len(deleted_urls)
+
+        with self.lock:
+            segments = self.manifest["segments"]
+            position = [segment["name"] for segment in segments].index(names[0])
+            segments[position:position + len(names)] = merged
+            self.manifest["obsolete"] = self.manifest.get("obsolete", []) + list(names)
+            self.write_manifest()
+
+        if not merged:
+            self.discard_segment(merged_path)
+
+        self.update_norms()
+
+    def read_segment_urls(self, entry):
+        """
+        :param entry: entry of a segment in the manifest
+        :return: URLs of the pages of the segment, empty if it has tombstones only
+        """
+        if not entry["documents"]:
+            return []
+        return DocumentParser.build_stats_from_file(self.get_path(entry["name"]))[URLS]
+
+    @staticmethod
+    def scan_segment(index, position):
+        """
+        Go through the term dictionary of a segment, tagging each term with the position of the segment, so that the
+        postings of a term are merged in the order of the segments.
+        :param index: index of the segment
+        :param position: position of the segment among the merged ones
+        :return: generator of (term as bytes, position, record)
+        """
+        for key, record in index.scan():
+            yield key, position, record
+
+    @staticmethod
+    def write_term(writer, key, postings, sentiment, num_documents, squares):
+        """
+        Write a merged term, unless none of its pages are live anymore.
+        :param writer: writer of the merged index
+        :param key: the term, encoded in UTF-8
+        :param postings: postings of the live pages which contain the term
+        :param sentiment: Afinn score of the term
+        :param num_documents: number of pages in the merged segment
+        :param squares: sum of the squared tf-idf values of each page so far, to which the term's are added
+        :return: None
+        """
+        if key is None or not postings:
+            return
+
+        idf = log10(num_documents / len(postings))
+        postings.set_weights(idf)
+        for doc_id, weight in zip(postings.doc_ids, postings.weights):
+            squares[doc_id] += weight * weight
+        writer.add(key, {CFT: sum(postings.tfs), DFT: len(postings), IDF: idf, SENTIMENT: sentiment, PAGES: postings})
+
+
+class SegmentedIndex(Mapping):
+    """
+    Read-only view of the index across all segments, with the same lookup interface as the index built by
+    IndexBuilder and DiskIndex.
+    The postings of a term are gathered from every segment, with global document IDs, leaving out the pages which
+    aren't live anymore. Its document frequency, idf, and tf-idf values are computed from all live pages, so they're the
+    same as if the index had been built in one go. The positions of the terms are gathered too, if every segment has
+    them.
+    """
+
+    def __init__(self, segments, stats, version=None, cache_size=256, segment_set=None):
+        """
+        :param segments: list of [index, global ID of its first page, set of local IDs of its dead pages]
+        :param stats: stats of the live pages
+        :param version: names of the segments, which identify the index, since segments never change once written
+        :param cache_size: number of merged terms kept around
+        :param segment_set: set of segments the index was opened from, which is told when it's closed, None if there is
+        none
+        """
+        self.segments = segments
+        self.segment_set = segment_set
+        self.stats = stats
+        self.version = version
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.num_terms = None
+        self.norms = None
+        self.positional = bool(segments) and all(index.positional for index, _, _ in segments)
+
+    def __getitem__(self, term):
+        if term in self.cache:
+            self.cache.move_to_end(term)
+            return self.cache[term]
+
+        entries = []
+        for index, base, dead in self.segments:
+            try:
+                entries.append((index[term], base, dead))
+            except KeyError:
+                pass
+
+        if not entries:
+            raise KeyError(term)
+
+        # with a single segment and no dead pages, the segment's own statistics are already the global ones
+        if len(self.segments) == 1 and not entries[0][2]:
+            return entries[0][0]
+
+        postings = Postings()
+        for entry, base, dead in entries:
+            for position, (doc_id, tf) in enumerate(zip(entry[PAGES].doc_ids, entry[PAGES].tfs)):
+                if doc_id not in dead:
+                    postings.add(base + doc_id, tf, entry[PAGES].get_positions(position) if self.positional else None)
+
+        if not postings:
+            raise KeyError(term)
+
+        idf = log10(len(self.stats[PAGES]) / len(postings))
+        postings.set_weights(idf)
+        max_impact = Postings.max_impact(postings, self.norms) if self.norms is not None else None
+        merged = {CFT: sum(postings.tfs), DFT: len(postings), IDF: idf, SENTIMENT: entries[0][0][SENTIMENT], MAX_IMPACT: max_impact, PAGES: postings}
+
+        self.cache[term] = merged
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return merged
+
+    def __contains__(self, term):
+        try:
+            self[term]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        previous = None
+        for term in merge(*[index for index, _, _ in self.segments]):
+            if term != previous and term in self:
+                yield term
+            previous = term
+
+    def __len__(self):
+        if self.num_terms is None:
+            self.num_terms = sum(1 for _ in self)
+        return self.num_terms
+
+    def compute_norms(self):
+        """
+        Compute the norm of each live page's tf-idf vector from the global idf values, and store it in the page's
+        stats. Every term is read once, so this costs as much as reading the whole index.
+        :return: None
+        """
+        squares = dict.fromkeys(self.stats[PAGES], 0.0)
+
+        for term in self:
+            postings = self[term][PAGES]
+            for doc_id, weight in zip(postings.doc_ids, postings.weights):
+                squares[doc_id] += weight * weight
+
+        self.set_norms({doc_id: sqrt(square) for doc_id, square in squares.items()})
+
+    def set_norms(self, norms):
+        """
+        Store the norms of the live pages, computed from the global idf values, in their stats.
+        The max impacts of the terms depend on the norms, so they're only computed for the terms read afterwards.
+        :param norms: norm of each live page, by ID
+        :return: None
+        """
+        self.norms = norms
+        for doc_id, norm in norms.items():
+            self.stats[PAGES][doc_id][NORM] = norm
+
+        self.cache.clear()
+
+    def close(self):
+        """
+        Close the index of every segment, so that those which were merged since it was opened can be deleted.
+        :return: None
+        """
+        for index, _, _ in self.segments:
+            index.close()
+
+        if self.segment_set is not None:
+            self.segment_set.release(self.version)
+            self.segment_set = None
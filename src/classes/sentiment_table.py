@@ -0,0 +1,250 @@
+from collections import Counter, OrderedDict
+
+import afinn
+import os
+import re
+
+
+class SentimentTable:
+    """
+    Score text exactly like Afinn's score method, from a lookup table of the Afinn word list, without compiling Afinn's
+    regular expression.
+
+    Afinn lowercases the text, then finds every entry of its word list (longest first, between word boundaries) with a
+    single regular expression of thousands of alternatives. Here, the same matches are found by looking up the slices
+    of the text that start at a word boundary in the table, from the longest entry length to the shortest.
+
+    The Afinn score of a document is the score of its terms joined by spaces. Most matches are within a single term, so
+    the score of each distinct term is computed once, and a document is scored from the counts of its terms. Only
+    multi-word entries (e.g. "not good") can match across terms: the document's sequence of terms is only looked at
+    where a term could end a word of such an entry and the next one could start the following word, and those runs of
+    terms are scored together, with a bounded cache since the same phrases come up over and over.
+
+    The word list is written next to the index the first time, and read from there afterwards.
+    """
+
+    # static variables
+    table_file = "sentiment_table.txt"
+    language = "en"
+    phrase_cache_size = 4096
+
+    whitespace = re.compile(r"\s+")
+
+    # shared by the stats, the index and the queries of the running script
+    shared = None
+
+    def __init__(self, lexicon):
+        """
+        Build the lookup table from a word list.
+        :param lexicon: dictionary of Afinn's words and phrases, and their sentiment scores
+        """
+        self.lexicon = lexicon
+        self.lengths = sorted({len(entry) for entry in lexicon}, reverse=True)
+
+        if all(SentimentTable.is_word(entry[0]) for entry in lexicon):
+            self.starts = re.compile(r"\b(?=\w)")
+        else:
+            self.starts = re.compile(r"\b")
+
+        # words of the multi-word entries which are followed, or preceded, by another word
+        phrases = [entry.split(" ") for entry in lexicon if " " in entry]
+        self.phrase_heads = {words[i] for words in phrases for i in range(len(words) - 1)}
+        self.phrase_tails = {words[i] for words in phrases for i in range(1, len(words))}
+
+        self.terms = {}
+        self.phrases = OrderedDict()
+
+    @staticmethod
+    def is_word(character):
+        """
+        :param character: a character
+        :return: whether the character is matched by \\w, in a Unicode regular expression
+        """
+        return character.isalnum() or character == "_"
+
+    @staticmethod
+    def from_afinn(language=None):
+        """
+        Read the word list distributed with Afinn, without setting up Afinn itself.
+        :param language: language of the word list
+        :return: the lookup table
+        """
+        filename = afinn.afinn.LANGUAGE_TO_FILENAME[language or SentimentTable.language]
+        path = os.path.join(os.path.dirname(afinn.__file__), "data", filename)
+        return SentimentTable(afinn.Afinn.read_word_file(path))
+
+    @staticmethod
+    def open(directory=""):
+        """
+        Read the table written next to the index, or write it there from Afinn's word list if it isn't there yet.
+        The table becomes the one shared by the stats, the index and the queries.
+        :param directory: directory of the table file, e.g. the directory of the index segments
+        :return: the lookup table
+        """
+        path = os.path.join(directory, SentimentTable.table_file)
+
+        if os.path.exists(path):
+            table = SentimentTable(afinn.Afinn.read_word_file(path))
+        else:
+            table = SentimentTable.from_afinn()
+            table.write(path)
+
+        SentimentTable.shared = table
+        return table
+
+    @staticmethod
+    def get():
+        """
+        Get the shared table. If no table was opened, e.g. when indexing outside of main.py, it's read from Afinn's
+        word list, and isn't written anywhere.
+        :return: the lookup table
+        """
+        if SentimentTable.shared is None:
+            SentimentTable.shared = SentimentTable.from_afinn()
+        return SentimentTable.shared
+
+    def write(self, file_path):
+        """
+        Write the word list in Afinn's format, one tab-separated entry and score per line.
+        :param file_path: path of the table file
+        :return: None
+        """
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary_path = file_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as table_file:
+            for entry, score in self.lexicon.items():
+                table_file.write("{}\t{}\n".format(entry, score))
+        os.replace(temporary_path, file_path)
+
+    def is_boundary(self, text, position):
+        """
+        :param text: a string
+        :param position: position between two characters of the string
+        :return: whether \\b matches at the position
+        """
+        before = position > 0 and SentimentTable.is_word(text[position - 1])
+        after = position < len(text) and SentimentTable.is_word(text[position])
+        return before != after
+
+    def score(self, text):
+        """
+        Same result as Afinn's score method.
+        :param text: string of text, e.g. a query
+        :return: Afinn sentiment score of the text
+        """
+        text = self.whitespace.sub(" ", text).lower()
+        end = len(text)
+
+        score = 0
+        position = 0
+        for start in self.starts.finditer(text):
+            start = start.start()
+            # matches don't overlap, so skip the boundaries inside the last match
+            if start < position:
+                continue
+            for length in self.lengths:
+                if start + length > end:
+                    continue
+                entry = text[start:start + length]
+                if entry in self.lexicon and self.is_boundary(text, start + length):
+                    score += self.lexicon[entry]
+                    position = start + length
+                    break
+
+        return float(score)
+
+    def term_score(self, term):
+        """
+        Score of a single term, computed once per distinct term.
+        :param term: a word
+        :return: Afinn sentiment score of the term
+        """
+        return self.get_term(term)[0]
+
+    def get_term(self, term):
+        """
+        Look up a term in the table, adding it the first time it's seen.
+        A term which contains whitespace, or no character at all, is treated as linked to its neighbours, since joining
+        it with them doesn't give single spaces between words.
+        :param term: a word
+        :return: the term's score, whether it could end the word of a phrase, and whether it could start one
+        """
+        try:
+            return self.terms[term]
+        except KeyError:
+            pass
+
+        lowered = term.lower()
+        if not lowered or self.whitespace.search(lowered):
+            entry = (self.score(term), True, True)
+        else:
+            entry = (
+                self.score(term),
+                any(lowered.endswith(word) for word in self.phrase_heads),
+                any(lowered.startswith(word) for word in self.phrase_tails)
+            )
+
+        self.terms[term] = entry
+        return entry
+
+    def phrase_score(self, text):
+        """
+        Score of a run of terms which could be matched by a multi-word entry, from a bounded LRU cache.
+        :param text: the terms of the run, joined by spaces
+        :return: Afinn sentiment score of the run
+        """
+        if text in self.phrases:
+            self.phrases.move_to_end(text)
+            return self.phrases[text]
+
+        score = self.score(text)
+        self.phrases[text] = score
+        if len(self.phrases) > self.phrase_cache_size:
+            self.phrases.popitem(last=False)
+        return score
+
+    def score_terms(self, terms, term_counts=None):
+        """
+        Same result as Afinn's score method on the terms joined by spaces.
+        The score of each distinct term is multiplied by its count, then runs of terms linked by a possible phrase are
+        scored together, and replace the scores of their terms.
+        :param terms: list of terms of a document, in order
+        :param term_counts: Counter of the terms, if it was already computed
+        :return: Afinn sentiment score of the document
+        """
+        if term_counts is None:
+            term_counts = Counter(terms)
+
+        score = 0.0
+        links = False
+        for term, count in term_counts.items():
+            term_score, ends_phrase_word, _ = self.get_term(term)
+            score += term_score * count
+            links = links or ends_phrase_word
+
+        if not links:
+            return score
+
+        run = [terms[0]] if terms else []
+        for term in terms[1:]:
+            if self.terms[run[-1]][1] and self.terms[term][2]:
+                run.append(term)
+                continue
+            score += self.run_correction(run)
+            run = [term]
+        score += self.run_correction(run)
+
+        return score
+
+    def run_correction(self, run):
+        """
+        Difference between the score of a run of terms scored together and the sum of the scores of its terms.
+        :param run: list of terms linked by a possible phrase
+        :return: the difference, 0 for a single term
+        """
+        if len(run) < 2:
+            return 0.0
+        return self.phrase_score(" ".join(run)) - sum(self.terms[term][0] for term in run)
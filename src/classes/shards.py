@@ -0,0 +1,269 @@
+from helpers import PAGES, URLS, TOTALS, CFT, DFT, IDF, SENTIMENT, NORM, MAX_IMPACT
+from classes.disk_index import DiskIndex
+from classes.postings import Postings
+from classes.query import AndQuery, OrQuery
+
+from bisect import bisect_left
+from heapq import merge
+from itertools import islice
+
+import json
+import multiprocessing
+import os
+import shutil
+
+
+def write_shard(index, norms, low, high, prefix):
+    """
+    Extract a shard of an index, and write it to its files.
+    This is a module-level function so that it can be run in a process of its own.
+    :param index: the inverted index
+    :param norms: norm of each document, by ID
+    :param low: lowest document ID of the shard
+    :param high: document ID after the highest one of the shard
+    :param prefix: path of the shard's index files, without their extension
+    :return: None
+    """
+    DiskIndex.write(ShardSet.partition(index, norms, low, high), prefix, norms)
+
+
+def serve_shard(prefix, pages, connection):
+    """
+    Rank the pages of a shard for the batches of queries sent by a ShardPool, until None is sent. True is sent once the
+    shard is open.
+    This runs in a process of its own, which only opens its shard, and only holds the stats of the shard's pages.
+    :param prefix: path of the shard's index files, without their extension
+    :param pages: stats of the shard's pages, by ID
+    :param connection: end of the pipe the batches are received from, and the rankings are sent through
+    :return: None
+    """
+    index = DiskIndex(prefix)
+    stats = {PAGES: pages, URLS: [], TOTALS: {}}
+    queries = {True: AndQuery(index, stats), False: OrQuery(index, stats)}
+    connection.send(True)
+
+    for batch, conjunctive, k in iter(connection.recv, None):
+        try:
+            connection.send([queries[conjunctive].rank(terms, k) for terms in batch])
+        except Exception as error:
+            connection.send(error)
+
+    index.close()
+
+
+class ShardSet:
+    """
+    The index partitioned by document into shards, so that queries can be scored by a process per shard, on as many
+    cores, with each process only holding its shard.
+
+    Each shard holds the pages of a contiguous range of document IDs, with about as many pages in each shard. A shard
+    is written like a whole index, with the postings of its pages only, but with the global idf of every term: the
+    idf, and the tf-idf values computed from it, are those of the whole index. Every term is in every shard, even
+    without postings there, since the idf of every term of a query is needed for the query's norm. So each shard
+    scores its pages exactly like the whole index would, and the best pages of the index are the best of the best pages
+    of each shard.
+
+    The shards are written to their own directory, with a manifest of their ranges of document IDs, and the version of
+    the index they were partitioned from, so that they're only partitioned again when the index changes.
+    """
+
+    # static variables
+    shards_directory = "shards"
+    manifest_file = "manifest.json"
+
+    def __init__(self, directory):
+        """
+        Read the manifest of the shards, if there is one.
+        :param directory: directory of the shards
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, ShardSet.manifest_file)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as manifest_file:
+                self.manifest = json.load(manifest_file)
+        else:
+            self.manifest = {"version": None, "bounds": []}
+
+    def get_prefix(self, shard):
+        """
+        :param shard: number of the shard
+        :return: path of the shard's index files, without their extension
+        """
+        return os.path.join(self.directory, "shard_{:02d}".format(shard))
+
+    def get_num_shards(self):
+        """
+        :return: number of shards written
+        """
+        return max(len(self.manifest["bounds"]) - 1, 0)
+
+    def is_current(self, num_shards, version):
+        """
+        Check whether the shards were partitioned from a version of the index.
+        An index without a version, e.g. one held in memory, is always partitioned again.
+        :param num_shards: number of shards wanted
+        :param version: version of the index
+        :return: True if the written shards can be used
+        """
+        return version is not None and self.manifest["version"] == list(version) and self.get_num_shards() == num_shards
+
+    @staticmethod
+    def get_bounds(doc_ids, num_shards):
+        """
+        Split document IDs into contiguous ranges of about as many documents.
+        :param doc_ids: sorted IDs of the documents
+        :param num_shards: number of ranges
+        :return: list of num_shards + 1 bounds, the range of shard i going from bounds[i] to bounds[i + 1] (excluded)
+        """
+        if not doc_ids:
+            return [0] * (num_shards + 1)
+        return [doc_ids[len(doc_ids) * shard // num_shards] for shard in range(num_shards)] + [doc_ids[-1] + 1]
+
+    @staticmethod
+    def partition(index, norms, low, high):
+        """
+        Extract a shard of an index: the postings of the documents whose IDs are from low to high (excluded), with the
+        global idf of every term. The frequencies and the max impact of each term are the ones in the shard, since the
+        document frequency is the length of the postings in the shard's files, and the max impact is a tighter bound.
+        :param index: the inverted index
+        :param norms: norm of each document, by ID
+        :param low: lowest document ID of the shard
+        :param high: document ID after the highest one of the shard
+        :return: the shard, with the same structure as the index
+        """
+        shard = {}
+
+        for term in index:
+            entry = index[term]
+            postings = entry[PAGES]
+
+            # postings are sorted by document ID, so the shard's documents are a slice of them
+            start = bisect_left(postings.doc_ids, low)
+            end = bisect_left(postings.doc_ids, high, start)
+            postings = postings.slice(start, end)
+
+            shard[term] = {
+                CFT: sum(postings.tfs), DFT: len(postings), IDF: entry[IDF], SENTIMENT: entry[SENTIMENT],
+                MAX_IMPACT: Postings.max_impact(postings, norms), PAGES: postings
+            }
+
+        return shard
+
+    def write(self, index, stats, num_shards, version=None):
+        """
+        Partition an index into shards, and write them, replacing the shards written before.
+        Where processes can be forked, each shard is extracted and written by a process of its own, which shares the
+        index with this one.
+        :param index: the inverted index, with the norms of its pages in the stats
+        :param stats: stats of the pages
+        :param num_shards: number of shards
+        :param version: version of the index, see Query.get_index_version
+        :return: None
+        """
+        # the manifest is written last, so shards which weren't completely written are never used
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+
+        norms = {doc_id: page_info[NORM] for doc_id, page_info in stats[PAGES].items()}
+        bounds = ShardSet.get_bounds(sorted(stats[PAGES]), num_shards)
+        jobs = [(index, norms, bounds[shard], bounds[shard + 1], self.get_prefix(shard)) for shard in range(num_shards)]
+
+        if num_shards > 1 and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            processes = [context.Process(target=write_shard, args=job) for job in jobs]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            if any(process.exitcode for process in processes):
+                raise RuntimeError("The shards in {} couldn't all be written.".format(self.directory))
+        else:
+            for job in jobs:
+                write_shard(*job)
+
+        self.manifest = {"version": list(version) if version is not None else None, "bounds": bounds}
+        temporary_path = self.manifest_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=4)
+        os.replace(temporary_path, self.manifest_path)
+
+    def start(self, stats):
+        """
+        Start a process per shard, to score queries.
+        :param stats: stats of the pages
+        :return: the pool of shard processes, which can be used as the engine of AndQuery and OrQuery
+        """
+        return ShardPool(self, stats)
+
+
+class ShardPool:
+    """
+    Score queries across the shards of an index, with the same interface as MatrixEngine, so that AndQuery and OrQuery
+    can use it as their engine.
+    Each batch of queries is sent to every shard's process at once, so the shards rank their pages in parallel. The
+    rankings of the shards are then merged: shards hold disjoint pages, so the best k pages of the index are the best k
+    of the shards' best k pages.
+    """
+
+    # static variables
+    # the pool talks to its processes through pipes, which processes forked from this one would share with it, and
+    # mix up each other's rankings
+    forkable = False
+
+    def __init__(self, shard_set, stats):
+        """
+        Start a process per shard. The processes are spawned, so that each one only holds its own shard, instead of
+        inheriting everything this process holds.
+        :param shard_set: the written shards
+        :param stats: stats of the pages
+        """
+        context = multiprocessing.get_context("spawn")
+        bounds = shard_set.manifest["bounds"]
+
+        self.connections = []
+        self.processes = []
+
+        for shard in range(shard_set.get_num_shards()):
+            pages = {doc_id: page_info for doc_id, page_info in stats[PAGES].items() if bounds[shard] <= doc_id < bounds[shard + 1]}
+            connection, shard_connection = context.Pipe()
+            process = context.Process(target=serve_shard, args=(shard_set.get_prefix(shard), pages, shard_connection), daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+        # wait until every shard is open, so that the first batch isn't slowed down by the processes starting
+        for connection in self.connections:
+            connection.recv()
+
+    def search(self, batch, conjunctive=False, k=0):
+        """
+        Rank the pages for a batch of queries, on every shard in parallel.
+        :param batch: list of queries, each a list of terms
+        :param conjunctive: True for AND queries, False for OR queries
+        :param k: number of pages to keep per query, 0 for all of the matching pages
+        :return: for each query, list of (page ID, cosine similarity), best first, ties broken by lowest ID
+        """
+        for connection in self.connections:
+            connection.send((batch, conjunctive, k))
+
+        shard_rankings = [connection.recv() for connection in self.connections]
+        for rankings in shard_rankings:
+            if isinstance(rankings, Exception):
+                raise rankings
+
+        return [
+            list(islice(merge(*rankings, key=lambda result: (-result[1], result[0])), k or None))
+            for rankings in zip(*shard_rankings)
+        ]
+
+    def close(self):
+        """
+        Stop the shard processes.
+        :return: None
+        """
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
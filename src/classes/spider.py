@@ -1,8 +1,17 @@
 from scrapy.spiders import CrawlSpider, Rule
 from scrapy.linkextractors import LinkExtractor
+from scrapy.link import Link
 from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import CloseSpider
+from scrapy.http import Request
 
-from helpers import clean_terms
+from helpers import tokenize_page, URL, CONTENT, TEXTS
+from classes.seen_urls import SeenUrls
+from classes.page_validators import PageValidators, ConditionalRequestsMiddleware
+from classes.metrics import Metrics
+
+import os
+import time
 
 
 class ConcordiaSpider(CrawlSpider):
@@ -25,43 +34,180 @@ class ConcordiaSpider(CrawlSpider):
            "not(parent::script | parent::style)" \
            "]"
 
+    # pages scraped in this run, in the order they were scraped
     scraped_links = []
 
+    # pages scraped in this run and, when the crawl is resumed, in previous runs of the job
+    seen_pages = SeenUrls()
+
+    # output file of each feed format
+    feeds = {
+        "json": "results.json",
+        "jsonlines": "results.jl"
+    }
+
     remove_stopwords = False
 
+    # number of workers tokenizing pages outside of the reactor thread, 0 to tokenize in parse_item
+    tokenizer_workers = 0
+
+    # maximum number of pages to scrape, 0 for no maximum
+    max_pages = 0
+
+    # pages scraped in this run which the NearDuplicatesPipeline dropped, so that they don't count towards the maximum,
+    # and the URL of the page each one is a near-duplicate of
+    duplicate_pages = 0
+    canonical_urls = {}
+
+    # store of the validators of the pages crawled before, None to crawl every page as if it was new
+    validators = None
+
+    # pages crawled in this run which didn't change since the last crawl, and pages which were deleted since
+    unchanged_links = []
+    deleted_links = []
+
     def parse_item(self, response):
         """
         This method parses the response object.
         From the response, we get stuff like the page's title and the content of its body.
         It gets written to the results.json file.
 
+        With tokenizer workers, the text isn't tokenized here, since it would block the reactor from downloading other
+        pages in the meantime. The item holds the raw text instead, and the TokenizerPipeline tokenizes it in a pool.
+
+        With a store of validators, pages which didn't change since the last crawl aren't parsed, and the validators of
+        the others are kept, with the CPU time it took to parse them.
+
         :param response: response containing the web page's information.
         :return: None
         """
         url = response.url
-        if url in self.scraped_links:
+        if url in self.seen_pages:
+            return
+
+        # with concurrent requests, responses already downloaded when the spider closes are still parsed
+        if self.max_pages and len(self.scraped_links) + len(self.unchanged_links) - self.duplicate_pages >= self.max_pages:
+            # unchanged pages aren't items, so the crawl has to be closed once it reaches the maximum
+            if self.validators is not None:
+                raise CloseSpider("closespider_itemcount")
+            return
+
+        if self.validators is not None and not self.check_changed(response):
             return
 
         self.logger.info("Currently scraping: {}".format(url))
+        self.seen_pages.add(url)
         self.scraped_links.append(url)
+        Metrics.count("pages_scraped")
+        Metrics.count("bytes_scraped", len(response.body))
+
+        start = time.thread_time()
+        with Metrics.timer("ConcordiaSpider.parse_item"):
+            texts = [response.xpath("//title//text()").extract_first()]
+            texts.extend(response.xpath(self.tags).extract())
+
+            if self.tokenizer_workers:
+                item = {
+                    URL: url,
+                    TEXTS: texts
+                }
+            else:
+                item = {
+                    URL: url,
+                    CONTENT: tokenize_page(texts, self.remove_stopwords)
+                }
+
+        if self.validators is not None:
+            self.update_validators(response, time.thread_time() - start)
+        yield item
+
+    def check_changed(self, response):
+        """
+        Check whether a page changed since the last crawl, from the status of its response to a conditional request, or
+        from the hash of its content, and count it in the crawl's stats.
+        An unchanged page is seen, but it's neither parsed nor written to the feed, so that its copy in the index is
+        kept. A deleted page is forgotten, and is dropped from the index once the crawl is over.
+        :param response: response of the page
+        :return: True if the page is new or changed, so it has to be scraped
+        """
+        url = response.url
+        validators = response.meta.get("page_validators")
+        stats = self.crawler.stats
+
+        if validators is None:
+            stats.inc_value("recrawl/new")
+            return True
+
+        if response.status in ConditionalRequestsMiddleware.handled_statuses and response.status != 304:
+            self.logger.info("Deleted since the last crawl: {}".format(url))
+            self.deleted_links.append(url)
+            self.validators.delete(url)
+            stats.inc_value("recrawl/deleted")
+            return False
+
+        if response.status == 304:
+            stats.inc_value("recrawl/not_modified")
+            stats.inc_value("recrawl/bytes_saved", validators["length"] or 0)
+        elif PageValidators.content_hash(response.body) == validators["content_hash"]:
+            stats.inc_value("recrawl/same_content")
+            self.update_validators(response)
+        else:
+            stats.inc_value("recrawl/changed")
+            return True
+
+        self.logger.info("Unchanged since the last crawl: {}".format(url))
+        self.seen_pages.add(url)
+        self.unchanged_links.append(url)
+        stats.inc_value("recrawl/cpu_saved", validators["parse_seconds"] or 0.0)
+        return False
+
+    def update_validators(self, response, parse_seconds=None):
+        """
+        Keep the validators and the hash of a downloaded page.
+        :param response: response of the page
+        :param parse_seconds: CPU time it took to parse and tokenize the page, None if it wasn't parsed
+        :return: None
+        """
+        self.validators.update(
+            response.url,
+            (response.headers.get("ETag") or b"").decode("latin-1") or None,
+            (response.headers.get("Last-Modified") or b"").decode("latin-1") or None,
+            PageValidators.content_hash(response.body),
+            len(response.body),
+            parse_seconds
+        )
 
-        content = []
+    def _requests_to_follow(self, response):
+        """
+        Follow the links of a page, like CrawlSpider does. When pages are crawled again, the links of an unchanged page
+        answered with 304 Not Modified are those kept from the last crawl, the links of a deleted page aren't followed,
+        and the links of the other pages are kept for the next crawl.
+        :param response: response of the page
+        :return: generator of the requests of the links
+        """
+        if self.validators is None:
+            yield from super()._requests_to_follow(response)
+            return
 
-        title = response.xpath("//title//text()").extract_first()
-        content.extend(clean_terms(title, self.remove_stopwords))
+        if response.status == 304:
+            for link in response.meta["page_validators"]["links"]:
+                yield self._build_request(0, Link(link))
+            return
 
-        for text in response.xpath(self.tags).extract():
-            content.extend(clean_terms(text, self.remove_stopwords))
+        if response.status in ConditionalRequestsMiddleware.handled_statuses:
+            return
 
-        yield {
-            "url": url,
-            "content": content
-        }
+        links = []
+        for request in super()._requests_to_follow(response):
+            if isinstance(request, Request):
+                links.append(request.url)
+            yield request
+        self.validators.set_links(response.url, links)
 
     parse_start_url = parse_item
 
     @staticmethod
-    def get_process():
+    def get_process(feed_format="json"):
         """
         Here, we define a CrawlerProcess, which will help us run the spider from a Python script, instead of using the
         'scrapy' command in the command line.
@@ -70,19 +216,23 @@ class ConcordiaSpider(CrawlSpider):
         Some of the code taken from:
         https://stackoverflow.com/questions/23574636/scrapy-from-script-output-in-json
 
+        With the "jsonlines" feed format, each page is written on its own line, so that the pages can be read back one
+        at a time, instead of loading the whole crawl at once.
+
+        :param feed_format: format of the crawler's output, "json" or "jsonlines"
         :return: CrawlerProcess object
         """
         return CrawlerProcess({
             "USER_AGENT": "Mozilla/5.0 (Macintosh; Intel Mac OS X x.y; rv:42.0) Gecko/20100101 Firefox/42.0",
-            "FEED_FORMAT": "json",
-            "FEED_URI": "results.json",
-            "CONCURRENT_REQUESTS": 1,
+            "FEED_FORMAT": feed_format,
+            "FEED_URI": ConcordiaSpider.feeds[feed_format],
             "DEFAULT_REQUEST_HEADERS": {
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
                 "Accept-Language": "en",
             }
         })
 
+    @Metrics.timed("ConcordiaSpider.crawl")
     def crawl(
             self,
             start_url="https://www.concordia.ca/about.html",
@@ -90,7 +240,25 @@ class ConcordiaSpider(CrawlSpider):
             wikipedia_only=False,
             follow=True,
             max=10,
-            remove_stopwords=False
+            remove_stopwords=False,
+            feed_format="json",
+            online_index=False,
+            index_directory="",
+            index_positions=False,
+            tokenizer_workers=0,
+            tokenizer_pool="process",
+            concurrent_requests=1,
+            concurrent_per_domain=1,
+            download_delay=0.0,
+            autothrottle=False,
+            autothrottle_target=2.0,
+            autothrottle_max_delay=10.0,
+            dns_cache_size=10000,
+            keep_alive=True,
+            job_directory=None,
+            near_duplicates=False,
+            duplicate_threshold=5,
+            validators=None
     ):
         """
         First, we define the start URL of the crawler by appending it to its start_urls attribute, which is currently
@@ -102,16 +270,88 @@ class ConcordiaSpider(CrawlSpider):
         The CLOSESPIDER_ITEMCOUNT condition closes the spider once x number of links have been scraped. This is useful
         for setting an upper bound on the number of links to visit.
 
+        With online indexing, the IndexingPipeline adds each page to the index as soon as it's scraped, instead of
+        reading the pages back from the feed once the crawl is over.
+
+        With tokenizer workers, pages are tokenized by the TokenizerPipeline in a pool of processes (or threads), so that
+        the tokenization of some pages overlaps with the download of others, across several cores.
+
+        Up to concurrent_requests pages are downloaded at once, and at most concurrent_per_domain from the same domain,
+        with download_delay seconds between two requests to the same domain. By default, one page is downloaded at a
+        time, like the crawler always did, so that the sites crawled aren't put under more load unless asked for.
+        With AutoThrottle, the delay starts at download_delay, or a second without one, and is adjusted to the latency
+        of each domain, so that about autothrottle_target requests are sent to a domain at once, never waiting more than
+        autothrottle_max_delay seconds between two of them. Resolved host names are cached, and connections are kept
+        alive, so that up to concurrent_per_domain connections to each domain are reused for later requests, instead of
+        opening a connection per page. Once the crawl is over, the CrawlReport extension prints the pages and bytes per
+        second, and the average latency, of each domain.
+
+        With a job directory, the crawl can be interrupted, e.g. with Ctrl+C, and resumed by running it again with the
+        same directory. Scrapy keeps its queue of pending requests in the directory, and the URLs already requested and
+        the pages already scraped are kept there too, in canonical form, so that a resumed crawl neither fetches nor
+        scrapes them again. Only the pages scraped in this run are written to the feed, and the maximum number of pages
+        counts the pages scraped in previous runs.
+
+        With near-duplicate detection, the NearDuplicatesPipeline drops pages whose terms are nearly the same as those
+        of a page already scraped, so that they're neither written to the feed nor indexed, and don't count towards the
+        maximum number of pages.
+
+        With a store of validators, pages crawled before are requested with conditional requests. The pages which didn't
+        change since, which the server answers with 304 Not Modified, or whose content has the same hash as before, are
+        neither parsed nor written to the feed, so that only the new and changed pages get indexed, and the copies of
+        the others in the index are kept as they are. The pages which were deleted since, answered with 404 Not Found or
+        410 Gone, are listed in deleted_links, to be dropped from the index. Unchanged pages count towards the maximum
+        number of pages, and the crawl report shows the bytes they didn't download and the CPU time they didn't take to
+        parse, compared to crawling every page again. The store is left open, so that its changes are only committed
+        once the pages were indexed.
+
         :param start_url: URL the crawler will start scraping links from
         :param obey_robots: whether or not the crawler will obey websites' robots.txt
         :param wikipedia_only: if True, then the crawler will only crawl English Wikipedia articles
         :param follow: whether or not the crawler will follow extracted links
         :param max: maximum number of pages to be crawled
         :param remove_stopwords: whether or not stopwords will be removed from scraped content
-        :return: None
+        :param feed_format: format of the crawler's output, "json" or "jsonlines"
+        :param online_index: whether or not pages are indexed while they are crawled
+        :param index_directory: directory in which pages indexed while they are crawled are written
+        :param index_positions: whether or not pages indexed while they are crawled are indexed with the positions of
+        their terms
+        :param tokenizer_workers: number of workers tokenizing pages outside of the reactor thread, 0 for none
+        :param tokenizer_pool: kind of pool the tokenizer workers are in, "process" or "thread"
+        :param concurrent_requests: maximum number of requests made at once
+        :param concurrent_per_domain: maximum number of requests made at once to the same domain
+        :param download_delay: seconds to wait between two requests to the same domain
+        :param autothrottle: whether or not the delay is adjusted to the latency of each domain
+        :param autothrottle_target: average number of requests AutoThrottle sends at once to each domain
+        :param autothrottle_max_delay: maximum delay AutoThrottle waits between two requests to the same domain
+        :param dns_cache_size: number of host names whose address is cached, 0 to resolve every host name each time
+        :param keep_alive: whether or not connections are reused for several requests
+        :param job_directory: directory where the state of the crawl is kept, so that it can be resumed, None for none
+        :param near_duplicates: whether or not near-duplicates of pages already scraped are dropped
+        :param duplicate_threshold: largest number of bits the fingerprints of two near-duplicates differ by, out of 64
+        :param validators: PageValidators store of the pages crawled before, None to crawl every page as if it was new
+        :return: False if the job had already scraped the maximum number of pages, so there was nothing to crawl
         """
         ConcordiaSpider.start_urls = [start_url]
         ConcordiaSpider.remove_stopwords = remove_stopwords
+        ConcordiaSpider.tokenizer_workers = tokenizer_workers
+        if job_directory:
+            os.makedirs(job_directory, exist_ok=True)
+        ConcordiaSpider.seen_pages = SeenUrls(os.path.join(job_directory, SeenUrls.pages_file) if job_directory else None)
+        ConcordiaSpider.scraped_links = []
+        ConcordiaSpider.duplicate_pages = 0
+        ConcordiaSpider.canonical_urls = {}
+        ConcordiaSpider.validators = validators
+        ConcordiaSpider.unchanged_links = []
+        ConcordiaSpider.deleted_links = []
+
+        remaining = max - len(ConcordiaSpider.seen_pages)
+        if remaining <= 0:
+            print("\nThe job already scraped {} page(s), the maximum. Raise --max to crawl more pages.\n"
+                  .format(len(ConcordiaSpider.seen_pages)))
+            ConcordiaSpider.seen_pages.close()
+            return False
+        ConcordiaSpider.max_pages = remaining
 
         if wikipedia_only:
             link_extractor = LinkExtractor(
@@ -132,11 +372,54 @@ class ConcordiaSpider(CrawlSpider):
             ),
         )
 
-        process = ConcordiaSpider.get_process()
+        process = ConcordiaSpider.get_process(feed_format)
         process.settings.set("ROBOTSTXT_OBEY", obey_robots)
-        process.settings.set("CLOSESPIDER_ITEMCOUNT", max)
+        process.settings.set("CLOSESPIDER_ITEMCOUNT", remaining)
+
+        process.settings.set("CONCURRENT_REQUESTS", concurrent_requests)
+        process.settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", concurrent_per_domain)
+        process.settings.set("DOWNLOAD_DELAY", download_delay)
+        process.settings.set("AUTOTHROTTLE_ENABLED", autothrottle)
+        process.settings.set("AUTOTHROTTLE_TARGET_CONCURRENCY", autothrottle_target)
+        process.settings.set("AUTOTHROTTLE_START_DELAY", download_delay or 1.0)
+        process.settings.set("AUTOTHROTTLE_MAX_DELAY", autothrottle_max_delay)
+        process.settings.set("DNSCACHE_ENABLED", dns_cache_size > 0)
+        process.settings.set("DNSCACHE_SIZE", dns_cache_size)
+        if not keep_alive:
+            headers = dict(process.settings.getdict("DEFAULT_REQUEST_HEADERS"), Connection="close")
+            process.settings.set("DEFAULT_REQUEST_HEADERS", headers)
+        process.settings.set("EXTENSIONS", {"classes.crawl_report.CrawlReport": 500})
+        process.settings.set("DUPEFILTER_CLASS", "classes.seen_urls.SeenUrlsDupeFilter")
+        if job_directory:
+            process.settings.set("JOBDIR", job_directory)
+        if validators is not None:
+            process.settings.set("DOWNLOADER_MIDDLEWARES", {"classes.page_validators.ConditionalRequestsMiddleware": 560})
+            # the feed is written even when no page changed, so that it can be read back like any other
+            process.settings.set("FEED_STORE_EMPTY", True)
+
+        pipelines = {}
+        if tokenizer_workers:
+            pipelines["classes.tokenizer_pipeline.TokenizerPipeline"] = 100
+            process.settings.set("TOKENIZER_WORKERS", tokenizer_workers)
+            process.settings.set("TOKENIZER_POOL", tokenizer_pool)
+        if near_duplicates:
+            pipelines["classes.near_duplicates_pipeline.NearDuplicatesPipeline"] = 200
+            process.settings.set("DUPLICATE_THRESHOLD", duplicate_threshold)
+        if online_index:
+            pipelines["classes.indexing_pipeline.IndexingPipeline"] = 300
+            process.settings.set("INDEX_DIRECTORY", index_directory)
+            process.settings.set("INDEX_POSITIONS", index_positions)
+        process.settings.set("ITEM_PIPELINES", pipelines)
 
         process.crawl(ConcordiaSpider)
         process.start()
 
         print("\n{} page(s) scraped:\n{}\n".format(len(self.scraped_links), "\n".join(self.scraped_links)))
+        if validators is not None:
+            print("{} page(s) unchanged and {} page(s) deleted since the last crawl.\n"
+                  .format(len(self.unchanged_links), len(self.deleted_links)))
+        if job_directory:
+            print("{} page(s) scraped by the job in {} so far.\n".format(len(ConcordiaSpider.seen_pages), job_directory))
+        ConcordiaSpider.seen_pages.close()
+
+        return True
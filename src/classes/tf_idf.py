@@ -1,4 +1,4 @@
-from helpers import PAGES, log10, TOTALS, TOTAL_DOCUMENTS, TF
+from helpers import PAGES, log10, TOTALS, TOTAL_DOCUMENTS
 
 
 class TFIDF:
@@ -7,22 +7,29 @@ class TFIDF:
         """
         Initialize the tf-idf calculator.
         N is the total number of documents, i.e. total number of pages scraped.
-        :param index: dictionary of terms, the pages in which they appear, and the number of times they appear in them.
+        :param index: dictionary of terms, the IDs of the pages in which they appear, and the number of times they appear
+        in them.
         :param stats: dictionary of pages scraped, with total number of terms, and Afinn score, for each page.
         """
         self.index = index
         self.stats = stats
 
-        self.N = self.stats[TOTALS][TOTAL_DOCUMENTS]
+    @property
+    def N(self):
+        """
+        Read from the stats every time, since they may still be filled in while the index is being built.
+        :return: total number of documents
+        """
+        return self.stats[TOTALS][TOTAL_DOCUMENTS]
 
     def get_documents_of_term(self, term):
         """
         From the pages scraped, get those that contain the term in question.
         :param term: a word
-        :return: list of web pages
+        :return: postings of the term, iterating over the IDs of the web pages
         """
         try:
-            return list(self.index[term][PAGES].keys())
+            return self.index[term][PAGES]
         except KeyError:
             return []
 
@@ -37,15 +44,15 @@ class TFIDF:
         except KeyError:
             return 0
 
-    def get_term_frequency_in_document(self, term, url):
+    def get_term_frequency_in_document(self, term, doc_id):
         """
-        For the URL of the web page, count how many times the term appears in it.
+        For the ID of the web page, count how many times the term appears in it.
         :param term: a word
-        :param url: a web page
+        :param doc_id: ID of a web page
         :return: number of times the term appears in the web page
         """
         try:
-            return self.index[term][PAGES][url][TF]
+            return self.index[term][PAGES].tf(doc_id)
         except KeyError:
             return 0
 
@@ -61,14 +68,14 @@ class TFIDF:
         except ZeroDivisionError:
             return 0.0
 
-    def compute_tf_idf(self, term, url):
+    def compute_tf_idf(self, term, doc_id):
         """
         Get the term frequency-inverse document frequency of a term in a document in relation to the whole corpus.
         :param term: a word
-        :param url: a web page
+        :param doc_id: ID of a web page
         :return: tf-idf of word in web page
         """
-        tf = self.get_term_frequency_in_document(term, url)
+        tf = self.get_term_frequency_in_document(term, doc_id)
         idf = self.get_idf_weight(term)
         return tf * idf
 
@@ -0,0 +1,85 @@
+from helpers import tokenize_page, URL, CONTENT, TEXTS
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from twisted.internet import defer, reactor
+
+import multiprocessing
+
+
+class TokenizerPipeline:
+    """
+    Scrapy item pipeline which tokenizes pages in a pool of workers, instead of in the reactor thread.
+    Items yielded by ConcordiaSpider.parse_item hold the raw text of the page. The text is sent to the pool, and a
+    Deferred is returned to Scrapy, which fires with the tokenized item once the worker is done. In the meantime, the
+    reactor keeps downloading and parsing other pages.
+    More info: https://doc.scrapy.org/en/latest/topics/item-pipeline.html
+    """
+
+    def __init__(self, workers, pool):
+        """
+        :param workers: number of workers in the pool
+        :param pool: kind of pool, "process" to tokenize on several cores, or "thread"
+        """
+        self.workers = workers
+        self.pool = pool
+        self.executor = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Create the pipeline from the TOKENIZER_WORKERS and TOKENIZER_POOL settings.
+        :param crawler: the crawler using the pipeline
+        :return: the pipeline
+        """
+        return cls(crawler.settings.getint("TOKENIZER_WORKERS", 1), crawler.settings.get("TOKENIZER_POOL", "process"))
+
+    def open_spider(self, spider):
+        """
+        Start the pool when the spider opens.
+        Worker processes are spawned rather than forked, since the reactor process already has threads running.
+        :param spider: the spider which was opened
+        :return: None
+        """
+        if self.pool == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def process_item(self, item, spider):
+        """
+        Send the text of the page to the pool.
+        :param item: scraped page, with its URL and the raw text of its title and tags
+        :param spider: the spider which scraped the page
+        :return: Deferred firing with the page's URL and its terms as content
+        """
+        if TEXTS not in item:
+            return item
+
+        deferred = defer.Deferred()
+        future = self.executor.submit(tokenize_page, item[TEXTS], spider.remove_stopwords)
+        future.add_done_callback(lambda done: reactor.callFromThread(TokenizerPipeline.fire, deferred, item[URL], done))
+        return deferred
+
+    @staticmethod
+    def fire(deferred, url, future):
+        """
+        Fire the Deferred of an item with the result of the worker. Called in the reactor thread.
+        :param deferred: the Deferred returned for the item
+        :param url: URL of the page
+        :param future: the worker's future, which is done
+        :return: None
+        """
+        try:
+            content = future.result()
+        except Exception as error:
+            deferred.errback(error)
+        else:
+            deferred.callback({URL: url, CONTENT: content})
+
+    def close_spider(self, spider):
+        """
+        Stop the pool once every page has been tokenized.
+        :param spider: the spider which was closed
+        :return: None
+        """
+        self.executor.shutdown(wait=True)
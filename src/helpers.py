@@ -1,17 +1,19 @@
 import string
+import json
 import re
 
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
-from afinn import Afinn
 from math import log10, sqrt
+from functools import lru_cache
+
+from classes.metrics import Metrics
 
 
 word_tokenize = word_tokenize
 stopwords = set(stopwords.words("english"))
 ps = PorterStemmer()
-afinn = Afinn()
 log10 = log10
 sqrt = sqrt
 
@@ -31,22 +33,93 @@ def clean_terms(text, remove_stopwords=False):
     return terms
 
 
+""" same characters as the expression in clean_terms, compiled once """
+punctuation = re.compile("[" + string.punctuation + "–—‘’“”…•‹›«»]+")
+
+""" characters at which the Punkt sentence tokenizer may split a text """
+sentence_ends = (".", "?", "!")
+
+
+@lru_cache(maxsize=4096)
+def fast_clean_terms(text, remove_stopwords=False):
+    """
+    Same terms as clean_terms, with less work per token:
+     • texts with no character that can end a sentence are a single sentence, so sentence splitting is skipped
+     • the punctuation expression is compiled once, and casefolding and filtering are done in a single pass
+     • the terms of a text are cached, since menus, headers and footers repeat the same text on every page
+    :param text: string of text to be tokenized and casefolded
+    :param remove_stopwords: whether or not stopwords will be removed from the string of text
+    :return: tuple of terms without strings that are just punctuation, and without stopwords
+    """
+    single_sentence = not any(end in text for end in sentence_ends)
+    is_punctuation = punctuation.fullmatch
+    return tuple(
+        term for term in map(str.casefold, word_tokenize(text, preserve_line=single_sentence))
+        if not is_punctuation(term) and not (remove_stopwords and term in stopwords)
+    )
+
+
+@Metrics.timed("tokenize_page")
+def tokenize_page(texts, remove_stopwords=False):
+    """
+    Tokenize a whole page in one call. This is a module-level function so that it can be sent to a process pool.
+    Each text node is tokenized on its own, like clean_terms would, so that sentences don't run across tags.
+    :param texts: list of strings of text from the page, e.g. its title and the text of its tags, or a single string
+    :param remove_stopwords: whether or not stopwords will be removed
+    :return: list of terms of the page
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+
+    terms = []
+    for text in texts:
+        # skip the whitespace between tags
+        if text and not text.isspace():
+            terms.extend(fast_clean_terms(text, remove_stopwords))
+
+    Metrics.count("terms_tokenized", len(terms))
+    return terms
+
+
+def read_results(file_path):
+    """
+    Read the crawler's output one page at a time.
+    With a JSON lines feed (.jl), each line is a page, so only one page is held in memory at a time. A JSON feed is a
+    single array, which has to be loaded whole before its pages can be read.
+    :param file_path: file with the crawler's output
+    :return: generator of pages, each with a URL and a list of terms as content
+    """
+    with open(file_path, encoding="utf-8") as results_file:
+        if file_path.endswith(JSONLINES_EXTENSIONS):
+            for line in results_file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(results_file)
+
+
+JSONLINES_EXTENSIONS = (".jl", ".jsonl")
+
 SENTIMENT = "sentiment"
 PAGES = "pages"
+URLS = "urls"
 URL = "url"
 CONTENT = "content"
+TEXTS = "texts"
 TOTALS = "totals"
 TOTAL_DOCUMENTS = "total_documents"
 TOTAL_TOKENS = "total_tokens"
 TOTAL_AFINN = "total_afinn"
 AVG_TOKENS = "avg_tokens"
 AVG_AFINN = "avg_afinn"
+NORM = "norm"
 
 TF = "tf"
 CFT = "cft"
 DFT = "dft"
 IDF = "idf"
 TF_IDF = "tf-idf"
+MAX_IMPACT = "max_impact"
 
 COSINE_SIMILARITY = "cosine similarity"
 AFINN_SCORE = "Afinn score"
@@ -1,14 +1,21 @@
+from helpers import PAGES, URLS
 from classes.spider import ConcordiaSpider
-from classes.index_builder import IndexBuilder
-from classes.document_parser import DocumentParser
-from classes.query import Query, AndQuery, OrQuery
+from classes.corpus_indexer import CorpusIndexer
+from classes.indexing_pipeline import IndexingPipeline
+from classes.segments import SegmentSet
+from classes.page_validators import PageValidators
+from classes.sentiment_table import SentimentTable
+from classes.query import Query, AndQuery, OrQuery, PhraseQuery
+from classes.matrix_engine import MatrixEngine
+from classes.batch_queries import BatchQueryRunner
+from classes.shards import ShardSet
+from classes.metrics import Metrics
 
 import os
+import sys
 import argparse
 
 
-output_file = ConcordiaSpider.get_process().settings.get("FEED_URI")
-
 parser = argparse.ArgumentParser(description="Configure crawler's process.")
 
 parser.add_argument("-url", "--start-url", type=str, help="page where we start crawling for links", default="https://www.concordia.ca/about.html")
@@ -18,9 +25,40 @@ parser.add_argument("-rs", "--remove-stopwords", action="store_true", help="remo
 parser.add_argument("-nf", "--no-follow", action="store_false", help="do not follow extracted links", default=True)
 parser.add_argument("-wiki", "--wikipedia-only", action="store_true", help="only crawl English Wikipedia articles", default=False)
 parser.add_argument("-skip", "--skip-crawl", action="store_true", help="skip crawler, build index and stats from current files", default=False)
+parser.add_argument("-feed", "--feed-format", choices=sorted(ConcordiaSpider.feeds), help="format of the crawler's output", default="json")
+parser.add_argument("-online", "--online-index", action="store_true", help="index pages while they are crawled", default=False)
+parser.add_argument("-fresh", "--fresh-index", action="store_true", help="delete the index segments of previous crawls before crawling", default=False)
+parser.add_argument("-pos", "--positions", action="store_true", help="keep the positions of the terms in the index, for phrase queries", default=False)
+parser.add_argument("-merge", "--merge-segments", action="store_true", help="merge all index segments into one before querying", default=False)
+parser.add_argument("-tw", "--tokenizer-workers", type=int, help="number of workers tokenizing pages outside of the crawler's thread", default=0)
+parser.add_argument("-tp", "--tokenizer-pool", choices=["process", "thread"], help="kind of pool the tokenizer workers are in", default="process")
+parser.add_argument("-c", "--concurrent-requests", type=int, help="maximum number of requests the crawler makes at once", default=1)
+parser.add_argument("-cd", "--concurrent-per-domain", type=int, help="maximum number of requests the crawler makes at once to the same domain", default=1)
+parser.add_argument("-delay", "--download-delay", type=float, help="seconds to wait between two requests to the same domain", default=0.0)
+parser.add_argument("-at", "--autothrottle", action="store_true", help="adjust the delay to the latency of each domain", default=False)
+parser.add_argument("-att", "--autothrottle-target", type=float, help="average number of requests AutoThrottle sends at once to each domain", default=2.0)
+parser.add_argument("-atmax", "--autothrottle-max-delay", type=float, help="maximum delay AutoThrottle waits between two requests to the same domain", default=10.0)
+parser.add_argument("-dns", "--dns-cache-size", type=int, help="number of host names whose address is cached, 0 to disable the cache", default=10000)
+parser.add_argument("-nka", "--no-keep-alive", action="store_false", help="open a new connection for every request", default=True)
+parser.add_argument("-job", "--job-directory", type=str, help="directory where the state of the crawl is kept, so that it can be interrupted and resumed")
+parser.add_argument("-dedup", "--near-duplicates", action="store_true", help="skip pages which are near-duplicates of pages already scraped", default=False)
+parser.add_argument("-dt", "--duplicate-threshold", type=int, help="largest number of bits the fingerprints of two near-duplicates differ by, out of 64", default=5)
+parser.add_argument("-recrawl", "--conditional-recrawl", action="store_true", help="only download and index the pages which changed since the last crawl", default=False)
+parser.add_argument("-k", "--top-k", type=int, help="only find the k best pages of OR queries, 0 to score every matching page", default=0)
+parser.add_argument("-engine", "--engine", choices=["python", "matrix"], help="score queries from the postings, or from a sparse matrix compiled from the index (requires NumPy and SciPy)", default="python")
+parser.add_argument("-shards", "--shards", type=int, help="partition the index by document into shards, and score queries with a process per shard", default=0)
+parser.add_argument("-queries", "--queries", type=str, help="conduct the queries of a file, one per line, instead of prompting for them")
+parser.add_argument("-mode", "--mode", choices=["and", "or", "phrase"], help="kind of the queries of the file", default="or")
+parser.add_argument("-format", "--format", choices=BatchQueryRunner.formats, help="format of the results of the queries of the file", default="jsonl")
+parser.add_argument("-qw", "--query-workers", type=int, help="number of worker processes the queries of the file are split across", default=0)
+parser.add_argument("-out", "--output", type=str, help="file the results of the queries of the file are written to, instead of the standard output")
+parser.add_argument("-report", "--run-report", type=str, help="time each stage of the run, and write the measures to a file as JSON")
+parser.add_argument("-prom", "--prometheus", type=str, help="time each stage of the run, and write the measures to a file in the Prometheus text format")
 
 args = parser.parse_args()
 
+output_file = ConcordiaSpider.feeds[args.feed_format]
+
 
 def delete_results():
     if os.path.exists(output_file):
@@ -30,64 +68,193 @@ def delete_results():
 def run_spider(remove_stopwords=False):
 
     """
-    First, delete the results.json file if it exists. The crawler will recreate it and populate it with data.
-    Run the crawler through the pages, and from the data in the JSON file, generate some statistics for each page.
-    From that same JSON, as well as the generated stats, create the inverted index.
-    Finally, prompt the user to conduct some queries against the index.
+    First, delete the results.json (or results.jl) file if it exists. The crawler will recreate it and populate it with
+    data.
+    Run the crawler through the pages, and in a single pass over the data in the JSON file, generate some statistics
+    for each page and create the inverted index, in a new segment.
+    When a crawl with a job directory is resumed, only the pages scraped in this run are in the file, so the pages of
+    previous runs, which are in the segments of those runs, aren't indexed again.
+    With a conditional re-crawl, only the pages which changed since the last crawl are in the file, and the pages which
+    were deleted are listed in the new segment, so that they're dropped from the index.
+    With online indexing, the stats and the index are instead built while the pages are crawled.
+    Finally, prompt the user to conduct some queries against all segments, while segments are merged in the background.
     """
 
     delete_results()
 
+    segment_set = SegmentSet()
+    validators_path = os.path.join(segment_set.directory, PageValidators.validators_file)
+    if args.fresh_index:
+        segment_set.clear()
+        PageValidators.remove(validators_path)
+    SentimentTable.open(segment_set.directory)
+    segment_directory = segment_set.new_segment()
+    validators = PageValidators(validators_path) if args.conditional_recrawl else None
+
     spider = ConcordiaSpider()
-    spider.crawl(
+    crawled = spider.crawl(
         start_url=args.start_url,
         obey_robots=not args.ignore_robots,
         wikipedia_only=args.wikipedia_only,
         follow=args.no_follow,
         max=args.max,
-        remove_stopwords=remove_stopwords
+        remove_stopwords=remove_stopwords,
+        feed_format=args.feed_format,
+        online_index=args.online_index,
+        index_directory=segment_directory,
+        index_positions=args.positions,
+        tokenizer_workers=args.tokenizer_workers,
+        tokenizer_pool=args.tokenizer_pool,
+        concurrent_requests=args.concurrent_requests,
+        concurrent_per_domain=args.concurrent_per_domain,
+        download_delay=args.download_delay,
+        autothrottle=args.autothrottle,
+        autothrottle_target=args.autothrottle_target,
+        autothrottle_max_delay=args.autothrottle_max_delay,
+        dns_cache_size=args.dns_cache_size,
+        keep_alive=args.no_keep_alive,
+        job_directory=args.job_directory,
+        near_duplicates=args.near_duplicates,
+        duplicate_threshold=args.duplicate_threshold,
+        validators=validators
     )
 
-    document_parser = DocumentParser(output_file)
-    document_parser.construct_stats()
+    if not crawled:
+        corpus_indexer = None
+    elif args.online_index:
+        corpus_indexer = IndexingPipeline.corpus_indexer
+    else:
+        corpus_indexer = CorpusIndexer(output_file, segment_directory, args.positions)
+        corpus_indexer.construct()
+
+    num_documents = len(corpus_indexer.get_stats()[URLS]) if corpus_indexer and corpus_indexer.get_stats()[PAGES] else 0
+    deleted_urls = ConcordiaSpider.deleted_links if crawled and validators is not None else []
+    if num_documents or deleted_urls:
+        segment_set.add_segment(segment_directory, num_documents, deleted_urls)
+    else:
+        segment_set.discard_segment(segment_directory)
+
+    # the validators are only kept once the changed pages are in the index
+    if validators is not None:
+        validators.close(commit=crawled)
+
+    if not SegmentSet.exists():
+        return
 
-    stats = document_parser.get_stats()
+    if args.merge_segments:
+        segment_set.merge_all()
 
-    index_builder = IndexBuilder(output_file, stats)
-    index_builder.construct_index()
+    index, stats = segment_set.load()
+    merge_thread = segment_set.merge_in_background()
 
-    index = index_builder.get_index()
+    conduct_queries(index, stats, remove_stopwords, args.top_k, args.engine, args.shards)
 
-    conduct_queries(index, stats, remove_stopwords)
+    if merge_thread.is_alive():
+        print("Waiting for the index segments to be merged...")
+    merge_thread.join()
 
 
 def build_stats_and_index(remove_stopwords=False):
 
-    stats = DocumentParser.build_stats_from_file()
-    index = IndexBuilder.build_index_from_file()
+    segment_set = SegmentSet()
+    SentimentTable.open(segment_set.directory)
+    if args.merge_segments:
+        segment_set.merge_all()
+
+    index, stats = segment_set.load()
+
+    conduct_queries(index, stats, remove_stopwords, args.top_k, args.engine, args.shards)
+
+
+def conduct_queries(index, stats, remove_stopwords=False, top_k=0, engine="python", shards=0):
+
+    query_engine = None
+    if shards:
+        query_engine = start_shards(index, stats, shards)
+    elif engine == "matrix":
+        if MatrixEngine.available():
+            print("Compiling the index into a sparse matrix...")
+            query_engine = MatrixEngine(index, stats)
+        else:
+            print("NumPy and SciPy aren't installed, queries will be scored from the postings.")
+
+    and_query = AndQuery(index, stats, remove_stopwords, query_engine)
+    or_query = OrQuery(index, stats, remove_stopwords, top_k, query_engine)
+    phrase_query = PhraseQuery(index, stats, remove_stopwords)
 
-    conduct_queries(index, stats, remove_stopwords)
+    # the kind of query is part of the cache's keys, so all kinds share a cache
+    or_query.cache = phrase_query.cache = and_query.cache
 
+    if args.queries and args.mode == "phrase" and not phrase_query.positional:
+        print(PhraseQuery.no_positions)
+    elif args.queries:
+        run_batch_queries({"and": and_query, "or": or_query, "phrase": phrase_query}[args.mode])
+    else:
+        while True:
+            user_input = input("Would you like to conduct an AND query, an OR query or a phrase query? Hit enter for no. [and/or/phrase] ")
+            if user_input == "":
+                if and_query.cache.hits or and_query.cache.misses:
+                    print("Query cache: {} hit(s), {} miss(es).".format(and_query.cache.hits, and_query.cache.misses))
+                break
+            elif user_input.lower().strip() == "phrase" and not phrase_query.positional:
+                print(PhraseQuery.no_positions)
+            elif user_input.lower() in ["and", "or", "phrase"]:
+                user_query = Query.ask_user()
+                if user_input.lower().strip() == "and":
+                    and_query.execute(user_query)
+                elif user_input.lower().strip() == "or":
+                    or_query.execute(user_query)
+                elif user_input.lower().strip() == "phrase":
+                    phrase_query.execute(user_query)
+
+    if shards:
+        query_engine.close()
+
+
+def start_shards(index, stats, num_shards):
+
+    """
+    Partition the index by document into shards, unless they were already partitioned from the same segments, then
+    start a process per shard, which the queries are sent to.
+    """
 
-def conduct_queries(index, stats, remove_stopwords=False):
+    shard_set = ShardSet(os.path.join(SegmentSet.segments_directory, ShardSet.shards_directory))
+    version = getattr(index, "version", None)
 
-    and_query = AndQuery(index, stats, remove_stopwords)
-    or_query = OrQuery(index, stats, remove_stopwords)
+    if not shard_set.is_current(num_shards, version):
+        print("Partitioning the index into {} shard(s)...".format(num_shards))
+        shard_set.write(index, stats, num_shards, version)
 
-    while True:
-        user_input = input("Would you like to conduct an AND query or an OR query? Hit enter for no. [and/or] ")
-        if user_input == "":
-            break
-        elif user_input.lower() in ["and", "or"]:
-            user_query = Query.ask_user()
-            if user_input.lower().strip() == "and":
-                and_query.execute(user_query)
-            elif user_input.lower().strip() == "or":
-                or_query.execute(user_query)
+    print("Starting a process per shard...")
+    return shard_set.start(stats)
+
+
+def run_batch_queries(query):
+
+    """
+    Conduct the queries of the file given with --queries, without prompting the user, then report their throughput and
+    latency.
+    """
+
+    runner = BatchQueryRunner(query, args.query_workers, args.format)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            runner.run(args.queries, output)
+    else:
+        runner.run(args.queries, results_output)
 
 
 if __name__ == '__main__':
 
+    # only the results of the queries of a file go to the standard output, so that they can be piped into a program
+    results_output = sys.stdout
+    if args.queries and not args.output:
+        sys.stdout = sys.stderr
+
+    if args.run_report or args.prometheus:
+        Metrics.enable()
+
     if not args.skip_crawl:
 
         run_spider(args.remove_stopwords)
@@ -96,15 +263,24 @@ if __name__ == '__main__':
 
         print("Skipping crawl...")
 
-        if not os.path.exists(IndexBuilder.index_file) or not os.path.exists(DocumentParser.stats_file):
+        if not SegmentSet.exists():
 
             print(
-                "Both {} and {} files have to exist to skip crawling. Run the crawler first to get a data set."
-                .format(IndexBuilder.index_file, DocumentParser.stats_file)
+                "The index segments listed in {} have to exist to skip crawling. Run the crawler first to get a data set."
+                .format(SegmentSet().manifest_path)
             )
 
         else:
 
             build_stats_and_index(args.remove_stopwords)
 
+    if Metrics.enabled:
+        Metrics.print_report()
+        if args.run_report:
+            Metrics.write_report(args.run_report)
+            print("Run report written to {}.".format(args.run_report))
+        if args.prometheus:
+            Metrics.write_prometheus(args.prometheus)
+            print("Metrics written to {} in the Prometheus text format.".format(args.prometheus))
+
     print("Bye!")
@@ -0,0 +1,60 @@
+from classes.segments import SegmentSet
+from classes.sentiment_table import SentimentTable
+from classes.query import AndQuery, OrQuery
+from classes.matrix_engine import MatrixEngine
+from classes.query_server import QueryServer
+from classes.metrics import Metrics
+
+import argparse
+
+
+parser = argparse.ArgumentParser(description="Serve AND and OR queries over HTTP, from the index built by the crawler.")
+
+parser.add_argument("-host", "--host", type=str, help="address to listen on", default="127.0.0.1")
+parser.add_argument("-p", "--port", type=int, help="port to listen on", default=8080)
+parser.add_argument("-w", "--workers", type=int, help="number of worker processes scoring queries, 0 to score them in a single thread", default=0)
+parser.add_argument("-k", "--top-k", type=int, help="number of pages returned when a request doesn't give k, 0 for all", default=10)
+parser.add_argument("-rs", "--remove-stopwords", action="store_true", help="remove stopwords from queries", default=False)
+parser.add_argument("-merge", "--merge-segments", action="store_true", help="merge all index segments into one before serving", default=False)
+parser.add_argument("-metrics", "--metrics", action="store_true", help="measure the latencies of the requests, and serve them at /metrics in the Prometheus text format", default=False)
+parser.add_argument("-engine", "--engine", choices=["python", "matrix"], help="score queries from the postings, or from a sparse matrix compiled from the index (requires NumPy and SciPy)", default="python")
+
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    if args.metrics:
+        Metrics.enable()
+
+    segment_set = SegmentSet()
+
+    if not SegmentSet.exists():
+
+        print(
+            "The index segments listed in {} have to exist to serve queries. Run the crawler first to get a data set."
+            .format(segment_set.manifest_path)
+        )
+
+    else:
+
+        SentimentTable.open(segment_set.directory)
+        if args.merge_segments:
+            segment_set.merge_all()
+
+        print("Loading the index...")
+        index, stats = segment_set.load()
+
+        matrix_engine = None
+        if args.engine == "matrix":
+            if MatrixEngine.available():
+                print("Compiling the index into a sparse matrix...")
+                matrix_engine = MatrixEngine(index, stats)
+            else:
+                print("NumPy and SciPy aren't installed, queries will be scored from the postings.")
+
+        and_query = AndQuery(index, stats, args.remove_stopwords, matrix_engine)
+        or_query = OrQuery(index, stats, args.remove_stopwords, args.top_k, matrix_engine)
+        or_query.cache = and_query.cache
+
+        QueryServer(and_query, or_query, args.host, args.port, args.workers, args.top_k).serve_forever()
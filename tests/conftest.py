@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# the modules are imported from src, like main.py and the benchmarks do when they're run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,86 @@
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.postings import Postings
+from classes.query import AndQuery
+from benchmarks.corpus import generate_corpus
+from benchmarks.and_latency import set_based_and, galloping_and
+
+from array import array
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+import random
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """
+    Index a small synthetic corpus, and open the index from its files, with compressed postings.
+    :return: the index built in memory, the index opened from its files, the stats, and the vocabulary, most frequent
+    terms first
+    """
+    directory = str(tmp_path_factory.mktemp("and"))
+    file_path = os.path.join(directory, "results.jl")
+    vocabulary = generate_corpus(file_path, 1500, 80, 3000)
+    corpus_indexer = CorpusIndexer(file_path, directory)
+    with redirect_stdout(io.StringIO()):
+        corpus_indexer.construct()
+
+    disk_index = IndexBuilder.build_index_from_file(directory)
+    yield corpus_indexer.get_index(), disk_index, DocumentParser.build_stats_from_file(directory), vocabulary
+    disk_index.close()
+
+
+def sample_queries(vocabulary, seed):
+    """
+    :return: queries mixing common and rare terms, some with a term which isn't in the index
+    """
+    generator = random.Random(seed)
+    queries = []
+    for _ in range(40):
+        terms = [generator.choice(vocabulary[:20])]
+        terms += generator.sample(vocabulary[:generator.choice([50, 500, 3000])], generator.randint(1, 3))
+        if generator.random() < 0.2:
+            terms.insert(generator.randrange(len(terms) + 1), "notaterm")
+        queries.append(terms)
+    return queries
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_galloping_and_matches_set_based_and(corpus, on_disk):
+    memory_index, disk_index, stats, vocabulary = corpus
+    index = disk_index if on_disk else memory_index
+    for terms in sample_queries(vocabulary, on_disk):
+        expected = set_based_and(index, stats, terms)
+        results = galloping_and(index, stats, terms)
+        assert results.keys() == expected.keys()
+        for doc_id, score in results.items():
+            assert score == pytest.approx(expected[doc_id])
+
+
+def test_and_query_ranks_the_same_pages(corpus):
+    memory_index, disk_index, stats, vocabulary = corpus
+    for terms in sample_queries(vocabulary, 2):
+        expected = set_based_and(disk_index, stats, terms)
+        ranking = AndQuery(disk_index, stats).rank(terms)
+        assert sorted(doc_id for doc_id, _ in ranking) == sorted(expected)
+        assert [score for _, score in ranking] == pytest.approx(sorted(expected.values(), reverse=True))
+
+
+def test_terms_missing_from_the_index(corpus):
+    memory_index, _, stats, vocabulary = corpus
+    assert galloping_and(memory_index, stats, ["notaterm"]) == set_based_and(memory_index, stats, ["notaterm"]) == {}
+    assert galloping_and(memory_index, stats, [vocabulary[0], "notaterm"]) == {}
+    assert AndQuery(memory_index, stats).rank(["notaterm", vocabulary[0]]) == []
+
+
+def test_intersect_with_empty_postings():
+    postings = Postings(array("I", [1, 3, 5, 7]), array("I", [1, 1, 1, 1]))
+    assert Postings.intersect([]) == []
+    assert Postings.intersect([postings, Postings()]) == []
+    assert Postings.intersect([Postings(), postings]) == []
+    assert Postings.intersect([postings]) == [1, 3, 5, 7]
+    assert Postings.intersect([postings, Postings(array("I", [0, 3, 4, 7, 9]), array("I", [1] * 5))]) == [3, 7]
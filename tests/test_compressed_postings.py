@@ -0,0 +1,140 @@
+from classes.compressed_postings import CompressedPostings
+from classes.postings import Postings
+
+from array import array
+
+import pytest
+import random
+
+
+IDF = 0.75
+
+
+def make_postings(gaps, tfs):
+    """
+    :param gaps: gaps between the document IDs, the first one from 0
+    :param tfs: term frequency in each document
+    :return: postings with the document IDs, term frequencies and tf-idf values
+    """
+    doc_ids = array("I")
+    doc_id = 0
+    for gap in gaps:
+        doc_id += gap
+        doc_ids.append(doc_id)
+    postings = Postings(doc_ids, array("I", tfs))
+    postings.set_weights(IDF)
+    return postings
+
+
+def encode(postings, norms=None):
+    """
+    :return: the postings encoded and read back, with the max impact of the term if the norms are given
+    """
+    max_impact = Postings.max_impact(postings, norms) if norms is not None else None
+    data = CompressedPostings.encode(postings, max_impact, norms)
+    return CompressedPostings(data, 0, len(postings), IDF, max_impact)
+
+
+@pytest.fixture
+def widths():
+    """
+    Postings of 4 blocks, whose gaps and term frequencies fit in 1, 2 and 4 bytes, up to the highest value of each
+    width, and a last block that's only partly full.
+    """
+    size = CompressedPostings.block_size
+    gaps = [1] * size + [255] + [256] * (size - 1) + [65535] + [65536] * (size - 1) + [2] * 5
+    tfs = [255] * size + [256] * size + [65535, 65536] * (size // 2) + [1] * 5
+    return make_postings(gaps, tfs)
+
+
+def test_blocks_use_the_smallest_width():
+    size = CompressedPostings.block_size
+    postings = make_postings([1] * size + [256] * size + [65536] * size, [1] * size + [256] * size + [65536] * size)
+    compressed = encode(postings)
+    headers = []
+    for block in range(compressed.num_blocks):
+        start = compressed.blocks_start + (compressed.block_ends[block - 1] if block else 0)
+        headers.append(compressed.data[start])
+    assert headers == [1 | 1 << 4, 2 | 2 << 4, 4 | 4 << 4]
+
+
+def test_round_trip_block_by_block(widths):
+    compressed = encode(widths)
+    assert len(compressed) == len(widths)
+    for position, doc_id in enumerate(widths.doc_ids):
+        assert compressed.doc_id_at(position) == doc_id
+        assert compressed.tf(doc_id) == widths.tfs[position]
+        assert compressed.weight_at(position) == widths.weights[position]
+    assert "doc_ids" not in compressed.__dict__
+
+
+def test_round_trip_whole_columns(widths):
+    compressed = encode(widths)
+    assert compressed.doc_ids == widths.doc_ids
+    assert compressed.tfs == widths.tfs
+    assert compressed.weights == widths.weights
+
+
+def test_seek_across_block_edges(widths):
+    size = CompressedPostings.block_size
+    targets = [0, widths.doc_ids[-1] + 1]
+    for edge in range(size, len(widths), size):
+        targets += [widths.doc_ids[edge - 1], widths.doc_ids[edge - 1] + 1, widths.doc_ids[edge], widths.doc_ids[edge] + 1]
+
+    # once the whole columns are decoded, the search gallops over them instead of going through the skip data
+    decoded = encode(widths)
+    assert decoded.doc_ids == widths.doc_ids
+    for start in (0, size - 1, size, 2 * size + 3, len(widths) - 1):
+        for target in targets:
+            expected = Postings.gallop(widths.doc_ids, target, start)
+            assert encode(widths).seek(target, start) == expected
+            assert decoded.seek(target, start) == expected
+
+
+def test_galloping_from_the_previous_search(widths):
+    rng = random.Random(0)
+    targets = sorted(rng.sample(range(widths.doc_ids[-1] + 2), 50))
+    compressed = encode(widths)
+    position = expected = 0
+    for target in targets:
+        position = compressed.seek(target, position)
+        expected = Postings.gallop(widths.doc_ids, target, expected)
+        assert position == expected
+
+
+def test_intersect_with_postings_in_memory(widths):
+    rng = random.Random(0)
+    other = Postings()
+    for doc_id in sorted(rng.sample(range(widths.doc_ids[-1] + 1), 300)):
+        other.add(doc_id)
+    expected = sorted(set(widths.doc_ids) & set(other.doc_ids))
+    assert Postings.intersect([encode(widths), other]) == expected
+    assert Postings.intersect([encode(widths), Postings()]) == []
+
+
+def test_block_max_impacts_bound_the_weights():
+    rng = random.Random(0)
+    size = 3 * CompressedPostings.block_size + 17
+    postings = make_postings([rng.randint(1, 20) for _ in range(size)], [rng.randint(1, 50) for _ in range(size)])
+    norms = [rng.uniform(1.0, 100.0) for _ in range(postings.doc_ids[-1] + 1)]
+    compressed = encode(postings, norms)
+
+    for block in range(compressed.num_blocks):
+        start = block * CompressedPostings.block_size
+        block_postings = postings.slice(start, start + CompressedPostings.block_size)
+        bound = compressed.block_max_impact(block_postings.doc_ids[0])
+        assert bound <= compressed.max_impact
+        for doc_id, weight in zip(block_postings.doc_ids, block_postings.weights):
+            assert compressed.block_max_impact(doc_id) == bound
+            assert weight / norms[doc_id] <= bound * (1 + 1e-9)
+        # a byte is enough for the bound to be within 1/255 of the term's max impact of the block's
+        assert bound - Postings.max_impact(block_postings, norms) <= compressed.max_impact / 255 * (1 + 1e-9)
+
+    assert compressed.block_max_impact(postings.doc_ids[-1] + 1) == 0.0
+
+
+def test_block_max_impacts_without_norms():
+    postings = make_postings([1] * 10, [2] * 10)
+    assert encode(postings).block_max_impact(1) is None
+    assert CompressedPostings.quantize(0.5, 0.0) == 0
+    assert CompressedPostings.quantize(1.0, 1.0) == 255
@@ -0,0 +1,118 @@
+from helpers import PAGES, CFT, DFT, IDF, SENTIMENT, NORM, MAX_IMPACT
+from classes.corpus_indexer import CorpusIndexer
+from classes.disk_index import DiskIndex
+from classes.postings import Postings
+from benchmarks.corpus import generate_corpus
+
+from array import array
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["plain", "positional"])
+def corpus(request, tmp_path_factory):
+    """
+    Index a small synthetic corpus in memory, with or without the positions of its terms.
+    :return: the directory the index files are written to, the index, and the norm of each page, by ID
+    """
+    directory = str(tmp_path_factory.mktemp("disk_index"))
+    file_path = os.path.join(directory, "results.jl")
+    generate_corpus(file_path, 600, 60, 2000)
+    corpus_indexer = CorpusIndexer(file_path, directory, request.param)
+    with redirect_stdout(io.StringIO()):
+        corpus_indexer.construct()
+
+    stats = corpus_indexer.get_stats()
+    norms = [stats[PAGES][doc_id][NORM] for doc_id in sorted(stats[PAGES])]
+    return directory, corpus_indexer.get_index(), norms
+
+
+def test_round_trip(corpus):
+    directory, index, norms = corpus
+    prefix = os.path.join(directory, "round_trip")
+    DiskIndex.write(index, prefix, norms)
+
+    disk_index = DiskIndex(prefix)
+    assert len(disk_index) == len(index)
+    assert list(disk_index) == sorted(index, key=lambda term: term.encode("utf-8"))
+    assert disk_index.positional == index[next(iter(index))][PAGES].has_positions()
+
+    for term, entry in index.items():
+        disk_entry = disk_index[term]
+        for statistic in (CFT, DFT, IDF, SENTIMENT, MAX_IMPACT):
+            assert disk_entry[statistic] == entry[statistic]
+        postings, disk_postings = entry[PAGES], disk_entry[PAGES]
+        assert disk_postings.doc_ids == postings.doc_ids
+        assert disk_postings.tfs == postings.tfs
+        assert disk_postings.weights == array("f", [tf * entry[IDF] for tf in postings.tfs])
+        if disk_index.positional:
+            assert [disk_postings.get_positions(position) for position in range(len(postings))] == \
+                [postings.get_positions(position) for position in range(len(postings))]
+
+    assert "notaterm" not in disk_index
+    with pytest.raises(KeyError):
+        disk_index["notaterm"]
+    disk_index.close()
+
+
+def test_max_impacts_are_patched_in_place(corpus):
+    directory, index, norms = corpus
+    with_norms = os.path.join(directory, "with_norms")
+    DiskIndex.write(index, with_norms, norms)
+
+    # like a merged segment, written before the norms of its pages were known
+    without_norms = os.path.join(directory, "without_norms")
+    DiskIndex.write({term: dict(entry, **{MAX_IMPACT: None}) for term, entry in index.items()}, without_norms)
+    disk_index = DiskIndex(without_norms)
+    assert all(disk_index[term][MAX_IMPACT] == 0.0 for term in list(index)[:50])
+    disk_index.close()
+
+    sizes = [os.path.getsize(without_norms + extension) for extension in DiskIndex.extensions]
+    DiskIndex.write_max_impacts(without_norms, norms)
+    assert [os.path.getsize(without_norms + extension) for extension in DiskIndex.extensions] == sizes
+
+    for extension in DiskIndex.extensions:
+        with open(with_norms + extension, "rb") as expected, open(without_norms + extension, "rb") as patched:
+            assert patched.read() == expected.read()
+
+    disk_index = DiskIndex(without_norms)
+    for term in list(index)[:200]:
+        postings = disk_index[term][PAGES]
+        assert disk_index[term][MAX_IMPACT] == Postings.max_impact(index[term][PAGES], norms)
+        for doc_id, weight in zip(postings.doc_ids, postings.weights):
+            assert weight / norms[doc_id] <= postings.block_max_impact(doc_id) * (1 + 1e-9)
+    disk_index.close()
+
+
+def test_terms_which_cannot_be_encoded_are_skipped(tmp_path):
+    postings = Postings()
+    postings.add(0, 2)
+    postings.set_weights(0.5)
+    entry = {CFT: 2, DFT: 1, IDF: 0.5, SENTIMENT: 0.0, PAGES: postings}
+    prefix = str(tmp_path / "index")
+    DiskIndex.write({"concordia": entry, "\ud800": entry}, prefix)
+
+    disk_index = DiskIndex(prefix)
+    assert list(disk_index) == ["concordia"]
+    assert "\ud800" not in disk_index
+    disk_index.close()
+
+
+def test_empty_index(tmp_path):
+    prefix = str(tmp_path / "index")
+    DiskIndex.write({}, prefix)
+    disk_index = DiskIndex(prefix)
+    assert len(disk_index) == 0 and list(disk_index) == []
+    disk_index.close()
+
+
+def test_older_formats_are_rejected(tmp_path):
+    prefix = str(tmp_path / "index")
+    with open(prefix + ".dict", "wb") as dict_file:
+        dict_file.write(DiskIndex.header.pack(b"SWCDICT3", 0))
+    open(prefix + ".post", "wb").close()
+    with pytest.raises(ValueError):
+        DiskIndex(prefix)
@@ -0,0 +1,65 @@
+from helpers import fast_clean_terms
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.matrix_engine import MatrixEngine
+from classes.query import AndQuery, OrQuery
+from benchmarks.corpus import generate_corpus
+from benchmarks.batch_scoring import python_batch, same_rankings
+
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+import random
+
+
+pytestmark = pytest.mark.skipif(not MatrixEngine.available(), reason="NumPy and SciPy aren't installed")
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """
+    Index a small synthetic corpus, and open the index from its files.
+    :return: the index built in memory, the index opened from its files, the stats, and a batch of queries
+    """
+    directory = str(tmp_path_factory.mktemp("matrix"))
+    file_path = os.path.join(directory, "results.jl")
+    vocabulary = generate_corpus(file_path, 1500, 80, 3000)
+    corpus_indexer = CorpusIndexer(file_path, directory)
+    with redirect_stdout(io.StringIO()):
+        corpus_indexer.construct()
+
+    # queries mixing common and rarer terms, some with a repeated term or a term which isn't in the index
+    generator = random.Random(0)
+    batch = [generator.sample(vocabulary[:generator.choice((30, 300, 3000))], generator.randint(1, 4)) for _ in range(100)]
+    batch += [[vocabulary[0], vocabulary[0], vocabulary[5]], [vocabulary[1], "notaterm"], ["notaterm"]]
+
+    disk_index = IndexBuilder.build_index_from_file(directory)
+    yield corpus_indexer.get_index(), disk_index, DocumentParser.build_stats_from_file(directory), batch
+    disk_index.close()
+
+
+@pytest.mark.parametrize("k", [0, 1, 10])
+@pytest.mark.parametrize("query_class", [OrQuery, AndQuery])
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_matrix_engine_matches_the_postings(corpus, query_class, k, on_disk):
+    memory_index, disk_index, stats, batch = corpus
+    index = disk_index if on_disk else memory_index
+    expected = python_batch(query_class(index, stats), batch, k)
+    actual = MatrixEngine(index, stats).search(batch, query_class.conjunctive, k)
+    assert len(actual) == len(batch)
+    for terms, expected_ranking, ranking in zip(batch, expected, actual):
+        assert same_rankings(expected_ranking, ranking), terms
+
+
+def test_search_batch_uses_the_engine(corpus):
+    _, disk_index, stats, batch = corpus
+    engine = MatrixEngine(disk_index, stats)
+    queries = [" ".join(terms) for terms in batch]
+    cleaned = [list(fast_clean_terms(query)) for query in queries]
+    for query_class in (OrQuery, AndQuery):
+        expected = python_batch(query_class(disk_index, stats), cleaned, 10)
+        actual = query_class(disk_index, stats, engine=engine).search_batch(queries, 10)
+        assert all(same_rankings(*rankings) for rankings in zip(expected, actual))
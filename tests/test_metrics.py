@@ -0,0 +1,76 @@
+from classes.corpus_indexer import CorpusIndexer
+from classes.metrics import Metrics
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+
+import io
+import os
+import threading
+
+
+def test_measures_from_several_threads_add_up():
+    Metrics.enable()
+    timed = Metrics.timed("stage")(lambda: None)
+
+    def work():
+        for _ in range(2000):
+            timed()
+            Metrics.count("calls")
+            Metrics.observe("latency_seconds", 0.001, "or")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    Metrics.disable()
+
+    report = Metrics.get_report()
+    assert report["stages"]["stage"]["calls"] == 16000
+    assert report["counters"]["calls"] == 16000
+    assert report["histograms"]["latency_seconds"]["or"]["count"] == 16000
+    assert report["histograms"]["latency_seconds"]["or"]["buckets"]["+Inf"] == 16000
+
+
+def test_nothing_is_measured_when_disabled():
+    Metrics.enable()
+    Metrics.disable()
+    Metrics.timed("stage")(lambda: None)()
+    Metrics.count("calls")
+    Metrics.observe("latency_seconds", 0.001)
+    with Metrics.timer("block"):
+        pass
+    assert Metrics.get_report()["stages"] == {}
+    assert Metrics.to_prometheus() == "\n"
+
+
+def test_prometheus_format():
+    Metrics.enable()
+    Metrics.add_time("SegmentSet.load", 0.5)
+    Metrics.count("pages_scraped", 3)
+    Metrics.observe("query_latency_seconds", 0.003, "and")
+    Metrics.disable()
+
+    lines = Metrics.to_prometheus().splitlines()
+    assert 'swc_stage_seconds_total{stage="SegmentSet.load"} 0.5' in lines
+    assert "swc_pages_scraped_total 3" in lines
+    assert 'swc_query_latency_seconds_bucket{mode="and",le="0.0025"} 0' in lines
+    assert 'swc_query_latency_seconds_bucket{mode="and",le="0.005"} 1' in lines
+    assert 'swc_query_latency_seconds_count{mode="and"} 1' in lines
+
+
+def test_indexing_stages_are_timed(tmp_path):
+    file_path = os.path.join(str(tmp_path), "results.jl")
+    generate_corpus(file_path, 50, 20, 100)
+
+    Metrics.reset()
+    Metrics.enable()
+    with redirect_stdout(io.StringIO()):
+        CorpusIndexer(file_path, str(tmp_path)).construct()
+    Metrics.disable()
+
+    stages = Metrics.get_report()["stages"]
+    for stage in ("CorpusIndexer.construct", "CorpusIndexer.add_results", "CorpusIndexer.finish",
+                  "IndexBuilder.compute_weights", "IndexBuilder.write_to_file", "DocumentParser.write_to_file"):
+        assert stages[stage]["calls"] == 1
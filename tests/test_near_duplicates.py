@@ -0,0 +1,54 @@
+from helpers import URL, CONTENT
+from classes.near_duplicates_pipeline import NearDuplicatesPipeline
+from classes.crawl_report import CrawlReport
+
+from contextlib import redirect_stdout
+from scrapy import Spider
+from scrapy.exceptions import DropItem
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+import io
+import pytest
+import random
+
+
+class DuplicatesSpider(Spider):
+    name = "duplicates"
+    duplicate_pages = 0
+    canonical_urls = {}
+
+
+TERMS = ["term{}".format(number) for number in random.Random(0).choices(range(500), k=300)]
+
+
+def test_near_duplicates_are_dropped_and_reported():
+    crawler = get_crawler(DuplicatesSpider)
+    spider = DuplicatesSpider()
+    pipeline = NearDuplicatesPipeline.from_crawler(crawler)
+    report = CrawlReport.from_crawler(crawler)
+    report.spider_opened(spider)
+
+    original = {URL: "https://www.concordia.ca/about.html", CONTENT: TERMS}
+    print_view = {URL: "https://www.concordia.ca/about.html?print=1", CONTENT: TERMS + ["print"]}
+    other = {URL: "https://www.concordia.ca/news.html", CONTENT: sorted(TERMS)}
+
+    assert pipeline.process_item(original, spider) is original
+    with pytest.raises(DropItem):
+        pipeline.process_item(print_view, spider)
+    assert pipeline.process_item(other, spider) is other
+
+    assert spider.duplicate_pages == 1
+    assert spider.canonical_urls == {print_view[URL]: original[URL]}
+    assert crawler.stats.get_value("near_duplicates/pages") == 1
+    assert crawler.stats.get_value("near_duplicates/tokens") == len(print_view[CONTENT])
+
+    request = Request(original[URL])
+    report.response_received(HtmlResponse(original[URL], body=b"<html></html>", request=request), request, spider)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        report.spider_closed(spider)
+
+    assert CrawlReport.near_duplicates["pages"] == 1
+    assert CrawlReport.near_duplicates["canonical_urls"] == {print_view[URL]: original[URL]}
+    assert "{} is a near-duplicate of {}".format(print_view[URL], original[URL]) in output.getvalue()
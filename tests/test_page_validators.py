@@ -0,0 +1,146 @@
+from classes.page_validators import PageValidators, ConditionalRequestsMiddleware
+from classes.seen_urls import SeenUrls
+from classes.spider import ConcordiaSpider
+
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+import pytest
+
+
+URL = "https://www.concordia.ca/about.html"
+BODY = b"<html><head><title>About</title></head><body><p>Concordia University</p></body></html>"
+ETAG = '"5f3a-1b2c"'
+LAST_MODIFIED = "Wed, 14 Oct 2026 08:00:00 GMT"
+
+
+@pytest.fixture
+def spider(monkeypatch):
+    """
+    Spider crawling pages again, with a store of validators which knows about URL, and its stats.
+    """
+    validators = PageValidators()
+    validators.update(URL, ETAG, LAST_MODIFIED, PageValidators.content_hash(BODY), len(BODY), 0.25)
+    validators.set_links(URL, ["https://www.concordia.ca/news.html", "https://www.concordia.ca/contact.html"])
+
+    for name, value in [("validators", validators), ("seen_pages", SeenUrls()), ("scraped_links", []),
+                        ("unchanged_links", []), ("deleted_links", []), ("duplicate_pages", 0), ("max_pages", 0)]:
+        monkeypatch.setattr(ConcordiaSpider, name, value)
+
+    spider = ConcordiaSpider.from_crawler(get_crawler(ConcordiaSpider))
+    yield spider
+    validators.close()
+
+
+def conditional_request(spider, url=URL, **kwargs):
+    """
+    :return: the request of a page, once it went through the ConditionalRequestsMiddleware
+    """
+    request = Request(url, **kwargs)
+    assert ConditionalRequestsMiddleware().process_request(request, spider) is None
+    return request
+
+
+def response(request, status=200, body=BODY, headers=None):
+    return HtmlResponse(request.url, status=status, body=body, headers=headers, request=request)
+
+
+def test_requests_of_pages_crawled_before_are_conditional(spider):
+    request = conditional_request(spider)
+    assert request.headers["If-None-Match"] == ETAG.encode()
+    assert request.headers["If-Modified-Since"] == LAST_MODIFIED.encode()
+    assert request.meta["page_validators"]["links"] == ["https://www.concordia.ca/news.html", "https://www.concordia.ca/contact.html"]
+    assert request.meta["handle_httpstatus_list"] == [304, 404, 410]
+
+    # the validators of the canonical URL are used, and headers which were set aren't replaced
+    request = conditional_request(spider, URL + "#history", headers={"If-None-Match": '"other"'})
+    assert request.headers["If-None-Match"] == b'"other"'
+    assert request.headers["If-Modified-Since"] == LAST_MODIFIED.encode()
+
+
+def test_other_requests_are_left_as_they_are(spider, monkeypatch):
+    for request in (conditional_request(spider, "https://www.concordia.ca/news.html"), conditional_request(spider, method="POST")):
+        assert b"If-None-Match" not in request.headers and b"If-Modified-Since" not in request.headers
+        assert "page_validators" not in request.meta and "handle_httpstatus_list" not in request.meta
+
+    monkeypatch.setattr(ConcordiaSpider, "validators", None)
+    request = conditional_request(spider)
+    assert b"If-None-Match" not in request.headers and "page_validators" not in request.meta
+
+
+def test_not_modified_pages_are_not_parsed(spider):
+    request = conditional_request(spider)
+    assert list(spider.parse_item(response(request, 304, b""))) == []
+
+    stats = spider.crawler.stats
+    assert stats.get_value("recrawl/not_modified") == 1
+    assert stats.get_value("recrawl/bytes_saved") == len(BODY)
+    assert stats.get_value("recrawl/cpu_saved") == 0.25
+    assert spider.unchanged_links == [URL] and spider.scraped_links == []
+    assert URL in spider.seen_pages
+
+    # the links kept from the last crawl are followed
+    links = [link_request.url for link_request in spider._requests_to_follow(response(request, 304, b""))]
+    assert links == ["https://www.concordia.ca/news.html", "https://www.concordia.ca/contact.html"]
+
+
+@pytest.mark.parametrize("status", [404, 410])
+def test_deleted_pages_are_forgotten(spider, status):
+    request = conditional_request(spider)
+    deleted = response(request, status, b"Not Found")
+    assert list(spider.parse_item(deleted)) == []
+    assert list(spider._requests_to_follow(deleted)) == []
+
+    assert spider.crawler.stats.get_value("recrawl/deleted") == 1
+    assert spider.deleted_links == [URL] and spider.scraped_links == []
+    assert spider.validators.get(URL) is None
+
+
+def test_pages_with_the_same_content_are_not_parsed(spider):
+    request = conditional_request(spider)
+    headers = {"ETag": '"new-etag"', "Last-Modified": "Thu, 15 Oct 2026 08:00:00 GMT"}
+    assert list(spider.parse_item(response(request, 200, BODY, headers))) == []
+
+    assert spider.crawler.stats.get_value("recrawl/same_content") == 1
+    assert spider.unchanged_links == [URL]
+    validators = spider.validators.get(URL)
+    assert (validators["etag"], validators["last_modified"]) == ('"new-etag"', "Thu, 15 Oct 2026 08:00:00 GMT")
+    assert validators["parse_seconds"] == 0.25
+
+
+def test_changed_and_new_pages_are_parsed_and_their_validators_kept(spider):
+    body = BODY.replace(b"Concordia University", b"Concordia University, Montreal")
+    changed = response(conditional_request(spider), 200, body, {"ETag": '"changed"'})
+    new = response(conditional_request(spider, "https://www.concordia.ca/news.html"), 200, BODY, {"Last-Modified": LAST_MODIFIED})
+
+    assert len(list(spider.parse_item(changed))) == 1
+    assert len(list(spider.parse_item(new))) == 1
+
+    stats = spider.crawler.stats
+    assert stats.get_value("recrawl/changed") == 1 and stats.get_value("recrawl/new") == 1
+    assert spider.scraped_links == [URL, "https://www.concordia.ca/news.html"]
+
+    validators = spider.validators.get(URL)
+    assert (validators["etag"], validators["last_modified"]) == ('"changed"', None)
+    assert (validators["content_hash"], validators["length"]) == (PageValidators.content_hash(body), len(body))
+    validators = spider.validators.get("https://www.concordia.ca/news.html")
+    assert (validators["etag"], validators["last_modified"]) == (None, LAST_MODIFIED)
+
+
+def test_changes_are_only_kept_once_committed(tmp_path):
+    path = str(tmp_path / PageValidators.validators_file)
+    validators = PageValidators(path)
+    validators.update(URL, ETAG, None, PageValidators.content_hash(BODY), len(BODY))
+    validators.close(commit=False)
+    assert len(PageValidators(path)) == 0
+
+    validators = PageValidators(path)
+    validators.update(URL, ETAG, None, PageValidators.content_hash(BODY), len(BODY))
+    validators.close()
+    validators = PageValidators(path)
+    assert validators.get(URL)["etag"] == ETAG
+    validators.close()
+
+    PageValidators.remove(path)
+    assert len(PageValidators(path)) == 0
@@ -0,0 +1,59 @@
+from helpers import read_results, CONTENT
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.query import PhraseQuery
+from benchmarks.corpus import generate_corpus
+from benchmarks.phrase_queries import sample_phrases, scan_phrase
+
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+import random
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """
+    Index a small synthetic corpus with and without the positions of its terms.
+    :return: the terms of each page, and the index and stats opened from their files, with and without positions
+    """
+    directory = str(tmp_path_factory.mktemp("phrase"))
+    file_path = os.path.join(directory, "results.jl")
+    generate_corpus(file_path, 500, 100, 300)
+
+    indexes = {}
+    for positional in (False, True):
+        index_directory = os.path.join(directory, "positional" if positional else "plain")
+        os.makedirs(index_directory)
+        with redirect_stdout(io.StringIO()):
+            CorpusIndexer(file_path, index_directory, positional).construct()
+        indexes[positional] = (IndexBuilder.build_index_from_file(index_directory), DocumentParser.build_stats_from_file(index_directory))
+
+    yield [result[CONTENT] for result in read_results(file_path)], indexes
+    for index, _ in indexes.values():
+        index.close()
+
+
+@pytest.mark.parametrize("length", [2, 3, 4])
+def test_phrase_query_finds_the_pages_containing_the_phrase(corpus, length):
+    documents, indexes = corpus
+    phrase_query = PhraseQuery(*indexes[True])
+    assert phrase_query.positional
+    for phrase in sample_phrases(documents, length, 30, random.Random(length)):
+        assert sorted(doc_id for doc_id, _ in phrase_query.rank(phrase)) == scan_phrase(documents, phrase)
+
+
+def test_phrase_query_without_positions_raises_and_caches_nothing(corpus):
+    documents, indexes = corpus
+    phrase_query = PhraseQuery(*indexes[False])
+    assert not phrase_query.positional
+
+    text = " ".join(documents[0][:2])
+    with pytest.raises(ValueError):
+        phrase_query.search(text)
+    with pytest.raises(ValueError):
+        phrase_query.search_batch([text])
+    assert len(phrase_query.cache) == 0
@@ -0,0 +1,103 @@
+from classes.corpus_indexer import CorpusIndexer
+from classes.query import OrQuery
+from classes.query_cache import QueryCache
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+
+import io
+import os
+
+
+def ranking(num_results):
+    return [(doc_id, 1.0 / (doc_id + 1)) for doc_id in range(num_results)]
+
+
+def key(*terms):
+    return QueryCache.key(terms, False, False, 0)
+
+
+def test_keys_ignore_the_order_of_the_terms():
+    assert QueryCache.key(["concordia", "university"], False, False, 10) == QueryCache.key(["university", "concordia"], False, False, 10)
+    assert QueryCache.key(["concordia"], False, False, 10) != QueryCache.key(["concordia", "concordia"], False, False, 10)
+    assert QueryCache.key(["concordia"], False, False, 10) != QueryCache.key(["concordia"], True, False, 10)
+    assert QueryCache.key(["concordia"], False, False, 10) != QueryCache.key(["concordia"], False, False, 0)
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = QueryCache(max_entries=3)
+    for term in ("a", "b", "c"):
+        cache.put(key(term), 1, ranking(1))
+    assert cache.get(key("a"), 1) == ranking(1)
+
+    cache.put(key("d"), 1, ranking(1))
+    assert len(cache) == 3
+    assert cache.get(key("b"), 1) is None
+    assert [cache.get(key(term), 1) is not None for term in ("a", "c", "d")] == [True, True, True]
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+def test_entries_are_bounded_by_their_size():
+    size = QueryCache.size(key("a"), ranking(100))
+    cache = QueryCache(max_bytes=2 * size + size // 2)
+    for term in ("a", "b", "c"):
+        cache.put(key(term), 1, ranking(100))
+    assert len(cache) == 2
+    assert cache.num_bytes == 2 * size <= cache.max_bytes
+    assert cache.get(key("a"), 1) is None
+
+    # a ranking larger than the whole cache isn't cached, and doesn't evict anything
+    cache.put(key("e"), 1, ranking(1000))
+    assert cache.get(key("e"), 1) is None
+    assert len(cache) == 2
+
+    # replacing an entry doesn't count it twice
+    cache.put(key("c"), 1, ranking(100))
+    assert cache.num_bytes == 2 * size
+
+    cache.clear()
+    assert len(cache) == 0 and cache.num_bytes == 0
+
+
+def test_entries_of_another_version_of_the_index_are_dropped():
+    cache = QueryCache()
+    cache.put(key("a"), ("segment_000000",), ranking(3))
+    size = cache.num_bytes
+    assert cache.get(key("a"), ("segment_000000",)) == ranking(3)
+    assert cache.get(key("a"), ("segment_000000", "segment_000001")) is None
+    assert len(cache) == 0 and cache.num_bytes == 0
+    assert cache.get(key("a"), ("segment_000000",)) is None
+
+    cache.put(key("a"), ("segment_000001",), ranking(3))
+    assert cache.num_bytes == size
+
+
+def test_disabled_cache():
+    cache = QueryCache(max_entries=0)
+    cache.put(key("a"), 1, ranking(3))
+    assert cache.get(key("a"), 1) is None
+
+
+def test_queries_share_a_cache_until_the_index_changes(tmp_path):
+    indexes = []
+    for num_documents in (100, 120):
+        directory = str(tmp_path / str(num_documents))
+        os.makedirs(directory)
+        file_path = os.path.join(directory, "results.jl")
+        vocabulary = generate_corpus(file_path, num_documents, 30, 100)
+        corpus_indexer = CorpusIndexer(file_path, directory)
+        with redirect_stdout(io.StringIO()):
+            corpus_indexer.construct()
+        indexes.append((corpus_indexer.get_index(), corpus_indexer.get_stats()))
+
+    query = " ".join(vocabulary[:2])
+    or_query = OrQuery(*indexes[0])
+    expected = or_query.search(query)
+    assert or_query.search(" ".join(reversed(vocabulary[:2]))) == expected
+    assert (or_query.cache.hits, or_query.cache.misses) == (1, 1)
+
+    # a query on the new index, sharing the cache, doesn't get the ranking of the old one
+    new_query = OrQuery(*indexes[1])
+    new_query.cache = or_query.cache
+    assert new_query.search(query) == OrQuery(*indexes[1]).search(query) != expected
+    assert (or_query.cache.hits, or_query.cache.misses) == (1, 2)
@@ -0,0 +1,127 @@
+from helpers import URLS, URL
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from classes.query import AndQuery, OrQuery
+from classes.query_server import QueryServer, score_query, server_queries
+from benchmarks.corpus import generate_corpus
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import asyncio
+import io
+import json
+import os
+import pytest
+
+
+@pytest.fixture(scope="module")
+def queries(tmp_path_factory):
+    """
+    Index a small synthetic corpus, and open it from its files.
+    :return: the AND and OR queries the server answers with
+    """
+    directory = str(tmp_path_factory.mktemp("server"))
+    file_path = os.path.join(directory, "results.jl")
+    generate_corpus(file_path, 100, 50, 200)
+    with redirect_stdout(io.StringIO()):
+        CorpusIndexer(file_path, directory).construct()
+
+    index = IndexBuilder.build_index_from_file(directory)
+    stats = DocumentParser.build_stats_from_file(directory)
+    yield AndQuery(index, stats), OrQuery(index, stats)
+    index.close()
+
+
+def exchange(queries, requests):
+    """
+    Start a server, send it raw requests on a single connection, and read the responses until it closes it.
+    :param queries: the AND and OR queries the server answers with
+    :param requests: bytes sent to the server
+    :return: list of (status code, decoded JSON body) of the responses
+    """
+    async def run():
+        server = QueryServer(*queries, port=0)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            writer.write(requests)
+            await writer.drain()
+
+            responses = []
+            while True:
+                status_line = await reader.readline()
+                if not status_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b"\r\n":
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers["content-length"]))
+                responses.append((int(status_line.split()[1]), json.loads(body)))
+                if headers["connection"] == "close":
+                    break
+            writer.close()
+            return responses
+        finally:
+            server.server.close()
+            server.executor.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_requests_on_a_kept_alive_connection(queries):
+    responses = exchange(queries, b"GET /health HTTP/1.1\r\n\r\nPOST /health HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello" + b"GET /or?q=a HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert [status for status, _ in responses] == [200, 200, 200]
+
+
+def test_request_line_too_long(queries):
+    responses = exchange(queries, b"GET /or?q=" + b"a" * (QueryServer.max_line_length * 2) + b" HTTP/1.1\r\n\r\n")
+    assert responses[0][0] == 400
+
+
+def test_header_line_too_long(queries):
+    responses = exchange(queries, b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * (QueryServer.max_line_length * 2) + b"\r\n\r\n")
+    assert responses[0][0] == 400
+
+
+def test_too_many_header_lines(queries):
+    headers = b"".join(b"X-Header-%d: a\r\n" % number for number in range(QueryServer.max_header_lines + 1))
+    responses = exchange(queries, b"GET /health HTTP/1.1\r\n" + headers + b"\r\n")
+    assert responses[0][0] == 400
+
+
+def test_body_too_large(queries):
+    responses = exchange(queries, b"POST /health HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (QueryServer.max_body_size + 1))
+    assert responses[0][0] == 413
+
+
+@pytest.mark.parametrize("length", ["-1", "abc", "1.5", "\u00b2", "1\u00b9"])
+def test_malformed_content_length(queries, length):
+    responses = exchange(queries, b"GET /health HTTP/1.1\r\nContent-Length: " + length.encode("latin-1") + b"\r\n\r\n")
+    assert responses[0][0] == 400
+
+
+@pytest.mark.parametrize("target", [b"//[::1", b"http://[/or?q=a"])
+def test_malformed_request_target(queries, target):
+    responses = exchange(queries, b"GET " + target + b" HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert responses[0][0] == 400
+
+
+def test_requests_with_different_k_dont_share_state(queries):
+    and_query, or_query = queries
+    server_queries.update({"and": and_query, "or": or_query})
+    text = " ".join(list(or_query.index)[:3])
+    expected = {k: OrQuery(or_query.index, or_query.stats, top_k=k).search(text)[:k or None] for k in (0, 1, 5, 20)}
+
+    with ThreadPoolExecutor(8) as executor:
+        bodies = list(executor.map(lambda k: (k, json.loads(score_query("or", text, k))), [0, 1, 5, 20] * 25))
+
+    for k, body in bodies:
+        assert body["pages"] == len(expected[k])
+        assert [result[URL] for result in body["results"]] == [or_query.stats[URLS][doc_id] for doc_id, _ in expected[k]]
+    assert or_query.top_k == 0
@@ -0,0 +1,91 @@
+from classes.seen_urls import BloomFilter, SeenUrls, SeenUrlsDupeFilter
+
+from scrapy import Request
+from scrapy.settings import Settings
+
+import hashlib
+import os
+import pytest
+
+
+@pytest.mark.parametrize("url, other", [
+    ("https://www.concordia.ca/about.html?b=2&a=1", "https://www.concordia.ca/about.html?a=1&b=2"),
+    ("https://www.concordia.ca/about.html#history", "https://www.concordia.ca/about.html"),
+    ("HTTPS://WWW.Concordia.CA:443/about.html", "https://www.concordia.ca/about.html"),
+    ("http://www.concordia.ca:80", "http://www.concordia.ca/"),
+    ("https://www.concordia.ca/caf%c3%a9.html", "https://www.concordia.ca/café.html"),
+])
+def test_ways_of_writing_a_url_are_seen_as_one(url, other):
+    assert SeenUrls.canonicalize(url) == SeenUrls.canonicalize(other)
+    assert SeenUrls.fingerprint(url) == SeenUrls.fingerprint(other)
+
+
+def test_different_urls_are_not_seen_as_one():
+    assert SeenUrls.fingerprint("https://www.concordia.ca/about.html") != SeenUrls.fingerprint("http://www.concordia.ca/about.html")
+    assert SeenUrls.fingerprint("https://www.concordia.ca/about.html?a=1") != SeenUrls.fingerprint("https://www.concordia.ca/about.html")
+
+
+def test_bloom_filter_has_no_false_negatives():
+    fingerprints = [hashlib.blake2b(str(number).encode(), digest_size=16).digest() for number in range(2000)]
+    bloom_filter = BloomFilter(1000)
+    for fingerprint in fingerprints[:1000]:
+        bloom_filter.add(fingerprint)
+    assert all(fingerprint in bloom_filter for fingerprint in fingerprints[:1000])
+    false_positives = sum(fingerprint in bloom_filter for fingerprint in fingerprints[1000:])
+    assert false_positives < 50
+
+
+def test_urls_are_only_added_once():
+    seen_urls = SeenUrls(capacity=16)
+    urls = ["https://www.concordia.ca/pages/{}.html".format(number) for number in range(100)]
+    assert all(seen_urls.add(url) for url in urls)
+    assert not any(seen_urls.add(url) for url in urls)
+    assert not seen_urls.add("https://www.concordia.ca/pages/0.html#top")
+    assert len(seen_urls) == 100
+
+    # the filter was rebuilt larger as it filled up, without losing any URL
+    assert seen_urls.bloom_filter.capacity > 100
+    assert all(url in seen_urls for url in urls)
+    assert "https://www.concordia.ca/pages/100.html" not in seen_urls
+    assert seen_urls.false_positives <= seen_urls.store_lookups
+    seen_urls.close()
+
+
+def test_urls_are_kept_across_runs(tmp_path):
+    path = str(tmp_path / SeenUrls.pages_file)
+    seen_urls = SeenUrls(path)
+    seen_urls.add("https://www.concordia.ca/about.html")
+    seen_urls.close()
+
+    seen_urls = SeenUrls(path)
+    assert len(seen_urls) == 1
+    assert "https://www.concordia.ca/about.html?" in seen_urls
+    assert "https://www.concordia.ca/news.html" not in seen_urls
+    seen_urls.close()
+
+
+def test_dupe_filter_drops_requests_of_urls_already_requested(tmp_path):
+    settings = Settings({"JOBDIR": str(tmp_path)})
+    dupe_filter = SeenUrlsDupeFilter.from_settings(settings)
+    assert not dupe_filter.request_seen(Request("https://www.concordia.ca/about.html?b=2&a=1"))
+    assert dupe_filter.request_seen(Request("https://www.concordia.ca/about.html?a=1&b=2#top"))
+
+    # requests other than plain GET requests are never dropped
+    assert not dupe_filter.request_seen(Request("https://www.concordia.ca/about.html?a=1&b=2", method="POST"))
+    assert not dupe_filter.request_seen(Request("https://www.concordia.ca/about.html?a=1&b=2", body=b"query"))
+    dupe_filter.close("finished")
+
+    # a resumed crawl doesn't request them again
+    assert os.path.exists(os.path.join(str(tmp_path), SeenUrls.requests_file))
+    dupe_filter = SeenUrlsDupeFilter.from_settings(settings)
+    assert dupe_filter.request_seen(Request("https://www.concordia.ca/about.html?a=1&b=2"))
+    assert not dupe_filter.request_seen(Request("https://www.concordia.ca/news.html"))
+    dupe_filter.close("finished")
+
+
+def test_dupe_filter_without_a_job_directory():
+    dupe_filter = SeenUrlsDupeFilter.from_settings(Settings())
+    assert dupe_filter.seen_urls.path is None
+    assert not dupe_filter.request_seen(Request("https://www.concordia.ca/about.html"))
+    assert dupe_filter.request_seen(Request("https://www.concordia.ca/about.html"))
+    dupe_filter.close("finished")
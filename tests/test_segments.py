@@ -0,0 +1,154 @@
+from helpers import read_results, PAGES, URLS, URL, CONTENT
+from classes.corpus_indexer import CorpusIndexer
+from classes.segments import SegmentSet
+from classes.query import OrQuery
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+
+import io
+import json
+import os
+import pytest
+import random
+
+
+def write_crawl(file_path, first_document, num_documents):
+    """
+    Write the pages of a crawl, the same ones for the same first page.
+    :param file_path: path of the crawl's results
+    :param first_document: number of the first page in the URLs, pages crawled before are crawled again
+    :param num_documents: number of pages crawled
+    :return: None
+    """
+    generate_corpus(file_path, num_documents, 30, 200, seed=first_document, first_document=first_document)
+
+
+def add_crawl(segment_set, first_document, num_documents, deleted_urls=()):
+    """
+    Index the pages of a crawl into a new segment, like main.run_spider does.
+    :param segment_set: set of segments to add the crawl to
+    :param first_document: number of the first page in the URLs, pages crawled before are crawled again
+    :param num_documents: number of pages crawled
+    :param deleted_urls: URLs of the pages the crawl found deleted
+    :return: None
+    """
+    path = segment_set.new_segment()
+    file_path = os.path.join(path, "results.jl")
+    write_crawl(file_path, first_document, num_documents)
+    with redirect_stdout(io.StringIO()):
+        CorpusIndexer(file_path, path).construct()
+    os.remove(file_path)
+    segment_set.add_segment(path, num_documents, deleted_urls)
+
+
+def url(number):
+    return "https://www.example.com/pages/{}.html".format(number)
+
+
+@pytest.fixture
+def segment_set(tmp_path):
+    """
+    Four crawls, each crawling some pages of the previous one again, the last one also finding two pages deleted.
+    """
+    segment_set = SegmentSet(str(tmp_path / "segments"))
+    add_crawl(segment_set, 0, 40)
+    add_crawl(segment_set, 30, 40)
+    add_crawl(segment_set, 60, 40)
+    add_crawl(segment_set, 90, 20, [url(5), url(65)])
+    return segment_set
+
+
+def rankings(index, stats, queries):
+    """
+    :return: for each query, the URLs and cosine similarities of its top 10 pages
+    """
+    or_query = OrQuery(index, stats)
+    return [[(stats[URLS][doc_id], score) for doc_id, score in or_query.rank(terms, 10)] for terms in queries]
+
+
+def sample_queries(index):
+    generator = random.Random(0)
+    terms = sorted(index)
+    return [generator.sample(terms, generator.randint(1, 3)) for _ in range(30)]
+
+
+def test_only_the_newest_copy_of_a_page_is_live(segment_set):
+    index, stats = segment_set.load()
+    live_urls = sorted(stats[URLS][doc_id] for doc_id in stats[PAGES])
+    assert live_urls == sorted(url(number) for number in range(110) if number not in (5, 65))
+    index.close()
+
+
+def test_merge_gives_the_same_rankings(segment_set):
+    index, stats = segment_set.load()
+    queries = sample_queries(index)
+    before = rankings(index, stats, queries)
+    index.close()
+
+    assert segment_set.find_merge() is not None
+    segment_set.merge_tiers()
+    assert len(segment_set.manifest["segments"]) == 1
+
+    index, stats = segment_set.load()
+    after = rankings(index, stats, queries)
+    assert [[page for page, _ in ranking] for ranking in after] == [[page for page, _ in ranking] for ranking in before]
+    for ranking_after, ranking_before in zip(after, before):
+        assert [score for _, score in ranking_after] == pytest.approx([score for _, score in ranking_before])
+    assert url(5) not in stats[URLS] and url(65) not in stats[URLS]
+    index.close()
+
+
+def test_deleted_pages_are_not_results(segment_set):
+    index, stats = segment_set.load()
+    file_path = os.path.join(segment_set.directory, "crawl.jl")
+    write_crawl(file_path, 0, 40)
+    terms = [result[CONTENT] for result in read_results(file_path) if result[URL] == url(5)][0]
+
+    results = OrQuery(index, stats).rank(sorted(set(terms)), 0)
+    assert results
+    assert all(stats[URLS][doc_id] not in (url(5), url(65)) for doc_id, _ in results)
+    index.close()
+
+
+def test_norms_are_kept_for_the_live_segments(segment_set):
+    norms_path = os.path.join(segment_set.directory, SegmentSet.norms_file)
+    with open(norms_path, "rb") as norms_file:
+        header = json.loads(norms_file.readline().decode("utf-8"))
+    names = [segment["name"] for segment in segment_set.manifest["segments"]]
+    assert header == {"segments": names, "pages": 108}
+
+    index, stats = segment_set.load()
+    norms = segment_set.read_norms(index.version, len(stats[PAGES]))
+    assert list(norms) == [index.norms[doc_id] for doc_id in sorted(index.norms)]
+    index.close()
+
+
+def test_merged_segments_are_deleted_once_they_are_not_read(segment_set):
+    names = [segment["name"] for segment in segment_set.manifest["segments"]]
+    index, stats = segment_set.load()
+    queries = sample_queries(index)
+    before = rankings(index, stats, queries)
+
+    segment_set.merge_in_background().join()
+
+    # the index loaded before the merge still reads the merged segments
+    assert segment_set.manifest["obsolete"] == names
+    assert all(os.path.isdir(segment_set.get_path(name)) for name in names)
+    assert rankings(index, stats, queries) == before
+
+    index.close()
+    assert segment_set.manifest["obsolete"] == []
+    assert not any(os.path.exists(segment_set.get_path(name)) for name in names)
+
+
+def test_obsolete_segments_are_deleted_on_the_next_load(segment_set):
+    path = segment_set.new_segment()
+    segment_set.manifest["obsolete"] = [os.path.basename(path)]
+    segment_set.write_manifest()
+
+    other_segment_set = SegmentSet(segment_set.directory)
+    index, _ = other_segment_set.load()
+    assert not os.path.exists(path)
+    assert other_segment_set.manifest["obsolete"] == []
+    index.close()
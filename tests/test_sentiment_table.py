@@ -0,0 +1,33 @@
+from classes.sentiment_table import SentimentTable
+from benchmarks.sentiment_throughput import generate_documents
+
+from afinn import Afinn
+from collections import Counter
+
+import pytest
+
+
+afinn = Afinn()
+table = SentimentTable.from_afinn()
+
+
+@pytest.mark.parametrize("text", [
+    "", "good", "GOOD!", "not good", "not  good", "not good at all", "no fun", "can't stand it", "does not work",
+    "well-good", "goodness", "good-natured and bad", "n't", "ca", "some kind", "dont like", "cool stuff :)", "café naïve",
+    "This is not a good day, but it's not bad either.", "best\tworst\nbest"
+])
+def test_score_matches_afinn(text):
+    assert table.score(text) == afinn.score(text)
+
+
+def test_score_terms_matches_afinn():
+    for terms in generate_documents(200, 100, table.lexicon):
+        assert table.score_terms(terms, Counter(terms)) == afinn.score(" ".join(terms))
+
+
+def test_written_table_scores_like_afinn(tmp_path):
+    written = SentimentTable.open(str(tmp_path))
+    reopened = SentimentTable.open(str(tmp_path))
+    assert reopened.lexicon == written.lexicon
+    for terms in generate_documents(20, 100, table.lexicon, seed=1):
+        assert reopened.score(" ".join(terms)) == afinn.score(" ".join(terms))
@@ -0,0 +1,82 @@
+from helpers import PAGES, IDF
+from classes.corpus_indexer import CorpusIndexer
+from classes.disk_index import DiskIndex
+from classes.query import AndQuery, OrQuery
+from classes.shards import ShardSet
+from benchmarks.corpus import generate_corpus
+
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+import random
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """
+    Index a small synthetic corpus in memory.
+    :return: the directory of the corpus, the index, the stats, and a batch of queries
+    """
+    directory = str(tmp_path_factory.mktemp("shards"))
+    file_path = os.path.join(directory, "results.jl")
+    vocabulary = generate_corpus(file_path, 1200, 80, 3000)
+    corpus_indexer = CorpusIndexer(file_path, directory)
+    with redirect_stdout(io.StringIO()):
+        corpus_indexer.construct()
+
+    # queries mixing common and rarer terms, some with a term which isn't in the index
+    generator = random.Random(0)
+    batch = [generator.sample(vocabulary[:generator.choice((30, 300, 3000))], generator.randint(1, 4)) for _ in range(60)]
+    batch += [[vocabulary[0], "notaterm"], ["notaterm"]]
+
+    return directory, corpus_indexer.get_index(), corpus_indexer.get_stats(), batch
+
+
+@pytest.mark.parametrize("num_shards", [2, 3])
+def test_shards_rank_like_the_whole_index(corpus, num_shards):
+    directory, index, stats, batch = corpus
+    shard_set = ShardSet(os.path.join(directory, "shards_{}".format(num_shards)))
+    shard_set.write(index, stats, num_shards)
+    assert shard_set.get_num_shards() == num_shards
+
+    shard_pool = shard_set.start(stats)
+    try:
+        for query_class in (OrQuery, AndQuery):
+            query = query_class(index, stats)
+            for k in (0, 10):
+                expected = [query.rank(terms, k) for terms in batch]
+                assert shard_pool.search(batch, query_class.conjunctive, k) == expected
+    finally:
+        shard_pool.close()
+
+
+def test_shards_keep_the_global_idf(corpus):
+    directory, index, stats, _ = corpus
+    shard_set = ShardSet(os.path.join(directory, "shards_idf"))
+    shard_set.write(index, stats, 3)
+    bounds = shard_set.manifest["bounds"]
+    assert bounds[0] == 0 and bounds[-1] == len(stats[PAGES])
+
+    num_postings = 0
+    for shard in range(3):
+        shard_index = DiskIndex(shard_set.get_prefix(shard))
+        for term in list(index)[:200]:
+            assert shard_index[term][IDF] == pytest.approx(index[term][IDF])
+            doc_ids = list(shard_index[term][PAGES].doc_ids)
+            assert all(bounds[shard] <= doc_id < bounds[shard + 1] for doc_id in doc_ids)
+            num_postings += len(doc_ids)
+        shard_index.close()
+    assert num_postings == sum(len(index[term][PAGES]) for term in list(index)[:200])
+
+
+def test_shards_are_only_written_again_for_another_version(corpus):
+    directory, index, stats, _ = corpus
+    shard_set = ShardSet(os.path.join(directory, "shards_version"))
+    shard_set.write(index, stats, 2, ("segment_000000",))
+    shard_set = ShardSet(shard_set.directory)
+    assert shard_set.is_current(2, ("segment_000000",))
+    assert not shard_set.is_current(3, ("segment_000000",))
+    assert not shard_set.is_current(2, ("segment_000001",))
+    assert not shard_set.is_current(2, None)
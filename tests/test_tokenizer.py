@@ -0,0 +1,41 @@
+from helpers import clean_terms, fast_clean_terms, tokenize_page
+from benchmarks.tokenizer_throughput import tricky, generate_pages, reference_tokenize_page
+
+import pytest
+
+
+""" texts where sentence splitting, punctuation or casefolding could make the fast tokenizer differ from clean_terms """
+edge_cases = tricky + [
+    " ".join(tricky), "", " ", "\n\t", "Hello.", "Hi there! How are you? Fine.", "The end", "Not good... not bad?!",
+    "U.S. students don't say \"e.g.\" at the end of a sentence.", "Mr. Smith went to Washington. He didn't stay.",
+    "ÉCOLE Straße İstanbul", "tabs\tand\nnew lines", "It's 3.14, not 3!", "What?No space.After this"
+]
+
+
+@pytest.mark.parametrize("remove_stopwords", [False, True])
+@pytest.mark.parametrize("text", edge_cases)
+def test_fast_clean_terms_matches_clean_terms(text, remove_stopwords):
+    assert list(fast_clean_terms(text, remove_stopwords)) == clean_terms(text, remove_stopwords)
+
+
+@pytest.mark.parametrize("remove_stopwords", [False, True])
+def test_fast_clean_terms_matches_clean_terms_when_cached(remove_stopwords):
+    fast_clean_terms.cache_clear()
+    for _ in range(2):
+        for text in edge_cases:
+            assert list(fast_clean_terms(text, remove_stopwords)) == clean_terms(text, remove_stopwords)
+
+
+def test_stopwords_are_removed():
+    assert fast_clean_terms("The student is not in the union") == ("the", "student", "is", "not", "in", "the", "union")
+    assert "the" not in fast_clean_terms("The student is not in the union", True)
+
+
+@pytest.mark.parametrize("remove_stopwords", [False, True])
+def test_tokenize_page_matches_clean_terms(remove_stopwords):
+    for texts in generate_pages(20):
+        assert tokenize_page(texts, remove_stopwords) == reference_tokenize_page(texts, remove_stopwords)
+
+
+def test_tokenize_page_accepts_a_single_string():
+    assert tokenize_page("Hello, world!") == clean_terms("Hello, world!")
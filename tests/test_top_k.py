@@ -0,0 +1,45 @@
+from classes.corpus_indexer import CorpusIndexer
+from classes.document_parser import DocumentParser
+from classes.index_builder import IndexBuilder
+from benchmarks.corpus import generate_corpus
+from benchmarks.top_k_latency import exhaustive_top_k, max_score_top_k
+
+from contextlib import redirect_stdout
+
+import io
+import os
+import pytest
+import random
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """
+    Index a small synthetic corpus, whose frequent terms appear in most pages, and open the index from its files.
+    :return: the index, the stats, and the vocabulary, most frequent terms first
+    """
+    directory = str(tmp_path_factory.mktemp("top_k"))
+    file_path = os.path.join(directory, "results.jl")
+    vocabulary = generate_corpus(file_path, 2000, 100, 5000)
+    with redirect_stdout(io.StringIO()):
+        CorpusIndexer(file_path, directory).construct()
+
+    index = IndexBuilder.build_index_from_file(directory)
+    yield index, DocumentParser.build_stats_from_file(directory), vocabulary
+    index.close()
+
+
+@pytest.mark.parametrize("k", [1, 10, 100])
+@pytest.mark.parametrize("length", [1, 3, 8])
+def test_max_score_top_k_matches_exhaustive(corpus, length, k):
+    index, stats, vocabulary = corpus
+    generator = random.Random(length * 1000 + k)
+    for _ in range(20):
+        terms = generator.sample(vocabulary[:generator.choice([20, 200, 2000])], length)
+        assert max_score_top_k(index, stats, terms, k) == exhaustive_top_k(index, stats, terms, k)
+
+
+def test_max_score_top_k_with_unknown_terms(corpus):
+    index, stats, vocabulary = corpus
+    assert max_score_top_k(index, stats, ["notaterm"], 10) == []
+    assert max_score_top_k(index, stats, [vocabulary[0], "notaterm"], 10) == exhaustive_top_k(index, stats, [vocabulary[0], "notaterm"], 10)